@@ -22,12 +22,38 @@ def create_app(config_name):
     config[config_name].init_app(app)
 
     db.init_app(app)
+    from .database import init_engine
+    init_engine(app)
+    from .metrics import metrics
+    metrics.init_app(app)
     migrate.init_app(app, db)
     ma.init_app(app)
     cors.init_app(app)
     jwt.init_app(app)
     mail.init_app(app)
 
+    from .renderers import renderer
+    renderer.init_app(app)
+
+    from .hashing import hasher
+    hasher.init_app(app)
+
+    from .revocation import revocation
+    revocation.init_app(app)
+
+    from .jobs import queue
+    queue.init_app(app)
+
+    from .outbox import outbox
+    outbox.init_app(app)
+
+    from .trello_client import cache, clients
+    cache.init_app(app, 'TRELLO_CACHE')
+    clients.init_app(app)
+
+    from .profiling import profiler
+    profiler.init_app(app)
+
     from .api import api as api_blueprint
     app.register_blueprint(api_blueprint, url_prefix="/api")
 
@@ -1,7 +1,9 @@
 from flask import Blueprint
+from ..renderers import compress_response
 
 
 api = Blueprint('api', __name__)
+api.after_request(compress_response)
 
 
-from . import errors, auth, users, settings, integrations
+from . import errors, auth, users, settings, integrations, profiles
@@ -0,0 +1,19 @@
+from flask import abort, current_app, request
+from functools import wraps
+import hmac
+
+
+def admin_token_required(func):
+    """
+    Guard an admin view with ``Authorization: Bearer <ADMIN_TOKEN>``, the view doesn't exist while no token is set
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        token = current_app.config['ADMIN_TOKEN']
+        if not token:
+            abort(404)
+        authorization = request.headers.get('Authorization', '')
+        if not authorization.startswith('Bearer ') or not hmac.compare_digest(authorization[len('Bearer '):], token):
+            abort(401, {'Authorization': 'A valid admin token is required.'})
+        return func(*args, **kwargs)
+    return wrapper
@@ -1,17 +1,17 @@
 from . import api
-from .. import models, schemas, generics, db, jwt, mail
+from .. import models, schemas, generics, db, jwt
+from ..outbox import outbox
+from ..revocation import revocation, RevocationError
+from ..serializers import dump
 
 import uuid
-from flask_mail import Message
-from flask import request, abort, current_app
+from flask import request, abort
 from flask_jwt_extended import jwt_required, create_access_token, get_jwt_identity, get_raw_jwt, get_jti
 
 
-blacklist = set()
 @jwt.token_in_blacklist_loader
 def check_if_token_in_blacklist(decrypted_token):
-    jti = decrypted_token['jti']
-    return jti in blacklist
+    return revocation.is_revoked(decrypted_token)
 
 
 class UserRegisterAPIController(generics.CreateAPIView):
@@ -26,11 +26,11 @@ class UserRegisterAPIController(generics.CreateAPIView):
 
 
     def perform_create(self, instance):
-        super().perform_create(instance)
-        self.access_token = create_access_token(identity=instance.pk)
-        settings = models.Setting(user_pk=instance.pk, color="red", fontsize="15px", linewidth=15)
-        db.session.add(settings)
+        db.session.add(instance)
+        self.flush(instance)
+        db.session.add(models.Setting.default(instance.pk))
         db.session.commit()
+        self.access_token = create_access_token(identity=instance.pk)
 
 
 class UserResetPasswordAPIController(generics.MethodView):
@@ -46,23 +46,33 @@ Latech Team.
     def post(self, *args, **kwargs):
         user = models.User.query.filter_by(email=kwargs.get("email")).one_or_none()
         if user:
-            plain_password = str(uuid.uuid4())[:8]
-            user.password = plain_password
-            db.session.commit()
-            message = Message(subject="Reset Password", sender=current_app.config['FLASK_MAIL_SENDER'], recipients=[user.email])
-            message.body = self.message_txt.format(user.fullname, plain_password)
-            mail.send(message=message)
+            outbox.enqueue("Reset Password", [user.email], template='reset_password', context={'user_pk': user.pk})
 
         return { "Success": "Your new password has been sent to your mail." }, 200
 
 
+@outbox.template('reset_password')
+def reset_password_body(context):
+    """
+    Set a new password as the email is sent, so it's never stored in clear. A retried email sets another one.
+    """
+    user = models.User.query.get(context['user_pk'])
+    if user is None:
+        return None
+    plain_password = str(uuid.uuid4())[:8]
+    user.password = plain_password
+    return UserResetPasswordAPIController.message_txt.format(user.fullname, plain_password)
+
+
 class UserLogoutAPIController(generics.MethodView):
     methods = ['DELETE']
     decorators = [jwt_required]
 
     def delete(self, *args, **kwargs):
-        jti = get_raw_jwt()['jti']
-        blacklist.add(jti)
+        try:
+            revocation.revoke(get_raw_jwt())
+        except RevocationError:
+            abort(503, {'Oops': 'You can\'t be logged out right now, try again later.'})
         return {"Logout": "Successfully logged out"}, 200
 
 
@@ -75,7 +85,10 @@ class UserLoginAPIController(generics.MethodView):
 
         current_user = models.User.query.filter_by(email=email).first() if password or email else None
         if current_user is not None and current_user.check_password(password):
-            data = schemas.UserSchema(many=False).dump(current_user)
+            if current_user.password_needs_rehash():
+                current_user.password = password
+                db.session.commit()
+            data = dump(schemas.UserSchema, current_user)
             return {**data ,'access_token': create_access_token(identity=current_user.pk)}, 200
         return abort(400, {'Oops': 'Invalid email or password.'})
 
@@ -1,7 +1,8 @@
 from . import api
+from ..renderers import render
 from werkzeug.exceptions import HTTPException
 
 
 @api.errorhandler(HTTPException)
 def handle_exception(e):
-    return {'error': e.name.lower().replace(' ', '-'), 'message': e.description}, e.code
+    return render({'error': e.name.lower().replace(' ', '-'), 'message': e.description}, e.code)
@@ -1,7 +1,11 @@
 from ... import schemas, models, generics, db
+from ...identity import current_identity
+from ...trello_client import forget_integration
 from .. import api
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
 
 
 class IntegrationCollectionAPI(generics.ListCreateAPIView):
@@ -9,13 +13,31 @@ class IntegrationCollectionAPI(generics.ListCreateAPIView):
     model = models.Integration
     schema_class = schemas.IntegrationSchema
     unique_fields = ('api_key', )
+    cursor_pagination = True
 
     def perform_create(self, instance):
-        user_pk = get_jwt_identity()
-        integration = models.Integration.query.filter_by(user_pk=user_pk, active=True).one_or_none()
-        instance.active =  False if integration else True
-        instance.user_pk = user_pk
+        identity = current_identity()
+        instance.active = False
+        instance.user_pk = get_jwt_identity()
         super().perform_create(instance)
+        if identity.integration is None and self.activate(instance):
+            identity.integration = instance
+
+    def activate(self, instance):
+        """
+        Activate the integration unless the user has an active one, in one conditional UPDATE. Of two
+        concurrent first integrations, the one losing on the unique index stays inactive.
+        """
+        others = aliased(models.Integration)
+        active = db.session.query(others.pk).filter(others.user_pk == instance.user_pk, others.active == True).exists()
+        try:
+            activated = models.Integration.query.filter(models.Integration.pk == instance.pk, ~active) \
+                .update({'active': True}, synchronize_session=False)
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return False
+        return bool(activated)
 
     def get_object_query(self, **kwargs):
         kwargs = { **kwargs, 'user_pk': get_jwt_identity() }
@@ -33,14 +55,64 @@ class IntegrationDocumentAPI(generics.RetrieveUpdateDestroyAPIView):
         kwargs = { **kwargs, 'user_pk': get_jwt_identity() }
         return super().get_object_query(**kwargs)
 
-    def perform_update(self, old_instance, instance_updated):
-        for integration in models.Integration.query.filter_by(user_pk=get_jwt_identity(), active=True).all():
-            integration.active = False
-        instance_updated.active = True
-        super().perform_update(old_instance, instance_updated)
+    def perform_update(self, instance, changes):
+        identity = current_identity()
+        # one UPDATE for the others, ahead of the flush activating this one under the unique index
+        models.Integration.query \
+            .filter(models.Integration.user_pk == instance.user_pk, models.Integration.active == True,
+                    models.Integration.pk != instance.pk) \
+            .update({'active': False}, synchronize_session='evaluate')
+        instance.active = True
+        identity.integration = instance
+        super().perform_update(instance, changes)
+        if changes:
+            forget_integration(instance, changes.original('api_key'))
+
+    def perform_delete(self, object_query):
+        for integration in object_query.all():
+            forget_integration(integration)
+        super().perform_delete(object_query)
+
+class IntegrationBulkAPI(generics.BulkCreateUpdateDestroyAPIView):
+    """
+    Integrations in bulk, the active one is only changed by creating the first integration or updating a single one
+    """
+    decorators = [jwt_required]
+    model = models.Integration
+    schema_class = schemas.IntegrationSchema
+    unique_fields = ('api_key', )
+
+    def get_object_query(self, **kwargs):
+        kwargs = { **kwargs, 'user_pk': get_jwt_identity() }
+        return super().get_object_query(**kwargs)
+
+    def perform_bulk_create(self, instances):
+        identity = current_identity()
+        for instance in instances:
+            instance.user_pk = get_jwt_identity()
+            instance.active = False
+        if identity.integration is None:
+            instances[0].active = True
+            identity.integration = instances[0]
+        super().perform_bulk_create(instances)
+
+    def perform_bulk_update(self, instances, changes):
+        for instance, instance_changes in zip(instances, changes):
+            if 'active' in instance_changes:
+                instance.active = instance_changes.original('active')
+        super().perform_bulk_update(instances, changes)
+        for instance, instance_changes in zip(instances, changes):
+            if 'api_key' in instance_changes:
+                forget_integration(instance, instance_changes.original('api_key'))
+
+    def perform_delete(self, object_query):
+        for integration in object_query.all():
+            forget_integration(integration)
+        super().perform_delete(object_query)
 
 
 api.add_url_rule('/integrations', view_func=IntegrationCollectionAPI.as_view('integration_collection_resource'), methods=IntegrationCollectionAPI.methods)
+api.add_url_rule('/integrations/bulk', view_func=IntegrationBulkAPI.as_view('integration_bulk_resource'), methods=IntegrationBulkAPI.methods)
 api.add_url_rule('/integration/<int:pk>', view_func=IntegrationDocumentAPI.as_view('integration_document_resource'), methods=IntegrationDocumentAPI.methods)
 
 
@@ -1,126 +1,234 @@
 from ... import models, generics, db, schemas
 from .. import api
 from marshmallow.exceptions import ValidationError
-from flask import current_app, request, abort
+from flask import Response, request, abort, url_for
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from trello import TrelloClient, Member, Label
+from ...identity import current_identity
+from ...jobs import queue, PermanentJobError
+from ...serializers import dump, get_schema
+from ...trello_client import cache, invalidate_cache, get_executor, get_trello_client, fetch_board_collection, create_card
+from ...uploads import save_data_url, save_stream, remove_upload, UploadError
+from ..admin import admin_token_required
+from trello.exceptions import Unauthorized
+from werkzeug.exceptions import HTTPException
+from functools import wraps
 
 
 class TrelloBaseAPIView(generics.MethodView):
     decorators = [jwt_required]
 
     def get_current_integration(self):
-        return models.Integration.query.filter_by(user_pk=get_jwt_identity(), active=True).one_or_none()
+        return current_identity().integration
 
     def get_trello_client(self):
         currentIntegration = self.get_current_integration()
         if currentIntegration:
-            return TrelloClient(api_key=current_app.config['TRELLO_APP_KEY'], api_secret=currentIntegration.api_key)
+            return get_trello_client(currentIntegration)
         return None
 
 
-class TrelloBoardAPIView(TrelloBaseAPIView):
+def trello_errors(func):
+    """
+    Answer 401 when Trello rejects the integration key and 502 when it fails otherwise
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except Unauthorized:
+            return abort(401, {'Invalide Trello key': 'We can\'t connect to your trello account'})
+        except HTTPException:
+            raise
+        except Exception:
+            return abort(502, {'Oops': 'Trello is not available right now.'})
+    return wrapper
+
+
+class TrelloCollectionAPIView(TrelloBaseAPIView):
+    """
+    Trello lookups shared through the per-process cache, keyed by integration and board
+    """
     methods = ['GET']
+    collection = None
+    schema_class = schemas.TrelloOptionSchema
 
     def dumps(self, data):
-        return [ dict(label=item.name, value=item.id) for item in data ]
+        return get_schema(self.schema_class).dump(data, many=True)
 
+    def fetch(self, trello, board_id=None):
+        return fetch_board_collection(trello, self.collection, board_id)
+
+    def load(self, integration, trello, board_id=None):
+        key = (integration.pk, self.collection, board_id)
+        return cache.get_or_load(key, lambda: self.dumps(self.fetch(trello, board_id)))
+
+    @trello_errors
     def get(self, *args, **kwargs):
-        trello = self.get_trello_client()
-        if trello:
-            try:
-                data = trello.list_boards()
-            except:
-                return abort(401, {'Invalide Trello key': 'We can\'t connect to your trello account'})
-            else:
-                return {'items': self.dumps(data)}, 200
+        currentIntegration = self.get_current_integration()
+        if currentIntegration:
+            items = self.load(currentIntegration, get_trello_client(currentIntegration), kwargs.get('board_id', None))
+            return {'items': items}, 200
         return abort(400, {'Oops': 'No active Integration existe.'})
 
 
-class TrelloMembersAPIView(TrelloBaseAPIView):
-    methods = ['GET']
+class TrelloBoardAPIView(TrelloCollectionAPIView):
+    collection = 'boards'
 
-    def dumps(self, data):
-        return [ dict(label=item.full_name, value=item.id) for item in data ]
+    def fetch(self, trello, board_id=None):
+        return trello.list_boards()
 
-    def get(self, *args, **kwargs):
-        trello = self.get_trello_client()
-        if trello:
-            data = trello.get_board(kwargs.get('board_id', None)).all_members()
-            return {'items': self.dumps(data)}, 200
-        return abort(400, {'Oops': 'No active Integration existe.'})
 
+class TrelloMembersAPIView(TrelloCollectionAPIView):
+    collection = 'members'
+    schema_class = schemas.TrelloMemberOptionSchema
 
-class TrelloLabelAPIView(TrelloBaseAPIView):
-    methods = ['GET']
 
-    def dumps(self, data):
-        return [ dict(label=item.color, value=item.id) for item in data ]
+class TrelloLabelAPIView(TrelloCollectionAPIView):
+    collection = 'labels'
+    schema_class = schemas.TrelloLabelOptionSchema
+
+
+class TrelloListAPIView(TrelloCollectionAPIView):
+    collection = 'lists'
+
+
+class TrelloBoardMetaAPIView(TrelloBaseAPIView):
+    """
+    Lists, labels and members of a board fetched concurrently for the report form
+    """
+    methods = ['GET']
+    collection_views = (TrelloListAPIView, TrelloLabelAPIView, TrelloMembersAPIView)
 
+    @trello_errors
     def get(self, *args, **kwargs):
-        trello = self.get_trello_client()
-        if trello:
-            data = trello.get_board(kwargs.get('board_id', None)).get_labels()
-            return {'items': self.dumps(data)}, 200
+        currentIntegration = self.get_current_integration()
+        if currentIntegration:
+            trello = get_trello_client(currentIntegration)
+            board_id = kwargs.get('board_id', None)
+            futures = {
+                view.collection: get_executor().submit(view().load, currentIntegration, trello, board_id)
+                for view in self.collection_views
+            }
+            return {collection: future.result() for collection, future in futures.items()}, 200
         return abort(400, {'Oops': 'No active Integration existe.'})
 
 
-class TrelloListAPIView(TrelloBaseAPIView):
+class TrelloCacheStatsAPIView(generics.MethodView):
+    """
+    Hit and miss counters of this process' Trello cache
+    """
+    decorators = [admin_token_required]
     methods = ['GET']
 
-    def dumps(self, data):
-        return [ dict(label=item.name, value=item.id) for item in data ]
-
     def get(self, *args, **kwargs):
-        trello = self.get_trello_client()
-        if trello:
-            data = trello.get_board(kwargs.get('board_id', None)).all_lists()
-            return {'items': self.dumps(data)}, 200
+        return cache.stats(), 200
+
+
+class TrelloCacheAPIView(TrelloBaseAPIView):
+    methods = ['DELETE']
+
+    def delete(self, *args, **kwargs):
+        currentIntegration = self.get_current_integration()
+        if currentIntegration:
+            invalidate_cache(currentIntegration.pk, request.args.get('board', None))
+            return Response(status=204)
         return abort(400, {'Oops': 'No active Integration existe.'})
 
 
-class TrelloCreateCardAPIView(TrelloBaseAPIView):
-    methods = ['POST']
-    cardSchema = schemas.TrelloCardSchema()
+def remove_card_attachment(job):
+    remove_upload(job.payload['attachment'])
+
+
+@queue.task('trello.create_card', on_failure=remove_card_attachment)
+def create_card_job(job):
+    integration = models.Integration.query.get(job.payload['integration_pk'])
+    if integration is None:
+        raise PermanentJobError('The integration no longer exists.')
 
-    def _get_attachment_file(self, attachment):
-        import base64, re
-        header, encoded = attachment.split(",", 1)
-        image = re.search(r"^data:(\w+)\/(?P<extension>\w+);", header)
-        filename = 'screenshot.{}'.format(image.group("extension"))
-        data = base64.b64decode(encoded)
-        return filename, image.group("extension"), base64.b64decode(encoded)
+    def checkpoint(card):
+        # a retry after a failed attachment upload must not create the card twice
+        queue.renew(job)
+        job.result = {'id': card['id'], 'url': card['url']}
+        db.session.commit()
 
-    def _create_card(self, data):
-        trello_client = self.get_trello_client()
-        trello_list = trello_client.get_board(data.get('board_id')).get_list(data.get('board_list_id'))
-        card = trello_list.add_card(name=data.get('name'), desc=data.get('desc'))
-        (filename, mime_type, file_content) = self._get_attachment_file(data.get('attachment'))
-        card.attach(name=filename, mimeType=mime_type, file=file_content)
+    # a worker whose lease expired stops before creating a second card
+    queue.renew(job)
+    db.session.commit()
+    try:
+        card = create_card(get_trello_client(integration), job.payload, card=job.result, on_created=checkpoint)
+    except Unauthorized as err:
+        raise PermanentJobError('We can\'t connect to your trello account') from err
+    remove_card_attachment(job)
+    return {'id': card['id'], 'url': card['url']}
 
-        for member_id in data.get('members', tuple()):
-            member_id and card.add_member(Member(trello_client, member_id))
 
-        for label_id in data.get('labels', tuple()):
-            label_id and card.add_label(Label(trello_client, label_id, ""))
+class TrelloCreateCardAPIView(TrelloBaseAPIView):
+    methods = ['POST']
+    cardSchema = schemas.TrelloCardSchema()
 
-        return card
+    def load_card(self, data, partial=False):
+        try:
+            return self.cardSchema.load(data, partial=partial)
+        except ValidationError as err:
+            abort(400, err.messages)
+
+    def load_form(self, form):
+        data = form.to_dict()
+        for field in ('labels', 'members'):
+            if field in form:
+                data[field] = form.getlist(field)
+        return self.load_card(data, partial=('attachment', ))
+
+    def get_card_data(self):
+        """
+        Read the card from a JSON body with a data URL screenshot, a multipart form with an ``attachment``
+        file, or a raw ``image/*`` body described by the query string. The screenshot is streamed to
+        the upload directory in every case.
+        """
+        try:
+            if request.mimetype.startswith('image/'):
+                data = self.load_form(request.args)
+                data['attachment'] = save_stream(request.stream, request.mimetype)
+            elif request.mimetype == 'multipart/form-data':
+                data = self.load_form(request.form)
+                attachment = request.files.get('attachment')
+                if attachment is None:
+                    abort(400, {'attachment': ['Missing data for required field.']})
+                data['attachment'] = save_stream(attachment.stream, attachment.mimetype)
+            else:
+                data = self.load_card(request.json)
+                data['attachment'] = save_data_url(data['attachment'])
+        except UploadError as err:
+            abort(400, {'attachment': [str(err)]})
+        return data
 
     def post(self, *args, **kwargs):
-        currentIntegration = models.Integration.query.filter_by(user_pk=get_jwt_identity(), active=True).one_or_none()
+        currentIntegration = self.get_current_integration()
         if currentIntegration:
-            try:
-                data = self.cardSchema.load(request.json)
-            except ValidationError as err:
-                abort(400, err.messages)
-            else:
-                card = self._create_card(data)
-                return {'Good Job': 'Your trello card has been created.'}, 200
+            data = self.get_card_data()
+            job = queue.enqueue('trello.create_card', {**data, 'integration_pk': currentIntegration.pk}, user_pk=currentIntegration.user_pk)
+            location = url_for('api.trello_job_resource', pk=job.pk)
+            return dump(schemas.JobSchema, job), 202, {'Location': location}
         return abort(400, {'Oops': 'No active Integration existe.'})
 
 
+class TrelloJobAPIView(generics.RetrieveAPIView):
+    decorators = [jwt_required]
+    model = models.Job
+    schema_class = schemas.JobSchema
+    lookup_url_kwarg = 'pk'
+
+    def get_object_query(self, **kwargs):
+        kwargs = { **kwargs, 'user_pk': get_jwt_identity() }
+        return super().get_object_query(**kwargs)
+
+
 api.add_url_rule('/trello/boards', view_func=TrelloBoardAPIView.as_view('board_resource'), methods=TrelloBoardAPIView.methods)
 api.add_url_rule('/trello/board/<string:board_id>/members', view_func=TrelloMembersAPIView.as_view('member_resource'), methods=TrelloMembersAPIView.methods)
 api.add_url_rule('/trello/board/<string:board_id>/lists', view_func=TrelloListAPIView.as_view('list_resource'), methods=TrelloListAPIView.methods)
 api.add_url_rule('/trello/board/<string:board_id>/labels', view_func=TrelloLabelAPIView.as_view('label_resource'), methods=TrelloLabelAPIView.methods)
+api.add_url_rule('/trello/board/<string:board_id>/meta', view_func=TrelloBoardMetaAPIView.as_view('board_meta_resource'), methods=TrelloBoardMetaAPIView.methods)
+api.add_url_rule('/trello/cache', view_func=TrelloCacheAPIView.as_view('trello_cache_resource'), methods=TrelloCacheAPIView.methods)
+api.add_url_rule('/admin/trello/cache', view_func=TrelloCacheStatsAPIView.as_view('trello_cache_stats_resource'), methods=TrelloCacheStatsAPIView.methods)
 api.add_url_rule('/trello/create-card', view_func=TrelloCreateCardAPIView.as_view('create_card_resource'), methods=TrelloCreateCardAPIView.methods)
+api.add_url_rule('/trello/jobs/<int:pk>', view_func=TrelloJobAPIView.as_view('trello_job_resource'), methods=TrelloJobAPIView.methods)
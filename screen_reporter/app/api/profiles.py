@@ -0,0 +1,32 @@
+from .. import generics
+from ..profiling import profiler
+from . import api
+from .admin import admin_token_required
+from flask import abort, send_from_directory
+
+
+class ProfileCollectionAPI(generics.MethodView):
+    """
+    Profiles in the ring buffer, most recent first
+    """
+    decorators = [admin_token_required]
+    methods = ['GET']
+
+    def get(self):
+        return dict(items=profiler.list())
+
+
+class ProfileDocumentAPI(generics.MethodView):
+    decorators = [admin_token_required]
+    methods = ['GET']
+
+    def get(self, profile_id):
+        profile = profiler.get(profile_id)
+        if profile is None:
+            abort(404)
+        return send_from_directory(profiler.directory, profile['filename'], mimetype=profile['mimetype'],
+                                   as_attachment=True, cache_timeout=0)
+
+
+api.add_url_rule('/admin/profiles', view_func=ProfileCollectionAPI.as_view('profile_collection_resource'), methods=ProfileCollectionAPI.methods)
+api.add_url_rule('/admin/profiles/<string:profile_id>', view_func=ProfileDocumentAPI.as_view('profile_document_resource'), methods=ProfileDocumentAPI.methods)
@@ -1,6 +1,8 @@
 from .. import schemas, models, generics
+from ..identity import current_identity
 from . import api
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import abort
+from flask_jwt_extended import jwt_required
 
 
 class SettingsDocumentAPI(generics.RetrieveUpdateAPIView):
@@ -9,8 +11,10 @@ class SettingsDocumentAPI(generics.RetrieveUpdateAPIView):
     schema_class = schemas.SettingSchema
 
     def get_object(self, **kwargs):
-        kwargs = { **kwargs, 'user_pk': get_jwt_identity() }
-        return super().get_object(**kwargs)
+        setting = current_identity().setting
+        if setting is None:
+            abort(404)
+        return setting
 
 
 api.add_url_rule('/settings', view_func=SettingsDocumentAPI.as_view('setting_document_resource'), methods=SettingsDocumentAPI.methods)
@@ -6,6 +6,7 @@ from flask import abort
 class UserCollectionAPI(generics.ListCreateAPIView):
     model = models.User
     schema_class = schemas.UserSchema
+    cursor_pagination = True
 
 
 class UserDocumentAPI(generics.RetrieveUpdateAPIView):
@@ -14,12 +15,24 @@ class UserDocumentAPI(generics.RetrieveUpdateAPIView):
     lookup_url_kwarg = 'pk'
     unique_fields = ('email', )
 
-    def perform_update(self, old_instance, instance_updated):
-        if not old_instance.check_password(instance_updated.current_password):
+    def perform_update(self, instance, changes):
+        if not instance.check_original_password(instance.current_password, changes):
             abort(400, {'Password': 'Password does not match the old one.'})
-        super().perform_update(old_instance, instance_updated)
+        super().perform_update(instance, changes)
 
 
+class UserBulkAPI(generics.BulkCreateAPIView):
+    model = models.User
+    schema_class = schemas.UserSchema
+    unique_fields = ('email', )
+
+    def perform_bulk_create(self, instances):
+        db.session.add_all(instances)
+        self.bulk_flush(instances)
+        db.session.add_all([models.Setting.default(instance.pk) for instance in instances])
+        db.session.commit()
+
 
 api.add_url_rule('/users', view_func=UserCollectionAPI.as_view('user_collection_resource'), methods=UserCollectionAPI.methods)
+api.add_url_rule('/users/bulk', view_func=UserBulkAPI.as_view('user_bulk_resource'), methods=UserBulkAPI.methods)
 api.add_url_rule('/user/<int:pk>', view_func=UserDocumentAPI.as_view('user_document_resource'), methods=UserDocumentAPI.methods)
@@ -1,7 +1,7 @@
 from . import db
 from sqlalchemy.ext.declarative import declared_attr, as_declarative
-from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+from .hashing import hasher
 
 
 class AutoTableNameMixin(object):
@@ -30,11 +30,11 @@ class AutoPKMixin(object):
 class TimestampMixin(object):
     @declared_attr
     def created(cls):
-        return db.Column(db.DateTime, default=datetime.now())
+        return db.Column(db.DateTime, default=datetime.now)
 
     @declared_attr
     def updated(cls):
-        return db.Column(db.DateTime, default=datetime.now(), onupdate=datetime.now())
+        return db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
 
 
 class UserMixin(object):
@@ -55,10 +55,19 @@ class UserMixin(object):
 
     @password.setter
     def password(self, plain_password):
-        self.__hashed_password = generate_password_hash(plain_password)
+        self.__hashed_password = hasher.hash(plain_password)
 
     def check_password(self, plain_password):
-        return check_password_hash(self.__hashed_password, plain_password)
+        return hasher.verify(self.__hashed_password, plain_password)
+
+    def check_original_password(self, plain_password, changes):
+        """
+        Check the password the user had before ``changes``
+        """
+        return hasher.verify(changes.original('_UserMixin__hashed_password'), plain_password)
+
+    def password_needs_rehash(self):
+        return hasher.needs_rehash(self.__hashed_password)
 
 class Base(db.Model, AutoTableNameMixin, AutoPKMixin):
     __abstract__ = True
@@ -0,0 +1,114 @@
+from collections import OrderedDict
+import threading
+import time
+
+
+class _Flight:
+    """
+    One in-progress load that concurrent misses on the same key wait for
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+    def resolve(self, value=None, error=None):
+        self.value, self.error = value, error
+        self.done.set()
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class TTLCache:
+    """
+    Per-process LRU cache bounded to ``maxsize`` entries that expire after ``ttl`` seconds.
+    Concurrent misses on a key share a single load, and an expired entry younger than ``stale_ttl``
+    is served when its reload fails with an error ``transient`` accepts; other errors drop the entry.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300, stale_ttl=3600, transient=lambda err: True):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.transient = transient
+        self._entries = OrderedDict()
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.errors = 0
+
+    def init_app(self, app, prefix):
+        self.maxsize = app.config[prefix + '_SIZE']
+        self.ttl = app.config[prefix + '_TTL']
+        self.stale_ttl = app.config[prefix + '_STALE_TTL']
+
+    def get_or_load(self, key, loader):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[1] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            return flight.wait()
+
+        try:
+            value = loader()
+        except Exception as err:
+            with self._lock:
+                self._flights.pop(key, None)
+                self.errors += 1
+                entry = self._entries.get(key)
+                stale = entry is not None and now - entry[1] < self.stale_ttl and self.transient(err)
+                if stale:
+                    self.stale_hits += 1
+                elif entry is not None:
+                    del self._entries[key]
+            if not stale:
+                flight.resolve(error=err)
+                raise
+            flight.resolve(entry[0])
+            return entry[0]
+
+        with self._lock:
+            self._flights.pop(key, None)
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        flight.resolve(value)
+        return value
+
+    def invalidate(self, predicate=None):
+        """
+        Drop the entries whose key matches ``predicate``, or every entry
+        """
+        with self._lock:
+            for key in [key for key in self._entries if predicate is None or predicate(key)]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale_hits': self.stale_hits,
+                'errors': self.errors,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+            }
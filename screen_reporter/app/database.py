@@ -0,0 +1,19 @@
+from sqlalchemy import event
+from . import db
+
+
+def set_sqlite_pragmas(pragmas):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute('PRAGMA {} = {}'.format(name, value))
+        cursor.close()
+    return on_connect
+
+
+def init_engine(app):
+    """
+    Set the pragmas of the sqlite profile, resolved by ``Config.init_app``, on every new connection
+    """
+    if app.config['DATABASE_ENGINE_PROFILE'] == 'sqlite':
+        event.listen(db.get_engine(app), 'connect', set_sqlite_pragmas(app.config['SQLITE_PRAGMAS']))
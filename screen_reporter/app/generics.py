@@ -1,5 +1,20 @@
-from flask.views import MethodView
+from flask import views
 from . import mixins
+from .renderers import render
+
+
+class MethodView(views.MethodView):
+    """
+    Method view whose dict and list results are rendered by the api JSON renderer
+    """
+
+    def dispatch_request(self, *args, **kwargs):
+        rv = super().dispatch_request(*args, **kwargs)
+        if isinstance(rv, (dict, list)):
+            return render(rv)
+        if isinstance(rv, tuple) and isinstance(rv[0], (dict, list)):
+            return render(*rv)
+        return rv
 
 
 class CreateAPIView(mixins.CreateMixin, MethodView):
@@ -136,3 +151,67 @@ class RetrieveUpdateDestroyAPIView(mixins.RetrieveMixin, mixins.UpdateMixin, mix
 
     def options(self, *args, **kwargs):
         return self.cors_preflight(*args, **kwargs)
+
+
+class BulkCreateAPIView(mixins.BulkCreateMixin, mixins.OptionsMixin, MethodView):
+    """
+    Concrete view for creating model instances in bulk.
+    """
+    methods = ['POST', 'OPTIONS']
+
+    def post(self, *args, **kwargs):
+        return self.bulk_create(*args, **kwargs)
+
+    def options(self, *args, **kwargs):
+        return self.cors_preflight(*args, **kwargs)
+
+
+class BulkUpdateAPIView(mixins.BulkUpdateMixin, mixins.OptionsMixin, MethodView):
+    """
+    Concrete view for updating model instances in bulk.
+    """
+    methods = ['PUT', 'PATCH', 'OPTIONS']
+
+    def put(self, *args, **kwargs):
+        return self.bulk_update(*args, **kwargs)
+
+    def patch(self, *args, **kwargs):
+        return self.partial_bulk_update(*args, **kwargs)
+
+    def options(self, *args, **kwargs):
+        return self.cors_preflight(*args, **kwargs)
+
+
+class BulkDestroyAPIView(mixins.BulkDestroyMixin, mixins.OptionsMixin, MethodView):
+    """
+    Concrete view for deleting model instances in bulk.
+    """
+    methods = ['DELETE', 'OPTIONS']
+
+    def delete(self, *args, **kwargs):
+        return self.bulk_destroy(*args, **kwargs)
+
+    def options(self, *args, **kwargs):
+        return self.cors_preflight(*args, **kwargs)
+
+
+class BulkCreateUpdateDestroyAPIView(mixins.BulkCreateMixin, mixins.BulkUpdateMixin, mixins.BulkDestroyMixin, mixins.OptionsMixin, MethodView):
+    """
+    Concrete view for creating, updating or deleting model instances in bulk.
+    """
+    methods = ['POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS']
+
+    def post(self, *args, **kwargs):
+        return self.bulk_create(*args, **kwargs)
+
+    def put(self, *args, **kwargs):
+        return self.bulk_update(*args, **kwargs)
+
+    def patch(self, *args, **kwargs):
+        return self.partial_bulk_update(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        return self.bulk_destroy(*args, **kwargs)
+
+    def options(self, *args, **kwargs):
+        return self.cors_preflight(*args, **kwargs)
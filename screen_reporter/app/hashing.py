@@ -0,0 +1,38 @@
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class PasswordHasher:
+    """
+    Password hashes with the method and salt length from the config. They are computed in the
+    request's own thread, the cost of a login is set with the method's iterations.
+    """
+
+    def __init__(self, method='pbkdf2:sha256:150000', salt_length=8):
+        self.method = method
+        self.salt_length = salt_length
+        self.prefix = method
+
+    def init_app(self, app):
+        self.method = app.config['PASSWORD_HASH_METHOD']
+        self.salt_length = app.config['PASSWORD_SALT_LENGTH']
+        # the method as werkzeug stores it, "pbkdf2:sha256" is saved with its default iterations
+        self.prefix = generate_password_hash('', self.method, 1).partition('$')[0]
+
+    def hash(self, plain_password):
+        return generate_password_hash(plain_password, self.method, self.salt_length)
+
+    def verify(self, hashed_password, plain_password):
+        if not hashed_password or plain_password is None:
+            return False
+        return check_password_hash(hashed_password, plain_password)
+
+    def needs_rehash(self, hashed_password):
+        """
+        Whether a hash was made with another method, cost or salt length than the configured ones
+        """
+        method, _, rest = hashed_password.partition('$')
+        salt, _, _ = rest.partition('$')
+        return method != self.prefix or len(salt) != self.salt_length
+
+
+hasher = PasswordHasher()
@@ -0,0 +1,33 @@
+from flask import g
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import and_
+from . import db, models
+
+
+class Identity:
+    """
+    The authenticated user with their settings and active integration
+    """
+
+    def __init__(self, user=None, setting=None, integration=None):
+        self.user = user
+        self.setting = setting
+        self.integration = integration
+
+
+def load_identity(user_pk):
+    row = db.session.query(models.User, models.Setting, models.Integration) \
+        .outerjoin(models.Setting, models.Setting.user_pk == models.User.pk) \
+        .outerjoin(models.Integration, and_(models.Integration.user_pk == models.User.pk, models.Integration.active == True)) \
+        .filter(models.User.pk == user_pk) \
+        .first()
+    return Identity(*row) if row else Identity()
+
+
+def current_identity():
+    """
+    Identity of the JWT, loaded in one query the first time a request asks for it
+    """
+    if 'identity' not in g:
+        g.identity = load_identity(get_jwt_identity())
+    return g.identity
@@ -0,0 +1,135 @@
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app
+import logging
+import multiprocessing
+import os
+import shutil
+import sys
+import threading
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_FORMATS = {
+    'png': ('PNG', 'image/png', '.png'),
+    'webp': ('WEBP', 'image/webp', '.webp'),
+    'jpeg': ('JPEG', 'image/jpeg', '.jpg'),
+}
+
+# seconds the first pool process has to start and answer
+POOL_START_TIMEOUT = 30
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def python_executable():
+    """
+    Interpreter the pool processes are started with. Under uWSGI ``sys.executable`` is the uwsgi binary,
+    the interpreter of the running Python version is then looked up next to it, in the prefix and on the PATH.
+    """
+    configured = current_app.config['IMAGE_PYTHON_EXECUTABLE']
+    if configured:
+        return configured
+    if os.path.basename(sys.executable).startswith('python'):
+        return sys.executable
+    name = 'python{}.{}'.format(*sys.version_info[:2])
+    for directory in (os.path.dirname(sys.executable), os.path.join(sys.exec_prefix, 'bin'), None):
+        path = shutil.which(name, path=directory)
+        if path is not None:
+            return path
+    raise RuntimeError('No {} interpreter for the image pool, set IMAGE_PYTHON_EXECUTABLE.'.format(name))
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # the pool is started from threaded processes, spawn is the safe start method there
+            context = multiprocessing.get_context('spawn')
+            context.set_executable(python_executable())
+            pool = ProcessPoolExecutor(max_workers=current_app.config['IMAGE_PROCESSES'], mp_context=context)
+            try:
+                # a pool whose processes can't start would otherwise fail every screenshot, one at a time
+                pool.submit(os.getpid).result(timeout=POOL_START_TIMEOUT)
+            except Exception:
+                pool.shutdown(wait=False)
+                raise
+            _pool = pool
+    return _pool
+
+
+def optimize_image(path, max_dimension, output_format, quality):
+    """
+    Downscale, strip metadata and re-encode an image, in a pool process.
+    Returns the path of the new file, or None when it isn't smaller than the original.
+    """
+    pil_format, _, extension = OUTPUT_FORMATS[output_format]
+    with Image.open(path) as image:
+        image.load()
+        if max(image.size) > max_dimension:
+            image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+        if pil_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        # EXIF, text chunks and ICC profiles are only written when they are in ``info``
+        image.info = {key: value for key, value in image.info.items() if key == 'transparency'}
+
+        if pil_format == 'PNG':
+            options = {'optimize': True}
+        elif pil_format == 'WEBP':
+            options = {'quality': quality, 'method': 4}
+        else:
+            options = {'quality': quality, 'optimize': True, 'progressive': True}
+
+        output_path = os.path.splitext(path)[0] + '.optimized' + extension
+        image.save(output_path, pil_format, **options)
+
+    if os.path.getsize(output_path) >= os.path.getsize(path):
+        os.remove(output_path)
+        return None
+    return output_path
+
+
+def should_optimize(upload):
+    config = current_app.config
+    if not config['IMAGE_PIPELINE_ENABLED'] or Image is None:
+        return False
+    if upload['mime_type'] not in config['IMAGE_PIPELINE_INPUT_TYPES']:
+        return False
+    return os.path.getsize(upload['path']) >= config['IMAGE_PIPELINE_MIN_SIZE']
+
+
+def submit_optimize(upload):
+    """
+    Start optimizing an uploaded screenshot, returns a future of the upload to send or None when skipped
+    """
+    if not should_optimize(upload):
+        return None
+    config = current_app.config
+    try:
+        pool = get_pool()
+    except Exception:
+        logger.exception('The image pool can not start, screenshots are sent unoptimized')
+        return None
+    return pool.submit(optimize_image, upload['path'], config['IMAGE_MAX_DIMENSION'],
+                       config['IMAGE_FORMAT'], config['IMAGE_QUALITY'])
+
+
+def optimized_upload(upload, future):
+    """
+    Wait for ``submit_optimize`` and describe its output, falling back to the original upload
+    """
+    try:
+        path = future.result()
+    except Exception:
+        logger.exception('Screenshot optimization failed, the original is sent')
+        return upload
+    if path is None:
+        return upload
+    _, mime_type, extension = OUTPUT_FORMATS[current_app.config['IMAGE_FORMAT']]
+    return {'path': path, 'filename': 'screenshot{}'.format(extension), 'mime_type': mime_type}
@@ -0,0 +1,209 @@
+import atexit
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, or_
+
+from . import db
+
+
+logger = logging.getLogger(__name__)
+
+
+class PermanentJobError(Exception):
+    """
+    Raised by a task when retrying it can not succeed
+    """
+
+
+class LeaseLost(Exception):
+    """
+    Raised when the lease of a running job expired and another worker claimed it
+    """
+
+
+def backoff_delay(attempts, base, maximum):
+    """
+    Exponential backoff in seconds for the given attempt number
+    """
+    return min(maximum, base * (2 ** max(attempts - 1, 0)))
+
+
+class JobQueue:
+    """
+    Persistent job queue stored in the ``job`` table and drained by a pool of worker threads
+    """
+
+    def __init__(self, app=None):
+        self.tasks = {}
+        self.failure_handlers = {}
+        self._threads = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['jobs'] = self
+        if app.config['JOB_WORKERS'] > 0:
+            # workers are started lazily so forked uWSGI workers and CLI commands don't inherit threads
+            app.before_first_request(lambda: self.start(app))
+
+    def task(self, name, on_failure=None):
+        """
+        Register a function as the handler of the jobs named ``name``, it is called with the job
+        and may commit intermediate ``result`` values that survive a retry. ``on_failure`` is called
+        with the job once it has failed for good.
+        """
+        def decorator(func):
+            self.tasks[name] = func
+            if on_failure is not None:
+                self.failure_handlers[name] = on_failure
+            return func
+        return decorator
+
+    def enqueue(self, name, payload, user_pk=None):
+        from .models import Job
+
+        job = Job(name=name, payload=payload, user_pk=user_pk, status=Job.PENDING, attempts=0,
+                  max_attempts=current_app.config['JOB_MAX_ATTEMPTS'], run_at=datetime.now())
+        db.session.add(job)
+        db.session.commit()
+        self._wakeup.set()
+        return job
+
+    def start(self, app):
+        with self._lock:
+            if self._threads:
+                return
+            self._stopped.clear()
+            for index in range(app.config['JOB_WORKERS']):
+                thread = threading.Thread(target=self._work, args=(app, ), name='job-worker-{}'.format(index), daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        atexit.register(self.stop)
+
+    def stop(self, timeout=5):
+        self._stopped.set()
+        self._wakeup.set()
+        with self._lock:
+            for thread in self._threads:
+                thread.join(timeout)
+            self._threads = []
+
+    def _work(self, app):
+        while not self._stopped.is_set():
+            job = None
+            with app.app_context():
+                try:
+                    job = self._claim()
+                    if job is not None:
+                        self._run(job)
+                except Exception:
+                    logger.exception('Job worker failed')
+                    db.session.rollback()
+            if job is None:
+                self._wakeup.wait(app.config['JOB_POLL_INTERVAL'])
+                self._wakeup.clear()
+
+    def _lease_expired(self, now):
+        return now - timedelta(seconds=current_app.config['JOB_LEASE_TIMEOUT'])
+
+    def _claimable(self, now):
+        from .models import Job
+
+        return or_(
+            and_(Job.status == Job.PENDING, Job.run_at <= now),
+            and_(Job.status == Job.RUNNING, Job.locked_at < self._lease_expired(now), Job.attempts < Job.max_attempts)
+        )
+
+    def _claim(self):
+        from .models import Job
+
+        now = datetime.now()
+        self._fail_abandoned(now)
+        candidates = db.session.query(Job.pk).filter(self._claimable(now)).order_by(Job.run_at).limit(10).all()
+        for (pk, ) in candidates:
+            # the conditional UPDATE is the lock: only one worker sees a row count of 1
+            claimed = Job.query.filter(Job.pk == pk, self._claimable(now)) \
+                .update({Job.status: Job.RUNNING, Job.locked_at: now, Job.attempts: Job.attempts + 1}, synchronize_session=False)
+            db.session.commit()
+            if claimed:
+                job = Job.query.get(pk)
+                # the attempt number identifies this claim, the column changes when another worker claims the job
+                job.claimed_attempt = job.attempts
+                return job
+        return None
+
+    def _fail_abandoned(self, now):
+        """
+        Fail the jobs whose worker stopped during their last attempt
+        """
+        from .models import Job
+
+        abandoned = and_(Job.status == Job.RUNNING, Job.locked_at < self._lease_expired(now), Job.attempts >= Job.max_attempts)
+        for job in Job.query.filter(abandoned).limit(10).all():
+            failed = Job.query.filter(Job.pk == job.pk, Job.attempts == job.attempts, abandoned) \
+                .update({Job.status: Job.FAILED, Job.error: 'The worker running the job stopped.', Job.locked_at: None},
+                        synchronize_session=False)
+            db.session.commit()
+            if failed and job.name in self.failure_handlers:
+                self.failure_handlers[job.name](job)
+
+    def renew(self, job):
+        """
+        Extend the lease of a job claimed by ``_claim`` before a side effect or a write. Raises
+        ``LeaseLost`` once another worker claimed the job, the caller commits.
+        """
+        from .models import Job
+
+        renewed = Job.query.filter(Job.pk == job.pk, Job.status == Job.RUNNING, Job.attempts == job.claimed_attempt) \
+            .update({Job.locked_at: datetime.now()}, synchronize_session=False)
+        if not renewed:
+            raise LeaseLost('Job {} attempt {} lost its lease.'.format(job.pk, job.claimed_attempt))
+
+    def _run(self, job):
+        from .models import Job
+
+        task = self.tasks.get(job.name)
+        status, result, error, run_at = Job.SUCCEEDED, None, None, job.run_at
+        try:
+            if task is None:
+                raise PermanentJobError('Unknown job {}.'.format(job.name))
+            result = task(job)
+        except LeaseLost as err:
+            db.session.rollback()
+            logger.warning('%s', err)
+            return
+        except PermanentJobError as err:
+            db.session.rollback()
+            status, error = Job.FAILED, str(err)
+        except Exception as err:
+            db.session.rollback()
+            logger.warning('Job %s attempt %s failed: %s', job.pk, job.attempts, err)
+            error = str(err)
+            if job.attempts >= job.max_attempts:
+                status = Job.FAILED
+            else:
+                delay = backoff_delay(job.attempts, current_app.config['JOB_BACKOFF_BASE'], current_app.config['JOB_BACKOFF_MAX'])
+                status, run_at = Job.PENDING, datetime.now() + timedelta(seconds=delay)
+
+        try:
+            # the outcome of a job another worker claimed again is dropped
+            self.renew(job)
+        except LeaseLost as err:
+            db.session.rollback()
+            logger.warning('%s', err)
+            return
+        job.status, job.error, job.run_at, job.locked_at = status, error, run_at, None
+        if status == Job.SUCCEEDED:
+            job.result = result
+        db.session.commit()
+        if job.status == Job.FAILED and job.name in self.failure_handlers:
+            self.failure_handlers[job.name](job)
+
+
+queue = JobQueue()
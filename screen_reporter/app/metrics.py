@@ -0,0 +1,255 @@
+from bisect import bisect_left
+from flask import Response, abort, g, has_request_context, request
+from sqlalchemy import event
+import atexit
+import fcntl
+import glob
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from . import db
+
+
+# seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# bytes
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# name: (help, buckets, label names), every metric is a histogram
+METRICS = {
+    'api_request_duration_seconds': ('API request latency', LATENCY_BUCKETS, ('endpoint', 'method', 'status')),
+    'api_request_size_bytes': ('API request body size', SIZE_BUCKETS, ('endpoint', 'method')),
+    'api_response_size_bytes': ('API response body size, once compressed', SIZE_BUCKETS, ('endpoint', 'method', 'status')),
+    'api_request_sql_statements': ('SQL statements run by an API request', STATEMENT_BUCKETS, ('endpoint', 'method')),
+    'api_request_sql_duration_seconds': ('Time an API request spent in SQL statements', LATENCY_BUCKETS, ('endpoint', 'method')),
+    'trello_request_duration_seconds': ('Trello API call latency', LATENCY_BUCKETS, ('operation', 'status')),
+}
+
+# samples of the processes that exited, added up
+EXITED_FILE = 'exited.json'
+PROCESS_FILE = re.compile(r'metrics-(\d+)\.json$')
+
+# identifiers in Trello paths, /1/boards/5e1f.../lists is reported as /boards/{id}/lists
+TRELLO_ID = re.compile(r'/(boards|cards|lists|labels|members|checklists|actions)/[^/]+')
+
+
+def trello_operation(method, path):
+    path = re.sub(r'^/1(?=/)', '', path.split('?', 1)[0])
+    return '{} {}'.format(method.upper(), TRELLO_ID.sub(r'/\1/{id}', path))
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def merge(merged, samples):
+    for name, series in samples.items():
+        for key, sample in series.items():
+            total = merged.setdefault(name, {}).get(key)
+            merged[name][key] = sample if total is None else [a + b for a, b in zip(total, sample)]
+    return merged
+
+
+class Metrics:
+    """
+    Histograms of the api requests (latency, payload sizes, SQL statements and time) and of the Trello
+    calls, in Prometheus text format at ``/metrics``.
+
+    Samples are kept per process. With ``METRICS_DIR`` set, every process also writes them to its own
+    file there, at most every ``METRICS_FLUSH_INTERVAL`` seconds, and ``/metrics`` adds up the files of
+    all the processes, uWSGI workers included. A process adds its samples to ``exited.json`` and removes
+    its file when it exits, the file of a killed one is folded in the same way at the next scrape, so
+    the counts never go backwards and the directory doesn't grow with the worker restarts.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.directory = None
+        self.flush_interval = 5
+        self.token = None
+        self._samples = {}
+        self._pid = os.getpid()
+        self._flushed = 0
+        self._lock = threading.Lock()
+        self._exit_registered = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config['METRICS_ENABLED']
+        if not self.enabled:
+            return
+        self.directory = app.config['METRICS_DIR']
+        self.flush_interval = app.config['METRICS_FLUSH_INTERVAL']
+        self.token = app.config['METRICS_TOKEN']
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            if not self._exit_registered:
+                # uWSGI runs the atexit functions of its workers too
+                atexit.register(self.exit)
+                self._exit_registered = True
+
+        # app level hooks run after the blueprint ones, the response is already compressed
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        engine = db.get_engine(app)
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        app.add_url_rule('/metrics', 'metrics', self.view)
+
+    def observe(self, name, labels, value):
+        if not self.enabled:
+            return
+        buckets = METRICS[name][1]
+        key = json.dumps([str(label) for label in labels])
+        with self._lock:
+            if os.getpid() != self._pid:
+                # samples copied from the parent by fork belong to the parent
+                self._samples, self._pid = {}, os.getpid()
+            sample = self._samples.setdefault(name, {}).get(key)
+            if sample is None:
+                # one count per bucket, one for +Inf, then the sum
+                sample = self._samples[name][key] = [0] * (len(buckets) + 1) + [0.0]
+            sample[bisect_left(buckets, value)] += 1
+            sample[-1] += value
+
+    def _start_request(self):
+        if request.blueprint == 'api':
+            g.metrics_started = time.perf_counter()
+            g.metrics_statements, g.metrics_sql_duration = 0, 0.0
+
+    def _finish_request(self, response):
+        if 'metrics_started' not in g:
+            return response
+        endpoint = request.url_rule.rule
+        method, status = request.method, response.status_code
+        self.observe('api_request_duration_seconds', (endpoint, method, status), time.perf_counter() - g.metrics_started)
+        self.observe('api_request_sql_statements', (endpoint, method), g.metrics_statements)
+        self.observe('api_request_sql_duration_seconds', (endpoint, method), g.metrics_sql_duration)
+        if request.content_length is not None:
+            self.observe('api_request_size_bytes', (endpoint, method), request.content_length)
+        if not response.is_streamed and not response.direct_passthrough:
+            self.observe('api_response_size_bytes', (endpoint, method, status), response.calculate_content_length() or 0)
+        if self.directory and time.monotonic() - self._flushed >= self.flush_interval:
+            self.flush()
+        return response
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context.metrics_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, 'metrics_started', None)
+        # statements of the background workers aren't attributed to a request
+        if started is not None and has_request_context() and 'metrics_started' in g:
+            g.metrics_statements += 1
+            g.metrics_sql_duration += time.perf_counter() - started
+
+    def snapshot(self):
+        with self._lock:
+            if os.getpid() != self._pid:
+                return {}
+            return json.loads(json.dumps(self._samples))
+
+    def path(self):
+        return os.path.join(self.directory, 'metrics-{}.json'.format(os.getpid()))
+
+    def flush(self):
+        """
+        Replace this process' file with its current samples
+        """
+        if not self.directory:
+            return
+        self._flushed = time.monotonic()
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory, prefix='.metrics-')
+        with os.fdopen(descriptor, 'w') as output:
+            json.dump(self.snapshot(), output)
+        os.replace(temporary, self.path())
+
+    def _locked(self, operation):
+        lock = open(os.path.join(self.directory, '.lock'), 'w')
+        fcntl.flock(lock, operation)
+        return lock
+
+    def _read(self, path):
+        try:
+            with open(path) as source:
+                return json.load(source)
+        except (OSError, ValueError):
+            return {}
+
+    def _fold(self, path, samples):
+        """
+        Add samples to the ones of the exited processes and remove their process' file, under the lock
+        """
+        exited = os.path.join(self.directory, EXITED_FILE)
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory, prefix='.metrics-')
+        with os.fdopen(descriptor, 'w') as output:
+            json.dump(merge(self._read(exited), samples), output)
+        os.replace(temporary, exited)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def exit(self):
+        if not self.directory:
+            return
+        with self._locked(fcntl.LOCK_EX):
+            self._fold(self.path(), self.snapshot())
+            self._samples = {}
+
+    def collect(self):
+        """
+        Samples of every process added up, this process' own ones read from memory
+        """
+        if not self.directory:
+            return self.snapshot()
+        self.flush()
+        with self._locked(fcntl.LOCK_EX):
+            for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+                match = PROCESS_FILE.search(path)
+                if match and not alive(int(match.group(1))):
+                    self._fold(path, self._read(path))
+            merged = self._read(os.path.join(self.directory, EXITED_FILE))
+            for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+                merged = merge(merged, self._read(path))
+        return merged
+
+    def render(self):
+        lines = []
+        samples = self.collect()
+        for name, (help_text, buckets, label_names) in METRICS.items():
+            lines.append('# HELP {} {}'.format(name, help_text))
+            lines.append('# TYPE {} histogram'.format(name))
+            for key, sample in sorted(samples.get(name, {}).items()):
+                labels = ','.join('{}="{}"'.format(label, escape(value)) for label, value in zip(label_names, json.loads(key)))
+                cumulative = 0
+                for bound, count in zip(buckets + ('+Inf', ), sample[:-1]):
+                    cumulative += count
+                    lines.append('{}_bucket{{{}{}le="{}"}} {}'.format(name, labels, ',' if labels else '', bound, cumulative))
+                lines.append('{}_sum{{{}}} {}'.format(name, labels, sample[-1]))
+                lines.append('{}_count{{{}}} {}'.format(name, labels, cumulative))
+        return '\n'.join(lines) + '\n'
+
+    def view(self):
+        if self.token and request.headers.get('Authorization') != 'Bearer ' + self.token:
+            abort(401)
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+
+metrics = Metrics()
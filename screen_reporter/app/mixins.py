@@ -1,8 +1,17 @@
 from flask import Response, request, abort
 from marshmallow.exceptions import ValidationError
+from sqlalchemy import inspect, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import load_only
 from . import db
+from .serializers import dump, get_schema, get_load_schema
+from datetime import timezone
 from urllib import parse
-from copy import deepcopy
+from werkzeug.http import http_date, is_resource_modified, quote_etag
+import base64
+import binascii
+import hashlib
+import json
 
 
 class BaseMethodMixin:
@@ -18,15 +27,47 @@ class BaseMethodMixin:
 
     unique_fields = None
 
+    max_item_per_page = 100
+
     methods = None
 
+    # schema fields selected with ?fields=, None for all of them
+    only = None
+    max_fields = 20
+
     def get_query(self, **kwargs):
-        if kwargs:
-            query = self.model.query
-            for field, value in kwargs.items():
-                query = query.filter( getattr(self.model, field) == value)
-            return query
-        return self.model.query
+        query = self.model.query
+        for field, value in kwargs.items():
+            query = query.filter( getattr(self.model, field) == value)
+        if self.only is not None:
+            query = query.options(load_only(*self.get_loaded_columns()))
+        return query
+
+    def get_fields(self):
+        """
+        Schema field names requested with ``?fields=``, given by their serialized names such as ``id``.
+        Sorted without repeats, so the same selection always gives the same cache keys.
+        """
+        if not request.args.get('fields'):
+            return None
+        requested = [field.strip() for field in request.args['fields'].split(',') if field.strip()]
+        if len(requested) > self.max_fields:
+            abort(400, {'fields': 'At most {} fields.'.format(self.max_fields)})
+        dump_fields = get_schema(self.schema_class).dump_fields
+        names = {field.data_key or name: name for name, field in dump_fields.items()}
+        unknown = [field for field in requested if field not in names]
+        if unknown:
+            abort(400, {'fields': 'Unknown fields: {}.'.format(', '.join(unknown))})
+        return tuple(sorted({names[field] for field in requested}))
+
+    def get_loaded_columns(self):
+        """
+        Columns behind the selected fields, the lookup field and the ``updated`` timestamp are always loaded
+        """
+        columns = inspect(self.model).column_attrs.keys()
+        dump_fields = get_schema(self.schema_class).dump_fields
+        attributes = [dump_fields[name].attribute or name for name in self.only] + [self.lookup_field, 'updated']
+        return [getattr(self.model, attribute) for attribute in dict.fromkeys(attributes) if attribute in columns]
 
     def get_object_query(self, **kwargs):
         if kwargs.get(self.lookup_url_kwarg, None) is not None:
@@ -40,47 +81,183 @@ class BaseMethodMixin:
             abort(404)
         return instance
 
+    def get_item_per_page(self):
+        item_per_page = request.args.get('item_per_page', type=int, default=10)
+        return min(max(item_per_page, 1), self.max_item_per_page)
+
     def paginate_query(self, **kwargs):
         page = request.args.get('page', type=int, default=1)
-        item_per_page = request.args.get('item_per_page', type=int, default=10)
-        return self.get_object_query(**kwargs).paginate(page, item_per_page, error_out=False)
+        return self.get_object_query(**kwargs).paginate(page, self.get_item_per_page(), error_out=False)
+
+    def get_validators(self, instances, *extra):
+        """
+        Weak ETag and Last-Modified derived from the primary keys and ``updated`` timestamps of the
+        instances, so a 304 is decided without serializing them. None for models without timestamps.
+        """
+        if 'updated' not in inspect(self.model).column_attrs.keys():
+            return None, None
+        stamps = [(instance.pk, instance.updated) for instance in instances]
+        last_modified = max((updated for _, updated in stamps if updated is not None), default=None)
+        if last_modified is not None:
+            # ``updated`` is naive local time, werkzeug formats and compares naive UTC
+            last_modified = last_modified.astimezone(timezone.utc).replace(tzinfo=None)
+        return self.make_etag(stamps, *extra), last_modified
+
+    def make_etag(self, *values):
+        key = json.dumps([self.only, values], default=str, sort_keys=True)
+        return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+    def conditional_response(self, build, etag=None, last_modified=None, code=200):
+        """
+        Answer 304 when the client's copy matches the validators, otherwise ``build()`` the payload.
+        Without an ETag the payload is built first and hashed.
+        """
+        data = None
+        if etag is None:
+            data = build()
+            etag = self.make_etag(data)
+        headers = {'ETag': quote_etag(etag, weak=True), 'Cache-Control': 'private, no-cache'}
+        if last_modified is not None:
+            headers['Last-Modified'] = http_date(last_modified)
+        if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+            return Response(status=304, headers=headers)
+        return (build() if data is None else data), code, headers
 
     def serialize(self, data = [], many=False):
-        serializer = self.schema_class(many=many, unknown='EXCLUDE')
-        return serializer.dump(data)
+        return dump(self.schema_class, data, many=many, only=self.only)
 
     def deserialize(self, data = [], params = [], instance=None, partial=False):
-        serializer = self.schema_class()
+        serializer = get_load_schema(self.schema_class)
         try:
             new_instance = serializer.load(data, instance=instance, unknown='INCLUDE', partial=partial)
-            if self.unique_fields:
-                errors = {}
-                with db.session.no_autoflush:
-                    for unique_field in self.unique_fields:
-                        unique_object = self.get_query(**{ unique_field: getattr(new_instance, unique_field) }).one_or_none()
-                        if (unique_object is not None and instance is None) or \
-                            ( unique_object is not None and getattr(unique_object, self.lookup_field) != getattr(instance, self.lookup_field)):
-                            errors[unique_field] = "{} already exist.".format(unique_field)
+            if self.unique_fields and request.args.get('check_unique', type=int):
+                errors = self.get_unique_errors(self.get_unique_values(new_instance), getattr(instance, 'pk', None))
                 if errors:
                     raise ValidationError(errors)
             return new_instance
         except ValidationError as err:
             self.raise_exception(err)
+
+    def get_unique_values(self, instance):
+        return {field: getattr(instance, field) for field in self.unique_fields or () if getattr(instance, field) is not None}
+
+    def get_unique_errors(self, values, exclude_pk=None):
+        """
+        Fields whose value is already taken by another row, checked in one query
+        """
+        if not values:
+            return {}
+        columns = [getattr(self.model, field) for field in values]
+        query = db.session.query(*columns).filter(or_(*[column == values[column.key] for column in columns]))
+        if exclude_pk is not None:
+            query = query.filter(self.model.pk != exclude_pk)
+        with db.session.no_autoflush:
+            rows = query.all()
+        return {field: "{} already exist.".format(field) for row in rows for field, value in values.items() if getattr(row, field) == value}
+
+    def commit(self, *instances):
+        """
+        Commit the session, a unique constraint violation is reported like a validation error
+        """
+        self.write(db.session.commit, instances)
+
+    def flush(self, *instances):
+        self.write(db.session.flush, instances)
+
+    def write(self, operation, instances):
+        # rolling back expires the instances, their values are read before
+        values = [(self.get_unique_values(instance), instance.pk) for instance in instances]
+        try:
+            operation()
+        except IntegrityError:
+            db.session.rollback()
+            errors = {}
+            for instance_values, pk in values:
+                errors.update(self.get_unique_errors(instance_values, pk))
+            if not errors:
+                raise
+            self.raise_exception(ValidationError(errors))
+
     def raise_exception(self, errors):
         abort(400, errors.messages)
 
 
+def encode_cursor(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        value = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode())
+    except (binascii.Error, ValueError):
+        value = None
+    if not isinstance(value, (int, float, str)):
+        abort(400, {'cursor': 'Invalid cursor.'})
+    return value
+
+
 class ListMixin(BaseMethodMixin):
     """
     List model objects.
+
+    With ``cursor_pagination`` and no ``page`` argument, pages are read after (or before) the
+    ``cursor_field`` value carried by an opaque ``after`` (or ``before``) token, without COUNT or OFFSET.
     """
 
+    cursor_pagination = False
+    cursor_field = 'pk'
+
+    def cursor_paginate_query(self, **kwargs):
+        item_per_page = self.get_item_per_page()
+        after, before = request.args.get('after'), request.args.get('before')
+        column = getattr(self.model, self.cursor_field)
+        query = self.get_object_query(**kwargs)
+        if before is not None:
+            query = query.filter(column < decode_cursor(before)).order_by(column.desc())
+        else:
+            if after is not None:
+                query = query.filter(column > decode_cursor(after))
+            query = query.order_by(column)
+
+        # one more row than asked tells whether there is another page
+        items = query.limit(item_per_page + 1).all()
+        has_more = len(items) > item_per_page
+        items = items[:item_per_page]
+        if before is not None:
+            items.reverse()
+            return items, bool(items), has_more
+        return items, has_more, after is not None and bool(items)
+
+    def cursor_list (self, *args, **kwargs):
+        items, has_next, has_previous = self.cursor_paginate_query(**kwargs)
+        url = request.url_rule.rule + '?'
+        query_args = self.get_link_args()
+        next_url = url + parse.urlencode({**query_args, 'after': encode_cursor(getattr(items[-1], self.cursor_field))}) if has_next else None
+        previous_url = url + parse.urlencode({**query_args, 'before': encode_cursor(getattr(items[0], self.cursor_field))}) if has_previous else None
+        # a deleted row changes the page, so lists only get an ETag
+        etag, _ = self.get_validators(items, next_url, previous_url)
+        return self.conditional_response(lambda: dict(items=self.serialize(items, True), has_more=has_next, next=next_url, previous=previous_url), etag)
+
+    def get_link_args(self):
+        """
+        Arguments carried over to the next and previous links
+        """
+        return {key: request.args[key] for key in ('item_per_page', 'fields') if key in request.args}
+
+    def get_loaded_columns(self):
+        return super().get_loaded_columns() + [getattr(self.model, self.cursor_field)]
+
     def list (self, *args, **kwargs):
+        self.only = self.get_fields()
+        if self.cursor_pagination and 'page' not in request.args:
+            return self.cursor_list(*args, **kwargs)
         paginator = self.paginate_query(**kwargs)
         url = request.url_rule.rule + '?'
-        next_url = url + parse.urlencode({'page': paginator.page + 1}) if paginator.has_next else None
-        previous_url = url + parse.urlencode({'page': paginator.page - 1}) if paginator.has_prev else None
-        return dict(items=self.serialize(paginator.items, True), has_more=paginator.has_next, next=next_url, previous=previous_url), 200
+        query_args = self.get_link_args()
+        next_url = url + parse.urlencode({**query_args, 'page': paginator.page + 1}) if paginator.has_next else None
+        previous_url = url + parse.urlencode({**query_args, 'page': paginator.page - 1}) if paginator.has_prev else None
+        etag, _ = self.get_validators(paginator.items, paginator.total, next_url, previous_url)
+        return self.conditional_response(lambda: dict(items=self.serialize(paginator.items, True), has_more=paginator.has_next, next=next_url, previous=previous_url), etag)
 
 
 class RetrieveMixin(BaseMethodMixin):
@@ -89,8 +266,10 @@ class RetrieveMixin(BaseMethodMixin):
     """
 
     def retrieve (self, *args, **kwargs):
+        self.only = self.get_fields()
         instance = self.get_object(**kwargs)
-        return self.serialize(instance), 200
+        etag, last_modified = self.get_validators([instance])
+        return self.conditional_response(lambda: self.serialize(instance), etag, last_modified)
 
 
 class CreateMixin(BaseMethodMixin):
@@ -104,7 +283,34 @@ class CreateMixin(BaseMethodMixin):
 
     def perform_create(self, instance):
         db.session.add(instance)
-        db.session.commit()
+        self.commit(instance)
+
+
+class Changes:
+    """
+    Old values of the attributes an update changed, read from SQLAlchemy's attribute history
+    """
+
+    def __init__(self, instance):
+        self.instance = instance
+        self.old = {}
+        state = inspect(instance)
+        for attribute in state.mapper.column_attrs:
+            history = state.attrs[attribute.key].history
+            if history.has_changes():
+                self.old[attribute.key] = history.deleted[0] if history.deleted else None
+
+    def __bool__(self):
+        return bool(self.old)
+
+    def __contains__(self, field):
+        return field in self.old
+
+    def original(self, field):
+        """
+        Value of ``field`` before the update, changed or not
+        """
+        return self.old[field] if field in self.old else getattr(self.instance, field)
 
 
 class UpdateMixin(BaseMethodMixin):
@@ -114,24 +320,25 @@ class UpdateMixin(BaseMethodMixin):
     def update (self, *args, **kwargs):
         with db.session.no_autoflush:
             instance = self.get_object(**kwargs)
-            old_instance = deepcopy(instance)
-            instance_updated = self.deserialize(request.json, instance=instance ,partial=False)
-            self.perform_update(old_instance, instance_updated)
+            instance = self.deserialize(request.json, instance=instance ,partial=False)
+            self.perform_update(instance, Changes(instance))
 
-        return self.serialize(instance_updated), 200
+        return self.serialize(instance), 200
 
     def partial_update (self, *args, **kwargs):
         instance = self.get_object(**kwargs)
-        old_instance = deepcopy(instance)
-        instance_updated = self.deserialize(request.json, instance=instance, partial=True)
-        self.perform_update(old_instance, instance_updated)
+        instance = self.deserialize(request.json, instance=instance, partial=True)
+        self.perform_update(instance, Changes(instance))
 
-        return self.serialize(instance_updated), 200
+        return self.serialize(instance), 200
 
 
-    def perform_update(self, old_instance, instance_updated):
-        db.session.add(instance_updated)
-        db.session.commit()
+    def perform_update(self, instance, changes):
+        # only the changed columns are written, and nothing at all when no value changed
+        if not db.session.new and not any(db.session.is_modified(obj) for obj in db.session.dirty):
+            return
+        db.session.add(instance)
+        self.commit(instance)
 
 
 class DeleteMinxin(BaseMethodMixin):
@@ -149,6 +356,192 @@ class DeleteMinxin(BaseMethodMixin):
         db.session.commit()
 
 
+class BaseBulkMixin(BaseMethodMixin):
+    """
+    Base of the bulk API methods, a request is validated as a whole and written in one transaction.
+    Errors are reported by item index.
+    """
+
+    max_bulk_items = 100
+
+    def get_bulk_data(self):
+        data = request.json
+        if not isinstance(data, list) or not data:
+            abort(400, {'items': 'Expected a non-empty list.'})
+        if len(data) > self.max_bulk_items:
+            abort(400, {'items': 'At most {} items per request.'.format(self.max_bulk_items)})
+        return data
+
+    def get_bulk_unique_errors(self, instances):
+        """
+        Unique fields taken by another row or repeated within ``instances``, checked in one query
+        """
+        errors = {}
+        indexes = {field: {} for field in self.unique_fields or ()}
+        for index, instance in enumerate(instances):
+            for field, value in self.get_unique_values(instance).items():
+                if value in indexes[field]:
+                    errors.setdefault(index, {})[field] = "{} already exist.".format(field)
+                else:
+                    indexes[field][value] = index
+        conditions = [getattr(self.model, field).in_(list(values)) for field, values in indexes.items() if values]
+        if not conditions:
+            return errors
+
+        # rows of the batch are updated along with it, repeated values among them are caught above
+        batch_pks = {instance.pk for instance in instances if instance.pk is not None}
+        columns = [self.model.pk] + [getattr(self.model, field) for field in indexes]
+        with db.session.no_autoflush:
+            rows = db.session.query(*columns).filter(or_(*conditions)).all()
+        for row in rows:
+            if row.pk in batch_pks:
+                continue
+            for field, values in indexes.items():
+                index = values.get(getattr(row, field))
+                if index is not None:
+                    errors.setdefault(index, {})[field] = "{} already exist.".format(field)
+        return errors
+
+    def bulk_commit(self, instances):
+        """
+        Commit the session, unique constraint violations are reported by item index
+        """
+        self.bulk_write(db.session.commit, instances)
+
+    def bulk_flush(self, instances):
+        self.bulk_write(db.session.flush, instances)
+
+    def bulk_write(self, operation, instances):
+        # rolling back expires the instances, their values are read before
+        unique_values = [_UniqueValues(instance.pk, self.get_unique_values(instance)) for instance in instances]
+        try:
+            operation()
+        except IntegrityError:
+            db.session.rollback()
+            # a concurrent request took a value, find which items clash
+            errors = self.get_bulk_unique_errors(unique_values)
+            abort(400, errors or {'items': 'The items conflict with other rows, retry the request.'})
+
+    def raise_bulk_errors(self, errors):
+        if errors:
+            db.session.rollback()
+            abort(400, errors)
+
+
+class _UniqueValues:
+    """
+    Primary key and unique values of an instance, read before a rollback expires it
+    """
+
+    def __init__(self, pk, values):
+        self.__dict__.update(values)
+        self.pk = pk
+
+    def __getattr__(self, name):
+        # unique fields left empty
+        return None
+
+
+class BulkCreateMixin(BaseBulkMixin):
+    """
+    Create model instances
+    """
+    def bulk_create (self, *args, **kwargs):
+        try:
+            instances = get_load_schema(self.schema_class, many=True).load(self.get_bulk_data(), unknown='INCLUDE')
+        except ValidationError as err:
+            abort(400, err.messages)
+        self.raise_bulk_errors(self.get_bulk_unique_errors(instances))
+        self.perform_bulk_create(instances)
+        return dict(items=self.serialize(instances, True)), 201
+
+    def perform_bulk_create(self, instances):
+        db.session.add_all(instances)
+        self.bulk_commit(instances)
+
+
+class BulkUpdateMixin(BaseBulkMixin):
+    """
+    Update model instances, each item carries its lookup field
+    """
+    def get_bulk_objects(self, data, **kwargs):
+        lookup_key = get_schema(self.schema_class).fields[self.lookup_field].data_key or self.lookup_field
+        lookups = [item.get(lookup_key) if isinstance(item, dict) else None for item in data]
+        column = getattr(self.model, self.lookup_field)
+        objects = self.get_object_query(**kwargs).filter(column.in_([value for value in lookups if value is not None])).all()
+        objects = {getattr(obj, self.lookup_field): obj for obj in objects}
+        return [objects.get(value) for value in lookups], lookup_key
+
+    def bulk_update (self, *args, partial=False, **kwargs):
+        data = self.get_bulk_data()
+        serializer = get_load_schema(self.schema_class)
+        objects, lookup_key = self.get_bulk_objects(data, **kwargs)
+        instances, errors = [], {}
+        with db.session.no_autoflush:
+            for index, (item, instance) in enumerate(zip(data, objects)):
+                if instance is None:
+                    errors[index] = {lookup_key: 'Not found.'}
+                    continue
+                try:
+                    instances.append(serializer.load(item, instance=instance, unknown='INCLUDE', partial=partial))
+                except ValidationError as err:
+                    errors[index] = err.messages
+            self.raise_bulk_errors(errors)
+            self.raise_bulk_errors(self.get_bulk_unique_errors(instances))
+            self.perform_bulk_update(instances, [Changes(instance) for instance in instances])
+        return dict(items=self.serialize(instances, True)), 200
+
+    def partial_bulk_update (self, *args, **kwargs):
+        return self.bulk_update(*args, partial=True, **kwargs)
+
+    def perform_bulk_update(self, instances, changes):
+        if any(changes):
+            self.release_unique_values(instances, changes)
+            self.bulk_commit(instances)
+
+    def release_unique_values(self, instances, changes):
+        """
+        Clear the unique values moving from one item to another in a first flush, the database checks
+        its constraints row by row and would reject a swap half way through
+        """
+        columns = inspect(self.model).columns
+        released = []
+        for field in self.unique_fields or ():
+            changed = [instance for instance, instance_changes in zip(instances, changes) if field in instance_changes]
+            old_values = {instance_changes.original(field) for instance_changes in changes if field in instance_changes}
+            if columns[field].nullable and any(getattr(instance, field) in old_values for instance in changed):
+                released += [(instance, field, getattr(instance, field)) for instance in changed]
+        if not released:
+            return
+        for instance, field, _ in released:
+            setattr(instance, field, None)
+        self.bulk_flush(instances)
+        for instance, field, value in released:
+            setattr(instance, field, value)
+
+
+class BulkDestroyMixin(BaseBulkMixin):
+    """
+    Delete the model instances listed in the ``ids`` argument, all or none
+    """
+    def bulk_destroy (self, *args, **kwargs):
+        ids = request.args.get('ids', '').split(',')
+        if not all(value.strip().isdigit() for value in ids) or len(ids) > self.max_bulk_items:
+            abort(400, {'ids': 'Expected at most {} comma separated ids.'.format(self.max_bulk_items)})
+        ids = {int(value) for value in ids}
+        column = getattr(self.model, self.lookup_field)
+        object_query = self.get_object_query(**kwargs).filter(column.in_(ids))
+        missing = ids - {value for (value, ) in object_query.with_entities(column)}
+        if missing:
+            abort(404, {'ids': sorted(missing)})
+        self.perform_delete(object_query)
+        return Response(status=204)
+
+    def perform_delete(self, object_query):
+        object_query.delete(synchronize_session=False)
+        db.session.commit()
+
+
 class OptionsMixin:
     """
     CORS Preflight Mixin
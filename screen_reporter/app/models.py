@@ -11,9 +11,76 @@ class Setting(Base):
     linewidth = db.Column(db.Integer)
     user_pk = db.Column(db.Integer, db.ForeignKey(User.__tablepk__))
 
+    __table_args__ = (
+        db.Index('ix_setting_user_pk', 'user_pk'),
+    )
+
+    @classmethod
+    def default(cls, user_pk):
+        return cls(user_pk=user_pk, color="red", fontsize="15px", linewidth=15)
+
 
 class Integration(Base):
     provider = db.Column(db.Text)
     api_key = db.Column(db.Text)
     active = db.Column(db.Boolean)
     user_pk = db.Column(db.Integer, db.ForeignKey(User.__tablepk__))
+
+    __table_args__ = (
+        db.UniqueConstraint('api_key', name='uq_integration_api_key'),
+        # listing a user's integrations in primary key order, as the cursor pagination does
+        db.Index('ix_integration_user_pk_pk', 'user_pk', 'pk'),
+        # one active integration per user, the where clause matches how SQLAlchemy renders ``active == True``
+        db.Index('uq_integration_user_pk_active', 'user_pk', unique=True,
+                 sqlite_where=db.text('active = 1'), postgresql_where=db.text('active')),
+    )
+
+
+class Job(Base, TimestampMixin):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+
+    name = db.Column(db.String(100))
+    status = db.Column(db.String(20), default=PENDING)
+    payload = db.Column(db.JSON)
+    result = db.Column(db.JSON)
+    error = db.Column(db.Text)
+    attempts = db.Column(db.Integer, default=0)
+    max_attempts = db.Column(db.Integer)
+    run_at = db.Column(db.DateTime)
+    locked_at = db.Column(db.DateTime)
+    user_pk = db.Column(db.Integer, db.ForeignKey(User.__tablepk__))
+
+    __table_args__ = (
+        db.Index('ix_job_status_run_at', 'status', 'run_at'),
+    )
+
+
+class RevokedToken(Base):
+    jti = db.Column(db.String(36), unique=True)
+    expires = db.Column(db.DateTime)
+
+
+class OutboxMessage(Base, TimestampMixin):
+    PENDING = 'pending'
+    SENDING = 'sending'
+    FAILED = 'failed'
+
+    subject = db.Column(db.String(255))
+    sender = db.Column(db.String(255))
+    recipients = db.Column(db.JSON)
+    body = db.Column(db.Text)
+    # name of the outbox template rendering the body from the context when the message is sent
+    template = db.Column(db.String(64))
+    context = db.Column(db.JSON)
+    status = db.Column(db.String(20), default=PENDING)
+    error = db.Column(db.Text)
+    attempts = db.Column(db.Integer, default=0)
+    send_at = db.Column(db.DateTime)
+    locked_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_outboxmessage_status_send_at', 'status', 'send_at'),
+    )
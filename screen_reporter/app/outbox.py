@@ -0,0 +1,192 @@
+import atexit
+import logging
+import smtplib
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from flask_mail import Message
+from sqlalchemy import and_, or_
+
+from . import db, mail
+from .jobs import backoff_delay
+
+
+logger = logging.getLogger(__name__)
+
+
+class MailOutbox:
+    """
+    Emails stored in the ``outboxmessage`` table and sent by a background thread, in batches that
+    share one SMTP connection. Sent messages are deleted, failed ones are retried with backoff. Once
+    they gave up their body is cleared, they are deleted after ``MAIL_OUTBOX_RETENTION`` seconds.
+    Messages carrying a secret use a template, their body is only rendered when they are sent.
+    Without ``MAIL_OUTBOX_ENABLED`` emails are sent by the request itself.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self.templates = {}
+        self._thread = None
+        self._purged_at = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['outbox'] = self
+        self.enabled = app.config['MAIL_OUTBOX_ENABLED']
+        if self.enabled:
+            app.before_first_request(lambda: self.start(app))
+
+    def template(self, name):
+        """
+        Register the function rendering the body of the ``name`` messages from their context, it may
+        return None when the message isn't needed anymore
+        """
+        def register(render):
+            self.templates[name] = render
+            return render
+        return register
+
+    def render(self, body, template=None, context=None):
+        return self.templates[template](context) if template is not None else body
+
+    def enqueue(self, subject, recipients, body=None, sender=None, template=None, context=None):
+        """
+        Store a message and commit it together with the pending changes of the session. With the
+        outbox disabled the changes are committed and the message is sent right away, None is returned.
+        """
+        from .models import OutboxMessage
+
+        sender = sender or current_app.config['FLASK_MAIL_SENDER']
+        if not self.enabled:
+            body = self.render(body, template, context)
+            db.session.commit()
+            if body is not None:
+                mail.send(Message(subject=subject, sender=sender, recipients=list(recipients), body=body))
+            return None
+        message = OutboxMessage(subject=subject, recipients=list(recipients), body=body, sender=sender,
+                                template=template, context=context,
+                                status=OutboxMessage.PENDING, attempts=0, send_at=datetime.now())
+        db.session.add(message)
+        db.session.commit()
+        self._wakeup.set()
+        return message
+
+    def start(self, app):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._work, args=(app, ), name='mail-outbox', daemon=True)
+            self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self, timeout=5):
+        self._stopped.set()
+        self._wakeup.set()
+        with self._lock:
+            if self._thread is not None:
+                self._thread.join(timeout)
+            self._thread = None
+
+    def _work(self, app):
+        while not self._stopped.is_set():
+            batch = []
+            with app.app_context():
+                try:
+                    self._purge_due()
+                    batch = self._claim()
+                    if batch:
+                        self._send(batch)
+                except Exception:
+                    logger.exception('Mail outbox failed')
+                    db.session.rollback()
+            if not batch:
+                self._wakeup.wait(app.config['MAIL_OUTBOX_POLL_INTERVAL'])
+                self._wakeup.clear()
+
+    def _purge_due(self):
+        """
+        Delete the messages that gave up more than ``MAIL_OUTBOX_RETENTION`` seconds ago, once an hour at most
+        """
+        from .models import OutboxMessage
+
+        now = time.monotonic()
+        if self._purged_at is not None and now - self._purged_at < 3600:
+            return
+        self._purged_at = now
+        expired = datetime.now() - timedelta(seconds=current_app.config['MAIL_OUTBOX_RETENTION'])
+        OutboxMessage.query.filter(OutboxMessage.status == OutboxMessage.FAILED, OutboxMessage.updated < expired) \
+            .delete(synchronize_session=False)
+        db.session.commit()
+
+    def _claimable(self, now):
+        from .models import OutboxMessage
+
+        lease_expired = now - timedelta(seconds=current_app.config['MAIL_OUTBOX_LEASE_TIMEOUT'])
+        return or_(
+            and_(OutboxMessage.status == OutboxMessage.PENDING, OutboxMessage.send_at <= now),
+            and_(OutboxMessage.status == OutboxMessage.SENDING, OutboxMessage.locked_at < lease_expired)
+        )
+
+    def _claim(self):
+        from .models import OutboxMessage
+
+        now = datetime.now()
+        candidates = db.session.query(OutboxMessage.pk).filter(self._claimable(now)) \
+            .order_by(OutboxMessage.send_at).limit(current_app.config['MAIL_OUTBOX_BATCH_SIZE']).all()
+        claimed = []
+        for (pk, ) in candidates:
+            # same conditional UPDATE as the job queue, several processes may share the table
+            if OutboxMessage.query.filter(OutboxMessage.pk == pk, self._claimable(now)) \
+                    .update({OutboxMessage.status: OutboxMessage.SENDING, OutboxMessage.locked_at: now,
+                             OutboxMessage.attempts: OutboxMessage.attempts + 1}, synchronize_session=False):
+                claimed.append(pk)
+        db.session.commit()
+        return OutboxMessage.query.filter(OutboxMessage.pk.in_(claimed)).all() if claimed else []
+
+    def _send(self, batch):
+        pending = list(batch)
+        try:
+            with mail.connect() as connection:
+                while pending:
+                    message = pending[0]
+                    body = self.render(message.body, message.template, message.context)
+                    if body is None:
+                        db.session.delete(message)
+                        pending.pop(0)
+                        continue
+                    try:
+                        connection.send(Message(subject=message.subject, sender=message.sender,
+                                                recipients=message.recipients, body=body))
+                    except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as err:
+                        # the server refused this message, the connection is still usable
+                        self._retry(message, err)
+                    else:
+                        db.session.delete(message)
+                    pending.pop(0)
+        except Exception as err:
+            for message in pending:
+                self._retry(message, err)
+        db.session.commit()
+
+    def _retry(self, message, err):
+        from .models import OutboxMessage
+
+        config = current_app.config
+        logger.warning('Mail %s attempt %s failed: %s', message.pk, message.attempts, err)
+        message.error, message.locked_at = str(err), None
+        if message.attempts >= config['MAIL_OUTBOX_MAX_ATTEMPTS']:
+            # the body may hold a secret, it isn't kept once it won't be sent
+            message.status, message.body, message.context = OutboxMessage.FAILED, None, None
+        else:
+            delay = backoff_delay(message.attempts, config['MAIL_OUTBOX_BACKOFF_BASE'], config['MAIL_OUTBOX_BACKOFF_MAX'])
+            message.status, message.send_at = OutboxMessage.PENDING, datetime.now() + timedelta(seconds=delay)
+
+
+outbox = MailOutbox()
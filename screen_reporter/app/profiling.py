@@ -0,0 +1,192 @@
+from datetime import datetime
+import cProfile
+import glob
+import hmac
+import json
+import os
+import random
+import re
+import time
+import uuid
+
+try:
+    from pyinstrument import Profiler
+except ImportError:
+    Profiler = None
+
+
+PROFILE_ID = re.compile(r'^\d{8}T\d{12}-\d+-[0-9a-f]{8}$')
+
+
+class SamplingProfile:
+    """
+    pyinstrument's statistical profiler, saved as an HTML report
+    """
+    extension = 'html'
+    mimetype = 'text/html'
+
+    def __init__(self):
+        self.profiler = Profiler(interval=0.001)
+
+    def start(self):
+        self.profiler.start()
+
+    def stop(self):
+        self.profiler.stop()
+
+    def save(self, path):
+        with open(path, 'w') as output:
+            output.write(self.profiler.output_html())
+
+
+class TracingProfile:
+    """
+    cProfile, saved as pstats data for ``python -m pstats`` or snakeviz
+    """
+    extension = 'prof'
+    mimetype = 'application/octet-stream'
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+
+    def start(self):
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+
+    def save(self, path):
+        self.profiler.dump_stats(path)
+
+
+class RequestProfiler:
+    """
+    Profile api requests: on demand, when the ``X-Profile`` header carries ``ADMIN_TOKEN``, and a
+    ``PROFILING_SAMPLE_RATE`` share of the others, kept only when slower than ``PROFILING_SLOW_THRESHOLD``.
+    Profiles go to ``PROFILING_DIR``, where only the last ``PROFILING_MAX_PROFILES`` are kept, and are
+    served by ``/api/admin/profiles``.
+    """
+
+    def __init__(self, app=None):
+        self.token = None
+        self.directory = None
+        self.max_profiles = 100
+        self.sample_rate = 0.0
+        self.slow_threshold = 1.0
+        self.profile_class = TracingProfile
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        self.token = config['ADMIN_TOKEN']
+        self.directory = config['PROFILING_DIR']
+        self.max_profiles = config['PROFILING_MAX_PROFILES']
+        self.sample_rate = config['PROFILING_SAMPLE_RATE']
+        self.slow_threshold = config['PROFILING_SLOW_THRESHOLD']
+        profiler = config['PROFILING_PROFILER']
+        if profiler == 'pyinstrument' and Profiler is None:
+            raise RuntimeError('PROFILING_PROFILER is pyinstrument but pyinstrument is not installed.')
+        self.profile_class = SamplingProfile if profiler != 'cprofile' and Profiler is not None else TracingProfile
+        if self.token or self.sample_rate > 0:
+            os.makedirs(self.directory, exist_ok=True)
+            app.wsgi_app = ProfilingMiddleware(app.wsgi_app, self)
+
+    def authorized(self, token):
+        return bool(self.token) and token is not None and hmac.compare_digest(token, self.token)
+
+    def new_id(self):
+        return '{:%Y%m%dT%H%M%S%f}-{}-{}'.format(datetime.utcnow(), os.getpid(), uuid.uuid4().hex[:8])
+
+    def save(self, profile_id, profile, metadata):
+        filename = '{}.{}'.format(profile_id, profile.extension)
+        profile.save(os.path.join(self.directory, filename))
+        with open(os.path.join(self.directory, profile_id + '.json'), 'w') as output:
+            json.dump({**metadata, 'id': profile_id, 'filename': filename, 'mimetype': profile.mimetype}, output)
+        self.trim()
+
+    def trim(self):
+        """
+        Drop the oldest profiles past ``max_profiles``, other processes may be doing the same
+        """
+        paths = sorted(glob.glob(os.path.join(self.directory, '*.json')))
+        for path in paths[:max(len(paths) - self.max_profiles, 0)]:
+            profile_id = os.path.basename(path)[:-len('.json')]
+            for stale in glob.glob(os.path.join(self.directory, profile_id + '.*')):
+                try:
+                    os.remove(stale)
+                except FileNotFoundError:
+                    pass
+
+    def list(self):
+        profiles = []
+        for path in sorted(glob.glob(os.path.join(self.directory, '*.json')), reverse=True):
+            try:
+                with open(path) as source:
+                    profiles.append(json.load(source))
+            except (OSError, ValueError):
+                continue
+        return profiles
+
+    def get(self, profile_id):
+        """
+        Metadata of a profile, None when it doesn't exist (anymore)
+        """
+        if not PROFILE_ID.match(profile_id):
+            return None
+        try:
+            with open(os.path.join(self.directory, profile_id + '.json')) as source:
+                return json.load(source)
+        except (OSError, ValueError):
+            return None
+
+
+class ProfilingMiddleware:
+    """
+    WSGI middleware around the Flask app, so the JWT checks and the response hooks are profiled too
+    """
+
+    def __init__(self, wsgi_app, profiler):
+        self.wsgi_app = wsgi_app
+        self.profiler = profiler
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if not path.startswith('/api/') or path.startswith('/api/admin/'):
+            return self.wsgi_app(environ, start_response)
+        requested = self.profiler.authorized(environ.get('HTTP_X_PROFILE'))
+        if not requested and random.random() >= self.profiler.sample_rate:
+            return self.wsgi_app(environ, start_response)
+
+        profile_id, profile, status = self.profiler.new_id(), self.profiler.profile_class(), []
+
+        def profiled_start_response(response_status, headers, exc_info=None):
+            status.append(response_status)
+            if requested:
+                headers = headers + [('X-Profile-Id', profile_id)]
+            return start_response(response_status, headers, exc_info)
+
+        started = time.perf_counter()
+        try:
+            profile.start()
+        except (RuntimeError, ValueError):
+            # another profiler is active in this thread, or process wide with cProfile on Python 3.12+
+            return self.wsgi_app(environ, start_response)
+        try:
+            return self.wsgi_app(environ, profiled_start_response)
+        finally:
+            profile.stop()
+            duration = time.perf_counter() - started
+            if requested or duration >= self.profiler.slow_threshold:
+                self.profiler.save(profile_id, profile, {
+                    'method': environ.get('REQUEST_METHOD'),
+                    'path': path,
+                    'query': environ.get('QUERY_STRING', ''),
+                    'status': int(status[0].split()[0]) if status else None,
+                    'duration_ms': duration * 1000,
+                    'reason': 'requested' if requested else 'slow',
+                    'created': datetime.utcnow().isoformat(),
+                })
+
+
+profiler = RequestProfiler()
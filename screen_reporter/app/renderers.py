@@ -0,0 +1,92 @@
+from flask import Response, current_app, json, request
+import gzip
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# content types that are already compressed, or too small to be worth it once they are
+INCOMPRESSIBLE_TYPES = ('image/', 'video/', 'audio/', 'application/zip', 'application/gzip')
+
+
+class JSONRenderer:
+    """
+    JSON encoder of the api responses: orjson when it is installed (``JSON_RENDERER=auto``), or the
+    Flask encoder. Keys are sorted either way, like ``jsonify`` does, and the types JSON lacks, dates
+    included, are converted by the Flask encoder. orjson writes non-ASCII text as UTF-8 where the
+    Flask encoder escapes it, the documents are the same.
+    """
+
+    def __init__(self):
+        self.encoder = 'json'
+        self.default = None
+
+    def init_app(self, app):
+        encoder = app.config['JSON_RENDERER']
+        if encoder == 'auto':
+            encoder = 'orjson' if orjson is not None else 'json'
+        if encoder == 'orjson' and orjson is None:
+            raise RuntimeError('JSON_RENDERER is orjson but orjson is not installed.')
+        self.encoder = encoder
+        # dates as HTTP dates, like jsonify, instead of orjson's ISO 8601
+        self.default = app.json_encoder().default
+
+    def dumps(self, data):
+        if self.encoder == 'orjson':
+            # integer keys, as in the bulk endpoints errors, are written as strings like the json module does
+            return orjson.dumps(data, default=self.default,
+                                option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME)
+        return json.dumps(data, separators=(',', ':')).encode()
+
+
+renderer = JSONRenderer()
+
+
+def render(data, code=200, headers=None):
+    return Response(renderer.dumps(data), status=code, headers=headers, mimetype='application/json')
+
+
+def choose_encoding():
+    """
+    Best encoding the client accepts, brotli first when it is installed
+    """
+    for encoding in current_app.config['COMPRESS_ALGORITHMS']:
+        if encoding == 'br' and brotli is None:
+            continue
+        if request.accept_encodings[encoding]:
+            return encoding
+    return None
+
+
+def compress_response(response):
+    """
+    Compress responses larger than ``COMPRESS_MIN_SIZE`` with the encoding negotiated from Accept-Encoding
+    """
+    config = current_app.config
+    if response.direct_passthrough or response.is_streamed or request.method == 'HEAD' \
+            or not 200 <= response.status_code < 300 or response.status_code == 204 \
+            or 'Content-Encoding' in response.headers \
+            or (response.mimetype or '').startswith(INCOMPRESSIBLE_TYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < config['COMPRESS_MIN_SIZE']:
+        return response
+    encoding = choose_encoding()
+    if encoding is None:
+        return response
+
+    if encoding == 'br':
+        data = brotli.compress(data, quality=config['COMPRESS_BROTLI_QUALITY'])
+    else:
+        data = gzip.compress(data, compresslevel=config['COMPRESS_GZIP_LEVEL'])
+    response.set_data(data)
+    response.headers['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,182 @@
+from datetime import datetime
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from . import db
+import hashlib
+import math
+import threading
+import time
+
+
+class RevocationError(Exception):
+    """
+    Raised when a token could not be revoked
+    """
+
+
+class BloomFilter:
+    """
+    Set membership without false negatives, in ``capacity`` items worth of bits
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = max(capacity, 1)
+        self.size = int(math.ceil(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, int(round(self.size / self.capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'big'), int.from_bytes(digest[8:], 'big') | 1
+        return ((first + index * second) % self.size for index in range(self.hashes))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class DatabaseRevocationStore:
+    """
+    Revoked JTIs in the ``revokedtoken`` table, shared by every worker. A per-process Bloom filter,
+    synchronised with the table at most every ``JWT_REVOCATION_SYNC_INTERVAL`` seconds, answers the
+    common "not revoked" case without a query. Expired rows are purged every ``JWT_REVOCATION_PURGE_INTERVAL``.
+    """
+
+    def __init__(self, app):
+        self.capacity = app.config['JWT_REVOCATION_FILTER_CAPACITY']
+        self.error_rate = app.config['JWT_REVOCATION_FILTER_ERROR_RATE']
+        self.sync_interval = app.config['JWT_REVOCATION_SYNC_INTERVAL']
+        self.purge_interval = app.config['JWT_REVOCATION_PURGE_INTERVAL']
+        self._lock = threading.Lock()
+        self._filter = BloomFilter(self.capacity, self.error_rate)
+        self._last_pk = 0
+        self._synced_at = None
+        self._purged_at = time.monotonic()
+
+    def revoke(self, jti, expires):
+        from .models import RevokedToken
+
+        db.session.add(RevokedToken(jti=jti, expires=expires))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # the same token was logged out meanwhile, by another request or worker
+            db.session.rollback()
+        with self._lock:
+            self._filter.add(jti)
+
+    def is_revoked(self, jti):
+        self.sync()
+        if jti not in self._filter:
+            return False
+        from .models import RevokedToken
+
+        return db.session.query(RevokedToken.pk) \
+            .filter(RevokedToken.jti == jti, or_(RevokedToken.expires == None, RevokedToken.expires > datetime.now())) \
+            .first() is not None
+
+    def sync(self):
+        now = time.monotonic()
+        if self._synced_at is not None and now - self._synced_at < self.sync_interval:
+            return
+        with self._lock:
+            if self._synced_at is not None and now - self._synced_at < self.sync_interval:
+                return
+            if now - self._purged_at >= self.purge_interval:
+                self._purge()
+                self._purged_at = now
+                self._rebuild()
+            else:
+                self._last_pk = self._load(self._filter, self._last_pk)
+                if self._filter.count > self._filter.capacity:
+                    # past its capacity the false positive rate climbs, rebuild it twice as large
+                    self.capacity = self._filter.capacity * 2
+                    self._rebuild()
+            self._synced_at = now
+
+    def _load(self, bloom, last_pk):
+        """
+        Add the JTIs revoked after ``last_pk`` to ``bloom``, returns the last pk added
+        """
+        from .models import RevokedToken
+
+        rows = db.session.query(RevokedToken.pk, RevokedToken.jti).filter(RevokedToken.pk > last_pk).order_by(RevokedToken.pk).all()
+        for pk, jti in rows:
+            bloom.add(jti)
+            last_pk = pk
+        return last_pk
+
+    def _purge(self):
+        from .models import RevokedToken
+
+        RevokedToken.query.filter(RevokedToken.expires <= datetime.now()).delete(synchronize_session=False)
+        db.session.commit()
+
+    def _rebuild(self):
+        """
+        Replace the filter with one loaded from the table, ``is_revoked`` reads the old one until then
+        """
+        bloom = BloomFilter(self.capacity, self.error_rate)
+        last_pk = self._load(bloom, 0)
+        while bloom.count > bloom.capacity:
+            bloom = BloomFilter(bloom.capacity * 2, self.error_rate)
+            last_pk = self._load(bloom, 0)
+        self.capacity = bloom.capacity
+        self._filter, self._last_pk = bloom, last_pk
+
+
+class UwsgiCacheRevocationStore:
+    """
+    Revoked JTIs in a uWSGI cache shared by the workers of one master, see ``cache2`` in uwsgi.ini.
+    Entries expire with their token, so tokens must expire: the cache would fill up for good otherwise.
+    """
+
+    def __init__(self, app):
+        import uwsgi
+
+        if not app.config['JWT_ACCESS_TOKEN_EXPIRES']:
+            raise RuntimeError('JWT_REVOCATION_BACKEND is uwsgi but JWT_ACCESS_TOKEN_EXPIRES is unset, tokens never expire.')
+        self.uwsgi = uwsgi
+        self.cache_name = app.config['JWT_REVOCATION_UWSGI_CACHE']
+
+    def revoke(self, jti, expires):
+        ttl = max(1, int((expires - datetime.now()).total_seconds())) if expires else 0
+        if not self.uwsgi.cache_update(jti, b'1', ttl, self.cache_name):
+            raise RevocationError('The uWSGI cache {} is full.'.format(self.cache_name))
+
+    def is_revoked(self, jti):
+        return bool(self.uwsgi.cache_exists(jti, self.cache_name))
+
+
+class TokenRevocation:
+    """
+    Revoked tokens, stored in the backend named by ``JWT_REVOCATION_BACKEND``
+    """
+
+    backends = {
+        'database': DatabaseRevocationStore,
+        'uwsgi': UwsgiCacheRevocationStore,
+    }
+
+    def __init__(self, app=None):
+        self.backend = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.backend = self.backends[app.config['JWT_REVOCATION_BACKEND']](app)
+
+    def revoke(self, token):
+        expires = datetime.fromtimestamp(token['exp']) if token.get('exp') else None
+        self.backend.revoke(token['jti'], expires)
+
+    def is_revoked(self, token):
+        return self.backend.is_revoked(token['jti'])
+
+
+revocation = TokenRevocation()
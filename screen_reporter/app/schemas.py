@@ -44,6 +44,15 @@ class SettingSchema(Base):
         unknown = INCLUDE
 
 
+class JobSchema(Base):
+    result = ma.Raw(dump_only=True)
+
+    class Meta:
+        model = models.Job
+        fields = ('pk', 'name', 'status', 'attempts', 'result', 'error', 'created', 'updated')
+        dump_only = fields
+
+
 class TrelloCardSchema(ma.Schema):
     name = ma.String(data_key="name", required=True, validate=Length(max=100, min=1))
     desc = ma.String(data_key="description", required=True, validate=Length(max=500, min=1))
@@ -52,3 +61,19 @@ class TrelloCardSchema(ma.Schema):
     attachment = ma.String(required=True)
     labels = ma.List(ma.String(), required=False)
     members = ma.List(ma.String(), required=False)
+
+
+class TrelloOptionSchema(ma.Schema):
+    """
+    A Trello board, list, label or member as a form option, from py-trello objects or Trello's JSON
+    """
+    label = ma.String(attribute='name')
+    value = ma.String(attribute='id')
+
+
+class TrelloLabelOptionSchema(TrelloOptionSchema):
+    label = ma.String(attribute='color')
+
+
+class TrelloMemberOptionSchema(TrelloOptionSchema):
+    label = ma.String(attribute='fullName')
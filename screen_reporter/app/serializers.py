@@ -0,0 +1,135 @@
+from collections import OrderedDict
+from marshmallow import fields, utils
+import threading
+
+
+class _LRU:
+    """
+    Thread safe mapping keeping the ``maxsize`` most recently used entries, the keys of the dump
+    schemas and dumpers come from the ``?fields=`` of the requests
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def setdefault(self, key, value):
+        with self._lock:
+            value = self._items.setdefault(key, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+# schema instances shared by every request, keyed by (schema class, options)
+_schemas = _LRU(256)
+# ModelSchema.load keeps the instance it loads into on the schema, so loading schemas are per thread
+_local = threading.local()
+_dumpers = _LRU(256)
+
+
+def _key(schema_class, options):
+    return (schema_class, tuple(sorted((name, tuple(value) if isinstance(value, (list, tuple, set)) else value)
+                                       for name, value in options.items())))
+
+
+def get_schema(schema_class, **options):
+    """
+    Cached schema instance, only used to dump data
+    """
+    key = _key(schema_class, options)
+    schema = _schemas.get(key)
+    if schema is None:
+        schema = _schemas.setdefault(key, schema_class(**options))
+    return schema
+
+
+def get_load_schema(schema_class, **options):
+    """
+    Cached schema instance for the current thread, to load data
+    """
+    schemas = getattr(_local, 'schemas', None)
+    if schemas is None:
+        schemas = _local.schemas = {}
+    key = _key(schema_class, options)
+    if key not in schemas:
+        schemas[key] = schema_class(**options)
+    return schemas[key]
+
+
+def _format(field, value, namespace, index):
+    """
+    Expression serializing ``value`` the way the field's ``_serialize`` does, None when it isn't supported
+    """
+    field_type = type(field)
+    if field_type in (fields.Integer, fields.Int) and not field.as_string:
+        return 'None if {0} is None else int({0})'.format(value)
+    if field_type in (fields.String, fields.Str):
+        namespace['ensure_text_type'] = utils.ensure_text_type
+        return '{0} if {0} is None or type({0}) is str else ensure_text_type({0})'.format(value)
+    if field_type in (fields.Boolean, fields.Bool):
+        namespace['truthy_{}'.format(index)], namespace['falsy_{}'.format(index)] = field.truthy, field.falsy
+        return 'None if {0} is None else True if {0} in truthy_{1} else False if {0} in falsy_{1} else bool({0})'.format(value, index)
+    if field_type is fields.DateTime and field.format == 'iso':
+        return 'None if {0} is None else {0}.isoformat()'.format(value)
+    if field_type is fields.Raw:
+        return value
+    return None
+
+
+def compile_dump(schema):
+    """
+    Generate a function dumping one object like ``schema.dump`` does, without marshmallow's generic
+    per field path. Returns None when the schema has dump hooks or fields it can't reproduce.
+    """
+    if schema._has_processors('pre_dump') or schema._has_processors('post_dump'):
+        return None
+    namespace, lines, items = {}, [], []
+    for index, (name, field) in enumerate(schema.dump_fields.items()):
+        attribute = field.attribute or name
+        if '.' in attribute or not attribute.isidentifier():
+            return None
+        value = 'value_{}'.format(index)
+        expression = _format(field, value, namespace, index)
+        if expression is None:
+            return None
+        lines.append('    {} = obj.{}'.format(value, attribute))
+        items.append('{!r}: {}'.format(field.data_key or name, expression))
+    source = 'def dump(obj):\n{}\n    return {{{}}}\n'.format('\n'.join(lines), ', '.join(items))
+    exec(compile(source, '<dump {}>'.format(type(schema).__name__), 'exec'), namespace)
+    return namespace['dump']
+
+
+def get_dumper(schema_class, only=None):
+    """
+    Function dumping one object with ``schema_class``, compiled when possible, marshmallow otherwise
+    """
+    key = (schema_class, only)
+    dumper = _dumpers.get(key)
+    if dumper is None:
+        schema = get_schema(schema_class, only=only, unknown='EXCLUDE')
+        dumper = _dumpers.setdefault(key, compile_dump(schema) or schema.dump)
+    return dumper
+
+
+def dump(schema_class, data, many=False, only=None):
+    dumper = get_dumper(schema_class, only)
+    if many:
+        return [dumper(obj) for obj in data]
+    return dumper(data)
@@ -0,0 +1,193 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from requests.adapters import HTTPAdapter
+from trello import TrelloClient
+from trello.exceptions import ResourceUnavailable, Unauthorized
+from urllib.parse import urlsplit
+import requests
+import threading
+import time
+from .images import submit_optimize, optimized_upload
+from .uploads import remove_upload
+from .cache import TTLCache
+from .metrics import metrics, trello_operation
+
+
+def transient_error(err):
+    """
+    Trello failures a stale lookup is served for: network errors, rate limiting and server errors
+    """
+    if isinstance(err, Unauthorized):
+        return False
+    if isinstance(err, ResourceUnavailable):
+        return err._status == 429 or err._status >= 500
+    return isinstance(err, requests.RequestException)
+
+
+# board, list, label and member lookups keyed by (integration pk, collection, board id)
+cache = TTLCache(transient=transient_error)
+
+
+def invalidate_cache(integration_pk, board_id=None):
+    cache.invalidate(lambda key: key[0] == integration_pk and (board_id is None or key[2] in (board_id, None)))
+
+
+# board collections fetched without loading the board first: (path, query parameters)
+BOARD_COLLECTIONS = {
+    'lists': ('/boards/{}/lists', {'cards': 'none', 'filter': 'all', 'fields': 'name'}),
+    'labels': ('/boards/{}/labels', {'fields': 'color', 'limit': 50}),
+    'members': ('/boards/{}/members', {'filter': 'all', 'fields': 'fullName'}),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Thread pool used to run independent Trello calls concurrently
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=current_app.config['TRELLO_WORKERS'], thread_name_prefix='trello')
+    return _executor
+
+
+def fetch_board_collection(trello_client, collection, board_id):
+    path, query_params = BOARD_COLLECTIONS[collection]
+    return trello_client.fetch_json(path.format(board_id), query_params=dict(query_params))
+
+
+TRELLO_API_URL = 'https://api.trello.com/1'
+
+
+class TrelloSession(requests.Session):
+    """
+    Keep-alive session to Trello. ``api_url`` replaces the address py-trello hard codes, for local stubs.
+    """
+
+    def __init__(self, api_url=TRELLO_API_URL, pool_size=10, verify=True, timeout=30):
+        super().__init__()
+        self.api_url = api_url.rstrip('/')
+        self.verify = verify
+        self.timeout = timeout
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
+    def request(self, method, url, *args, **kwargs):
+        if url.startswith(TRELLO_API_URL):
+            url = self.api_url + url[len(TRELLO_API_URL):]
+        # an explicit value, otherwise REQUESTS_CA_BUNDLE from the environment takes precedence
+        kwargs.setdefault('verify', self.verify)
+        kwargs.setdefault('timeout', self.timeout)
+        started, status = time.perf_counter(), 'error'
+        try:
+            response = super().request(method, url, *args, **kwargs)
+            status = response.status_code
+            return response
+        finally:
+            metrics.observe('trello_request_duration_seconds', (trello_operation(method, urlsplit(url).path), status),
+                            time.perf_counter() - started)
+
+
+class TrelloClientPool:
+    """
+    Per-process LRU of Trello clients keyed by integration api key, each with its own keep-alive
+    session. Clients idle for longer than ``idle_timeout`` seconds are closed.
+    """
+
+    def __init__(self):
+        self.app_key = None
+        self.api_url = TRELLO_API_URL
+        self.verify = True
+        self.timeout = 30
+        self.maxsize = 128
+        self.pool_size = 10
+        self.idle_timeout = 300
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app_key = app.config['TRELLO_APP_KEY']
+        self.api_url = app.config['TRELLO_API_URL']
+        self.verify = app.config['TRELLO_VERIFY_SSL']
+        self.timeout = app.config['TRELLO_TIMEOUT']
+        self.maxsize = app.config['TRELLO_CLIENTS_SIZE']
+        self.pool_size = app.config['TRELLO_CONNECTIONS_PER_CLIENT']
+        self.idle_timeout = app.config['TRELLO_CLIENTS_IDLE_TIMEOUT']
+
+    def get(self, api_key):
+        now = time.monotonic()
+        evicted = []
+        with self._lock:
+            for key, (client, last_used) in list(self._clients.items()):
+                if now - last_used > self.idle_timeout:
+                    evicted.append(self._clients.pop(key)[0])
+            entry = self._clients.pop(api_key, None)
+            if entry is None:
+                session = TrelloSession(self.api_url, self.pool_size, self.verify, self.timeout)
+                entry = (TrelloClient(api_key=self.app_key, api_secret=api_key, http_service=session), now)
+            self._clients[api_key] = (entry[0], now)
+            while len(self._clients) > self.maxsize:
+                evicted.append(self._clients.popitem(last=False)[1][0])
+        for client in evicted:
+            client.http_service.close()
+        return entry[0]
+
+    def evict(self, api_key):
+        with self._lock:
+            entry = self._clients.pop(api_key, None)
+        if entry is not None:
+            entry[0].http_service.close()
+
+    def __len__(self):
+        return len(self._clients)
+
+
+clients = TrelloClientPool()
+
+
+def get_trello_client(integration):
+    return clients.get(integration.api_key)
+
+
+def forget_integration(integration, api_key=None):
+    """
+    Drop the cached lookups and the pooled client of an integration that changed or was deleted,
+    ``api_key`` is the key it had before a change
+    """
+    invalidate_cache(integration.pk)
+    clients.evict(api_key or integration.api_key)
+
+
+def create_card(trello_client, data, card=None, on_created=None):
+    """
+    Create a card in two round trips: the card itself, with its members and labels, then its attachment
+    streamed from the upload directory. The screenshot is optimized in the image pool while the card
+    is being created. When ``card`` is given (a retry after the attachment failed) only the attachment
+    is uploaded.
+    """
+    attachment = data.get('attachment')
+    optimizing = submit_optimize(attachment)
+    if card is None:
+        card = trello_client.fetch_json('/cards', http_method='POST', post_args={
+            'idList': data.get('board_list_id'),
+            'name': data.get('name'),
+            'desc': data.get('desc'),
+            'idMembers': ','.join(member_id for member_id in data.get('members', tuple()) if member_id),
+            'idLabels': ','.join(label_id for label_id in data.get('labels', tuple()) if label_id),
+        })
+        on_created and on_created(card)
+    if optimizing is not None:
+        attachment = optimized_upload(attachment, optimizing)
+    try:
+        with open(attachment['path'], 'rb') as file_content:
+            trello_client.fetch_json('/cards/{}/attachments'.format(card['id']), http_method='POST',
+                                     files={'file': (attachment['filename'], file_content, attachment['mime_type'])})
+    finally:
+        if attachment is not data.get('attachment'):
+            remove_upload(attachment)
+    return card
@@ -0,0 +1,75 @@
+from flask import current_app
+import binascii
+import mimetypes
+import os
+import re
+import tempfile
+
+
+DATA_URL_HEADER = re.compile(r"^data:(?P<mime_type>image\/[\w.+-]+);base64$")
+
+
+class UploadError(ValueError):
+    """
+    Raised when an uploaded screenshot can not be read
+    """
+
+
+def _upload_file(mime_type):
+    directory = current_app.config['UPLOAD_DIR']
+    os.makedirs(directory, exist_ok=True)
+    extension = mimetypes.guess_extension(mime_type) or '.bin'
+    return tempfile.NamedTemporaryFile(mode='wb', dir=directory, suffix=extension, delete=False)
+
+
+def _describe(upload_file, mime_type):
+    return {
+        'path': upload_file.name,
+        'filename': 'screenshot{}'.format(os.path.splitext(upload_file.name)[1]),
+        'mime_type': mime_type,
+    }
+
+
+def save_data_url(attachment):
+    """
+    Decode a base64 data URL into the upload directory, one chunk at a time
+    """
+    header, _, encoded = attachment.partition(',')
+    match = DATA_URL_HEADER.match(header)
+    if match is None or not encoded:
+        raise UploadError('The attachment must be a base64 encoded image.')
+
+    # a multiple of 4 characters decodes to whole bytes
+    chunk_size = current_app.config['UPLOAD_CHUNK_SIZE'] // 3 * 4
+    with _upload_file(match.group('mime_type')) as upload_file:
+        try:
+            for start in range(0, len(encoded), chunk_size):
+                upload_file.write(binascii.a2b_base64(encoded[start:start + chunk_size]))
+        except binascii.Error as err:
+            remove_upload({'path': upload_file.name})
+            raise UploadError('The attachment must be a base64 encoded image.') from err
+    return _describe(upload_file, match.group('mime_type'))
+
+
+def save_stream(stream, mime_type):
+    """
+    Copy a binary stream into the upload directory without holding it in memory
+    """
+    if not mime_type or not mime_type.startswith('image/'):
+        raise UploadError('The attachment must be an image.')
+
+    chunk_size = current_app.config['UPLOAD_CHUNK_SIZE']
+    with _upload_file(mime_type) as upload_file:
+        for chunk in iter(lambda: stream.read(chunk_size), b''):
+            upload_file.write(chunk)
+    if not os.path.getsize(upload_file.name):
+        remove_upload({'path': upload_file.name})
+        raise UploadError('The attachment is empty.')
+    return _describe(upload_file, mime_type)
+
+
+def remove_upload(upload):
+    try:
+        os.remove(upload['path'])
+    except OSError:
+        pass
@@ -0,0 +1,100 @@
+"""
+Writers and readers in separate processes against one database, for each engine profile. Reports the
+operations per second and the "database is locked" errors.
+
+    python -m benchmarks.database_concurrency --writers 4 --readers 4 --seconds 5 --profiles none sqlite
+    python -m benchmarks.database_concurrency --database-url postgresql://localhost/bench --profiles none server
+"""
+from multiprocessing import get_context
+from sqlalchemy.exc import OperationalError
+import argparse
+import json
+import os
+import tempfile
+import time
+
+
+def run(role, database_url, profile, seconds, results):
+    os.environ.update({'TEST_DATABASE_URL': database_url, 'DATABASE_ENGINE_PROFILE': profile,
+                       'JOB_WORKERS': '0', 'MAIL_OUTBOX_ENABLED': 'off'})
+    from app import create_app, db, models
+
+    app = create_app('testing')
+    operations, locked, latencies = 0, 0, []
+    with app.app_context():
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                if role == 'writer':
+                    db.session.add(models.Job(name='bench', status=models.Job.SUCCEEDED, payload={'pid': os.getpid()}))
+                    db.session.commit()
+                else:
+                    models.Job.query.order_by(models.Job.pk.desc()).limit(20).all()
+                    db.session.rollback()
+                operations += 1
+                latencies.append(time.perf_counter() - started)
+            except OperationalError as err:
+                db.session.rollback()
+                if 'locked' not in str(err):
+                    raise
+                locked += 1
+    results.put((role, operations, locked, sorted(latencies)))
+
+
+def measure(database_url, profile, args):
+    context = get_context('spawn')
+    results = context.Queue()
+    processes = [context.Process(target=run, args=(role, database_url, profile, args.seconds, results))
+                 for role in ['writer'] * args.writers + ['reader'] * args.readers]
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    summary = {'profile': profile}
+    for role in ('writer', 'reader'):
+        latencies = sorted(latency for name, _, _, values in collected if name == role for latency in values)
+        summary[role + 's'] = {
+            'processes': getattr(args, role + 's'),
+            'operations_per_second': sum(operations for name, operations, _, _ in collected if name == role) / args.seconds,
+            'locked_errors': sum(locked for name, _, locked, _ in collected if name == role),
+            'p99_ms': latencies[int(len(latencies) * 0.99)] * 1000 if latencies else None,
+        }
+    return summary
+
+
+def prepare(database_url, profile):
+    # the sqlite profile switches the file to WAL, the baseline keeps the rollback journal
+    os.environ.update({'TEST_DATABASE_URL': database_url, 'DATABASE_ENGINE_PROFILE': profile,
+                       'JOB_WORKERS': '0', 'MAIL_OUTBOX_ENABLED': 'off'})
+    from app import create_app, db
+
+    with create_app('testing').app_context():
+        db.create_all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--database-url', help='a throw-away SQLite file by default')
+    parser.add_argument('--profiles', nargs='+', default=['none', 'sqlite'])
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    results = []
+    for profile in args.profiles:
+        with tempfile.TemporaryDirectory() as directory:
+            database_url = args.database_url or 'sqlite:///' + os.path.join(directory, 'bench.sqlite')
+            # the configuration is read at import time, so the schema is created in its own process too
+            process = get_context('spawn').Process(target=prepare, args=(database_url, profile))
+            process.start()
+            process.join()
+            results.append(measure(database_url, profile, args))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
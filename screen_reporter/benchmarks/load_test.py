@@ -0,0 +1,279 @@
+"""
+End to end load test: scripted user journeys (register, login, settings, board meta, create-card with
+a screenshot and its job) against the API served by werkzeug or uWSGI, with Trello replaced by the
+local stub. Prints p50/p95/p99 latency, throughput, errors and peak RSS per endpoint and concurrency
+level as JSON, to compare runs across commits.
+
+    python -m benchmarks.load_test --concurrency 1 4 16 --seconds 20
+    python -m benchmarks.load_test --server uwsgi --processes 2 --threads 8 --trello-latency 0.15 --trello-rate-limit-rate 0.02
+"""
+from concurrent.futures import ThreadPoolExecutor
+from .support import AppServer, BASE_DIR, percentile, tree_rss
+from .trello_stub import TrelloStub
+from urllib.parse import urljoin
+import argparse
+import itertools
+import json
+import os
+import random
+import shutil
+import struct
+import subprocess
+import sys
+import threading
+import time
+import uuid
+import zlib
+import requests
+
+
+CARD = {'name': 'Load test', 'description': 'Reported during a load test', 'board': 'board0', 'list': 'list0'}
+
+JOB_DONE = ('succeeded', 'failed')
+
+
+def png_chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+
+def screenshot(width=1920, height=1080, seed=0):
+    """
+    PNG of a page: header, sidebar and panels in flat colours with lines of text-like noise, which
+    compresses about as well as a real screenshot does
+    """
+    rng = random.Random(seed)
+    pixel = lambda red, green, blue: bytes((red, green, blue))
+    header, sidebar, page, ink = pixel(38, 50, 56), pixel(236, 239, 241), pixel(255, 255, 255), pixel(33, 33, 33)
+    sidebar_width = width // 6
+    # every byte of random noise picks ink or paper for one pixel of text
+    glyphs = [ink if value < 96 else page for value in range(256)]
+
+    rows = []
+    for y in range(height):
+        line, offset = divmod(y - 64, 28)
+        if y < 64:
+            row = header * width
+        elif offset < 14 and line % 7 != 6 and y < height - 40:
+            if offset == 0:
+                text_width = rng.randint(width // 4, width - sidebar_width - 48)
+            noise = bytes(rng.getrandbits(8) for _ in range(text_width))
+            row = sidebar * sidebar_width + page * 24 + b''.join(glyphs[value] for value in noise) \
+                + page * (width - sidebar_width - 24 - text_width)
+        else:
+            row = sidebar * sidebar_width + page * (width - sidebar_width)
+        rows.append(b'\x00' + row)
+
+    header_chunk = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + png_chunk(b'IHDR', header_chunk) \
+        + png_chunk(b'IDAT', zlib.compress(b''.join(rows), 6)) + png_chunk(b'IEND', b'')
+
+
+class UWSGIServer(AppServer):
+    """
+    The benchmark app under uWSGI, with a master and pre-forked workers
+    """
+
+    def __init__(self, env=None, processes=2, threads=4):
+        super().__init__(env, module='benchmarks.wsgi:application')
+        self.processes = processes
+        self.threads = threads
+
+    def command(self):
+        # the uwsgi of this environment first, with its packages
+        command = [shutil.which('uwsgi', path=os.path.dirname(sys.executable)) or 'uwsgi']
+        if sys.prefix != sys.base_prefix:
+            command += ['--virtualenv', sys.prefix]
+        # without keep-alive the router closes every connection, and the clients reusing one get resets
+        return command + ['--http', '127.0.0.1:{}'.format(self.port), '--master', '--processes', str(self.processes),
+                          '--threads', str(self.threads), '--enable-threads', '--http-keepalive', '--die-on-term',
+                          '--disable-logging', '--module', self.module]
+
+
+class Recorder:
+    """
+    Latencies and statuses per endpoint, with the server's RSS sampled in the background
+    """
+
+    def __init__(self, pid, interval=0.1):
+        self.pid = pid
+        self.interval = interval
+        self.rss = self.peak_rss = tree_rss(pid)
+        self.samples = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        self._thread.join()
+
+    def _sample(self):
+        while not self._stopped.wait(self.interval):
+            self.rss = tree_rss(self.pid)
+            self.peak_rss = max(self.peak_rss, self.rss)
+
+    def request(self, session, endpoint, method, url, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = session.request(method, url, timeout=60, **kwargs)
+            status = response.status_code
+        except requests.RequestException:
+            response, status = None, 'connection error'
+        latency = time.perf_counter() - started
+        with self._lock:
+            sample = self.samples.setdefault(endpoint, {'latencies': [], 'errors': {}, 'peak_rss': 0})
+            sample['latencies'].append(latency)
+            if status == 'connection error' or status >= 400:
+                sample['errors'][str(status)] = sample['errors'].get(str(status), 0) + 1
+            sample['peak_rss'] = max(sample['peak_rss'], self.rss)
+        return response
+
+    def summary(self, seconds):
+        endpoints = {}
+        for endpoint, sample in sorted(self.samples.items()):
+            latencies = sample['latencies']
+            endpoints[endpoint] = {
+                'requests': len(latencies),
+                'requests_per_second': len(latencies) / seconds,
+                'p50_ms': percentile(latencies, 50) * 1000,
+                'p95_ms': percentile(latencies, 95) * 1000,
+                'p99_ms': percentile(latencies, 99) * 1000,
+                'errors': sample['errors'],
+                'peak_rss': sample['peak_rss'],
+            }
+        return endpoints
+
+
+def journey(server, recorder, content, args, number):
+    """
+    One user from registration to a created card
+    """
+    session, url = requests.Session(), server.url
+    email = 'load-{}-{}@example.com'.format(number, uuid.uuid4().hex[:12])
+    response = recorder.request(session, 'POST /api/auth/register', 'POST', url('/api/auth/register'),
+                                json={'fullname': 'Load Test', 'email': email, 'password': 'load-test'})
+    if response is None or not response.ok:
+        return False
+    response = recorder.request(session, 'POST /api/auth/login', 'POST', url('/api/auth/login'),
+                                json={'email': email, 'password': 'load-test'})
+    if response is None or not response.ok:
+        return False
+    headers = {'Authorization': 'Bearer ' + response.json()['access_token']}
+
+    recorder.request(session, 'GET /api/settings', 'GET', url('/api/settings'), headers=headers)
+    recorder.request(session, 'PUT /api/settings', 'PUT', url('/api/settings'), headers=headers,
+                     json={'color': 'blue', 'fontsize': '14px', 'linewidth': 4})
+    response = recorder.request(session, 'POST /api/integrations', 'POST', url('/api/integrations'), headers=headers,
+                                json={'provider': 'trello', 'api_key': 'trello-' + uuid.uuid4().hex})
+    if response is None or not response.ok:
+        return False
+
+    recorder.request(session, 'GET /api/trello/board/<board_id>/meta', 'GET', url('/api/trello/board/board0/meta'), headers=headers)
+    response = recorder.request(session, 'POST /api/trello/create-card', 'POST', url('/api/trello/create-card'), headers=headers,
+                                data=CARD, files={'attachment': ('screenshot.png', content, 'image/png')})
+    if response is None or response.status_code != 202:
+        return False
+
+    location = urljoin(server.url('/'), response.headers['Location'])
+    deadline = time.perf_counter() + args.job_timeout
+    while time.perf_counter() < deadline:
+        job = recorder.request(session, 'GET /api/trello/jobs/<pk>', 'GET', location, headers=headers)
+        if job is None or not job.ok:
+            return False
+        if job.json()['status'] in JOB_DONE:
+            return job.json()['status'] == 'succeeded'
+        time.sleep(args.job_poll_interval)
+    return False
+
+
+def user(server, recorder, content, args, numbers, deadline):
+    completed = failed = 0
+    while time.perf_counter() < deadline:
+        if journey(server, recorder, content, args, next(numbers)):
+            completed += 1
+        else:
+            failed += 1
+    return completed, failed
+
+
+def measure(concurrency, content, args):
+    stub = TrelloStub(latency=args.trello_latency, error_rate=args.trello_error_rate,
+                      rate_limit_rate=args.trello_rate_limit_rate).start()
+    env = {'TRELLO_API_URL': stub.url, 'JOB_WORKERS': str(args.job_workers), 'MAIL_OUTBOX_ENABLED': 'off', **args.env}
+    server = UWSGIServer(env, args.processes, args.threads) if args.server == 'uwsgi' else AppServer(env)
+    with server:
+        # the first requests pay for imports and connections, they are left out of the numbers
+        journey(server, Recorder(server.pid), content, args, 0)
+        numbers = itertools.count(1)
+        with Recorder(server.pid) as recorder:
+            started = time.perf_counter()
+            deadline = started + args.seconds
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                runs = list(executor.map(lambda _: user(server, recorder, content, args, numbers, deadline), range(concurrency)))
+            elapsed = time.perf_counter() - started
+    stub.shutdown()
+
+    requests_count = sum(len(sample['latencies']) for sample in recorder.samples.values())
+    return {
+        'concurrency': concurrency,
+        'seconds': elapsed,
+        'journeys_completed': sum(completed for completed, _ in runs),
+        'journeys_failed': sum(failed for _, failed in runs),
+        'requests_per_second': requests_count / elapsed,
+        'peak_rss': recorder.peak_rss,
+        'trello_calls': dict(stub.calls),
+        'endpoints': recorder.summary(elapsed),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--server', choices=['werkzeug', 'uwsgi'], default='werkzeug')
+    parser.add_argument('--processes', type=int, default=2, help='uWSGI worker processes')
+    parser.add_argument('--threads', type=int, default=4, help='uWSGI threads per worker')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16], help='simultaneous users, one run each')
+    parser.add_argument('--seconds', type=float, default=20, help='duration of each run')
+    parser.add_argument('--trello-latency', type=float, default=0.05, help='seconds added to every Trello call')
+    parser.add_argument('--trello-error-rate', type=float, default=0.0, help='share of Trello calls answering 500')
+    parser.add_argument('--trello-rate-limit-rate', type=float, default=0.0, help='share of Trello calls answering 429')
+    parser.add_argument('--screenshot-width', type=int, default=1920)
+    parser.add_argument('--screenshot-height', type=int, default=1080)
+    parser.add_argument('--job-workers', type=int, default=2)
+    parser.add_argument('--job-timeout', type=float, default=30, help='seconds to wait for the create-card job')
+    parser.add_argument('--job-poll-interval', type=float, default=0.2)
+    parser.add_argument('--env', action='append', default=[], metavar='NAME=VALUE', help='extra app configuration')
+    parser.add_argument('--output', help='write the JSON report to this file as well')
+    args = parser.parse_args()
+    args.env = dict(item.split('=', 1) for item in args.env)
+
+    content = screenshot(args.screenshot_width, args.screenshot_height)
+    report = {
+        'revision': git_revision(),
+        'server': args.server,
+        'processes': args.processes if args.server == 'uwsgi' else 1,
+        'threads': args.threads if args.server == 'uwsgi' else None,
+        'screenshot_bytes': len(content),
+        'trello': {'latency': args.trello_latency, 'error_rate': args.trello_error_rate, 'rate_limit_rate': args.trello_rate_limit_rate},
+        'env': args.env,
+        'runs': [measure(concurrency, content, args) for concurrency in args.concurrency],
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as report_file:
+            report_file.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Logins per second for several password hashing costs, with concurrent clients against a threaded server.
+
+    python -m benchmarks.password_hashing --methods pbkdf2:sha256:50000 pbkdf2:sha256:150000 --clients 8
+"""
+from concurrent.futures import ThreadPoolExecutor
+from .support import AppServer, percentile
+import argparse
+import json
+import requests
+import time
+
+
+def login(server, seconds):
+    session = requests.Session()
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        response = session.post(server.url('/api/auth/login'), json={'email': 'bench@example.com', 'password': 'benchmark'})
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def measure(method, clients, seconds):
+    with AppServer({'PASSWORD_HASH_METHOD': method, 'JOB_WORKERS': '0'}) as server:
+        server.register()
+        with ThreadPoolExecutor(max_workers=clients) as executor:
+            results = list(executor.map(lambda _: login(server, seconds), range(clients)))
+    latencies = [latency for result in results for latency in result]
+    return {
+        'method': method,
+        'clients': clients,
+        'logins_per_second': len(latencies) / seconds,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--methods', nargs='+', default=['pbkdf2:sha256:50000', 'pbkdf2:sha256:150000', 'pbkdf2:sha256:260000'])
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    results = [measure(method, args.clients, args.seconds) for method in args.methods]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
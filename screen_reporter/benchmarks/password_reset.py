@@ -0,0 +1,51 @@
+"""
+Password reset latency against a slow SMTP relay, and how many messages the outbox sends per connection.
+
+    python -m benchmarks.password_reset --users 50 --smtp-latency 0.5
+"""
+from .smtp_stub import SMTPStub
+from .support import AppServer, percentile
+import argparse
+import json
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--smtp-latency', type=float, default=0.5)
+    parser.add_argument('--timeout', type=float, default=60)
+    args = parser.parse_args()
+
+    smtp = SMTPStub(latency=args.smtp_latency).start()
+    env = {'MAIL_SERVER': '127.0.0.1', 'MAIL_PORT': str(smtp.port), 'MAIL_USE_TLS': 'off',
+           'FLASK_MAIL_SENDER': 'bench@example.com', 'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000', 'JOB_WORKERS': '0'}
+    with AppServer(env) as server:
+        emails = ['reset-{}@example.com'.format(index) for index in range(args.users)]
+        for email in emails:
+            server.register(email=email)
+
+        latencies = []
+        for email in emails:
+            started = time.perf_counter()
+            server.session.post(server.url('/api/auth/reset/' + email)).raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+        deadline = time.time() + args.timeout
+        while smtp.messages < args.users and time.time() < deadline:
+            time.sleep(0.05)
+    smtp.shutdown()
+
+    print(json.dumps({
+        'resets': args.users,
+        'smtp_latency_ms': args.smtp_latency * 1000,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'messages_sent': smtp.messages,
+        'smtp_connections': smtp.connections,
+        'messages_per_connection': smtp.messages / max(smtp.connections, 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
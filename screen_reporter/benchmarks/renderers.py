@@ -0,0 +1,72 @@
+"""
+Throughput of the list endpoints with each JSON encoder, with and without response compression.
+
+    python -m benchmarks.renderers --users 500 --item-per-page 100 --clients 4 --seconds 5
+"""
+from concurrent.futures import ThreadPoolExecutor
+from .support import AppServer, percentile
+import argparse
+import json
+import requests
+import time
+
+
+ENCODINGS = {'identity': 'identity', 'gzip': 'gzip', 'br': 'br, gzip'}
+
+
+def fetch(server, path, accept_encoding, seconds):
+    session = requests.Session()
+    # requests would otherwise decode the body, only the bytes on the wire are of interest here
+    headers = {'Accept-Encoding': accept_encoding}
+    latencies, sizes = [], []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        response = session.get(server.url(path), headers=headers, stream=True)
+        body = response.raw.read(decode_content=False)
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - started)
+        sizes.append(len(body))
+    return latencies, sizes
+
+
+def measure(encoder, args):
+    env = {'JSON_RENDERER': encoder, 'JOB_WORKERS': '0', 'MAIL_OUTBOX_ENABLED': 'off', 'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000'}
+    results = []
+    with AppServer(env) as server:
+        for start in range(0, args.users, 100):
+            users = [{'fullname': 'User {}'.format(index), 'email': 'user{}@example.com'.format(index), 'password': 'benchmark'}
+                     for index in range(start, min(start + 100, args.users))]
+            server.session.post(server.url('/api/users/bulk'), json=users).raise_for_status()
+
+        path = '/api/users?item_per_page={}'.format(args.item_per_page)
+        for name, accept_encoding in ENCODINGS.items():
+            with ThreadPoolExecutor(max_workers=args.clients) as executor:
+                runs = list(executor.map(lambda _: fetch(server, path, accept_encoding, args.seconds), range(args.clients)))
+            latencies = [latency for run in runs for latency in run[0]]
+            sizes = [size for run in runs for size in run[1]]
+            results.append({
+                'encoder': encoder,
+                'encoding': name,
+                'requests_per_second': len(latencies) / args.seconds,
+                'p50_ms': percentile(latencies, 50) * 1000,
+                'p95_ms': percentile(latencies, 95) * 1000,
+                'bytes': sum(sizes) // max(len(sizes), 1),
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--encoders', nargs='+', default=['json', 'orjson'])
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--item-per-page', type=int, default=100)
+    parser.add_argument('--clients', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    print(json.dumps([result for encoder in args.encoders for result in measure(encoder, args)], indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Time to dump 10k rows with a new marshmallow schema per call (the previous behaviour), with the
+cached schema and with the compiled dump function.
+
+    python -m benchmarks.serializers --rows 10000
+"""
+from app import models, schemas
+from app.serializers import get_schema, get_dumper
+from datetime import datetime
+import argparse
+import json
+import time
+
+
+def build_rows(rows):
+    now = datetime.now()
+    return {
+        schemas.UserSchema: [models.User(pk=index, fullname='User {}'.format(index), email='user{}@example.com'.format(index),
+                                         created=now, updated=now) for index in range(rows)],
+        schemas.IntegrationSchema: [models.Integration(pk=index, provider='trello', api_key='key-{}'.format(index),
+                                                       active=index % 2 == 0) for index in range(rows)],
+        schemas.SettingSchema: [models.Setting(pk=index, color='red', fontsize='15px', linewidth=15) for index in range(rows)],
+    }
+
+
+def timed(func, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    results = []
+    for schema_class, rows in build_rows(args.rows).items():
+        dumper = get_dumper(schema_class)
+        assert [dumper(row) for row in rows] == schema_class(many=True).dump(rows)
+        timings = {
+            'new schema': timed(lambda: schema_class(many=True, unknown='EXCLUDE').dump(rows), args.repeat),
+            'cached schema': timed(lambda: get_schema(schema_class, many=True, unknown='EXCLUDE').dump(rows), args.repeat),
+            'compiled': timed(lambda: [dumper(row) for row in rows], args.repeat),
+        }
+        results.append({
+            'schema': schema_class.__name__,
+            'rows': args.rows,
+            'ms': {name: elapsed * 1000 for name, elapsed in timings.items()},
+            'speedup': timings['new schema'] / timings['compiled'],
+        })
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""
+Serve ``create_app('testing')`` on a threaded werkzeug server for the benchmark scripts.
+
+    python -m benchmarks.serve 5001
+"""
+from werkzeug.serving import make_server
+from app import create_app, db
+import logging
+import sys
+
+
+def create():
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        # pooled connections must not be shared with the processes a pre-forking server starts
+        db.get_engine(app).dispose()
+    return app
+
+
+def main(port):
+    # one log line per request would weigh on the measurements
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    make_server('127.0.0.1', port, create(), threaded=True).serve_forever()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]))
@@ -0,0 +1,83 @@
+"""
+Local stand-in for an SMTP relay that counts connections and messages, with an optional delay on
+connect to play a slow relay. Point the API at it with MAIL_SERVER=127.0.0.1, MAIL_PORT and MAIL_USE_TLS=off.
+
+    python -m benchmarks.smtp_stub 2525 --latency 0.5
+"""
+from socketserver import StreamRequestHandler, ThreadingMixIn, TCPServer
+import argparse
+import threading
+import time
+
+
+class SMTPStubHandler(StreamRequestHandler):
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        self.server.connected()
+        time.sleep(self.server.latency)
+        self.reply('220 stub ESMTP')
+        for line in self.rfile:
+            command = line.decode('utf-8', 'replace').strip().split(' ', 1)[0].upper()
+            if command == 'EHLO':
+                self.reply('250-stub')
+                self.reply('250 8BITMIME')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                for data in self.rfile:
+                    if data == b'.\r\n':
+                        break
+                self.server.received()
+                self.reply('250 OK')
+            elif command == 'RCPT' and self.server.reject_recipients:
+                self.reply('550 Mailbox unavailable')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                # HELO, MAIL, RCPT, RSET and NOOP
+                self.reply('250 OK')
+
+
+class SMTPStub(ThreadingMixIn, TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, port=0, latency=0, reject_recipients=False):
+        super().__init__(('127.0.0.1', port), SMTPStubHandler)
+        self.latency = latency
+        # answer 550 to every recipient, as a relay refusing the messages
+        self.reject_recipients = reject_recipients
+        self.connections = 0
+        self.messages = 0
+        self._lock = threading.Lock()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def connected(self):
+        with self._lock:
+            self.connections += 1
+
+    def received(self):
+        with self._lock:
+            self.messages += 1
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('port', type=int)
+    parser.add_argument('--latency', type=float, default=0)
+    args = parser.parse_args()
+    SMTPStub(args.port, args.latency).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Helpers shared by the benchmark scripts
+"""
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import requests
+
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError('Nothing is listening on port {}'.format(port))
+
+
+def read_status(pid, key):
+    """
+    Read a memory counter such as ``VmHWM`` (peak RSS) from /proc, in bytes
+    """
+    with open('/proc/{}/status'.format(pid)) as status:
+        for line in status:
+            if line.startswith(key + ':'):
+                return int(line.split()[1]) * 1024
+    return None
+
+
+def peak_rss(pid):
+    return read_status(pid, 'VmHWM')
+
+
+def process_tree(pid):
+    """
+    ``pid`` and the processes it started, such as the uWSGI workers under the master
+    """
+    children = {}
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open('/proc/{}/stat'.format(entry)) as stat:
+                    # the command name in parentheses may contain spaces, the parent pid follows it
+                    parent = int(stat.read().rsplit(')', 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(parent, []).append(int(entry))
+    pids, pending = [], [pid]
+    while pending:
+        pids.append(pending.pop())
+        pending.extend(children.get(pids[-1], []))
+    return pids
+
+
+def tree_rss(pid):
+    """
+    Resident memory of ``pid`` and its children together, in bytes
+    """
+    total = 0
+    for child in process_tree(pid):
+        try:
+            total += read_status(child, 'VmRSS') or 0
+        except OSError:
+            pass
+    return total
+
+
+def percentile(values, rank):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(rank / 100.0 * (len(values) - 1))))]
+
+
+class AppServer:
+    """
+    Run the API in a child process against a throw-away SQLite database
+    """
+
+    def __init__(self, env=None, module='benchmarks.serve'):
+        self.env = env or {}
+        self.module = module
+        self.port = free_port()
+        self.process = None
+        self.directory = None
+        self.session = requests.Session()
+
+    @property
+    def pid(self):
+        return self.process.pid
+
+    def url(self, path):
+        return 'http://127.0.0.1:{}{}'.format(self.port, path)
+
+    def command(self):
+        return [sys.executable, '-m', self.module, str(self.port)]
+
+    def __enter__(self):
+        self.directory = tempfile.mkdtemp(prefix='screen-reporter-bench-')
+        env = {
+            **os.environ,
+            'TEST_DATABASE_URL': 'sqlite:///' + os.path.join(self.directory, 'bench.sqlite'),
+            'UPLOAD_DIR': os.path.join(self.directory, 'uploads'),
+            **self.env,
+        }
+        self.process = subprocess.Popen(self.command(), cwd=BASE_DIR, env=env)
+        wait_for_port(self.port)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        self.process.wait()
+
+    def register(self, email='bench@example.com', password='benchmark'):
+        response = self.session.post(self.url('/api/auth/register'), json={'fullname': 'Bench', 'email': email, 'password': password})
+        response.raise_for_status()
+        return {'Authorization': 'Bearer ' + response.json()['access_token']}
+
+    def add_integration(self, headers, api_key='bench-trello-key'):
+        response = self.session.post(self.url('/api/integrations'), json={'provider': 'trello', 'api_key': api_key}, headers=headers)
+        response.raise_for_status()
+        return response.json()
@@ -0,0 +1,151 @@
+"""
+Cost of each stage of the generic CRUD views (query, pagination, serialization, deserialization with
+and without the uniqueness query, change tracking, update) for User, Integration and Setting, against
+an in-memory SQLite database seeded with 1k, 100k and 1M rows per table. Runs with pytest-benchmark,
+which saves baselines and fails a run whose medians got slower than one:
+
+    python -m pytest benchmarks/test_mixins.py --benchmark-autosave
+    python -m pytest benchmarks/test_mixins.py --benchmark-compare --benchmark-compare-fail=median:20%
+    python -m pytest benchmarks/test_mixins.py -k "1000_rows or 100000_rows"
+"""
+import itertools
+import pytest
+from config import TestingConfig
+from app import create_app, db, generics, models, schemas
+from app.mixins import Changes, encode_cursor
+
+
+SCALES = (1000, 100000, 1000000)
+
+CONFIG = {
+    'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+    'JOB_WORKERS': 0,
+    'MAIL_OUTBOX_ENABLED': False,
+    'METRICS_ENABLED': False,
+}
+
+# a stored hash, the benchmark never hashes passwords
+PASSWORD_HASH = 'pbkdf2:sha256:1000$benchmark$' + '0' * 64
+
+ITEM_PER_PAGE = 100
+
+STAGES = ('get_object', 'list_offset_query', 'list_cursor_query', 'list_cursor', 'serialize', 'deserialize',
+          'deserialize_check_unique', 'changes', 'update')
+
+
+def user_rows(start, stop):
+    return [{'pk': index, 'fullname': 'User {}'.format(index), 'email': 'user{}@example.com'.format(index),
+             '_UserMixin__hashed_password': PASSWORD_HASH} for index in range(start, stop)]
+
+
+def setting_rows(start, stop):
+    return [{'pk': index, 'user_pk': index, 'color': 'red', 'fontsize': '15px', 'linewidth': 15} for index in range(start, stop)]
+
+
+def integration_rows(start, stop):
+    return [{'pk': index, 'user_pk': index, 'provider': 'trello', 'api_key': 'key-{}'.format(index), 'active': True}
+            for index in range(start, stop)]
+
+
+# model, schema, unique fields, rows and the payloads loaded by the deserialize and update stages
+MODELS = {
+    'User': (models.User, schemas.UserSchema, ('email', ), user_rows,
+             lambda number: {'fullname': 'Bench {}'.format(number), 'email': 'bench{}@example.com'.format(number)}),
+    'Integration': (models.Integration, schemas.IntegrationSchema, ('api_key', ), integration_rows,
+                    lambda number: {'provider': 'trello', 'api_key': 'bench-{}'.format(number)}),
+    'Setting': (models.Setting, schemas.SettingSchema, None, setting_rows,
+                lambda number: {'color': 'blue', 'fontsize': '{}px'.format(10 + number % 10), 'linewidth': 1 + number % 20}),
+}
+
+
+def seed(scale, chunk=50000):
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+    for _, (model, _, _, rows, _) in sorted(MODELS.items(), key=lambda item: item[0] != 'User'):
+        for start in range(1, scale + 1, chunk):
+            db.session.execute(model.__table__.insert(), rows(start, min(start + chunk, scale + 1)))
+    db.session.commit()
+
+
+def view_class(model, schema_class, unique_fields):
+    return type(model.__name__ + 'BenchmarkView', (generics.ListCreateAPIView, generics.RetrieveUpdateDestroyAPIView), {
+        'model': model,
+        'schema_class': schema_class,
+        'unique_fields': unique_fields,
+        'lookup_url_kwarg': 'pk',
+        'cursor_pagination': True,
+        'methods': ['GET', 'POST', 'PUT', 'PATCH', 'DELETE'],
+    })
+
+
+def stages(name, scale):
+    """
+    stage: (request path, setup, function) of the stages measured for one model
+    """
+    model, schema_class, unique_fields, _, payload = MODELS[name]
+    view = view_class(model, schema_class, unique_fields)()
+    middle = scale // 2
+    # any api route does, the list links are built from the matched rule
+    page = '/api/users?item_per_page={}'.format(ITEM_PER_PAGE)
+    numbers = itertools.count()
+    instance = view.get_object(pk=middle)
+    items = model.query.order_by(model.pk).limit(ITEM_PER_PAGE).all()
+
+    def load(instance=None):
+        return view.deserialize(payload(next(numbers)), instance=instance, partial=instance is not None)
+
+    def discard():
+        db.session.rollback()
+        db.session.expire_all()
+
+    def change():
+        load(instance)
+
+    def update():
+        load(instance)
+        view.perform_update(instance, Changes(instance))
+
+    return {
+        'get_object': ('/', None, lambda: (view.get_object(pk=middle), db.session.expire_all())),
+        'list_offset_query': (page + '&page={}'.format(max(middle // ITEM_PER_PAGE, 1)), None, lambda: view.paginate_query()),
+        'list_cursor_query': (page + '&after={}'.format(encode_cursor(middle)), None, lambda: view.cursor_paginate_query()),
+        'list_cursor': (page + '&after={}'.format(encode_cursor(middle)), None, lambda: view.list()),
+        'serialize': ('/', None, lambda: view.serialize(items, many=True)),
+        'deserialize': ('/', None, lambda: (load(), discard())),
+        'deserialize_check_unique': ('/api/users?check_unique=1', None, lambda: (load(), discard())),
+        # the change tracking that replaced the deepcopy of the instance, on an instance with changes
+        'changes': ('/', change, lambda: Changes(instance)),
+        'update': ('/', None, update),
+    }
+
+
+@pytest.fixture(scope='module')
+def app():
+    # the configuration classes are filled from the environment at import
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        for name, value in CONFIG.items():
+            monkeypatch.setattr(TestingConfig, name, value)
+        app = create_app('testing')
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture(scope='module', params=SCALES, ids='{}_rows'.format)
+def scale(request, app):
+    seed(request.param)
+    return request.param
+
+
+@pytest.mark.parametrize('stage', STAGES)
+@pytest.mark.parametrize('name', MODELS)
+def test_stage(benchmark, app, scale, name, stage):
+    with app.test_request_context('/'):
+        path, setup, func = stages(name, scale)[stage]
+    benchmark.group = '{} {} rows'.format(name, scale)
+    with app.test_request_context(path):
+        if setup is None:
+            benchmark(func)
+        else:
+            benchmark.pedantic(func, setup=setup, rounds=200, warmup_rounds=1)
+    db.session.rollback()
@@ -0,0 +1,54 @@
+"""
+TLS handshakes per Trello call against a local HTTPS stub, with a new client per request
+(the behaviour before the client pool) and with the pooled keep-alive clients.
+
+    python -m benchmarks.trello_handshakes --calls 200
+"""
+from app.trello_client import TrelloClientPool, TrelloSession, fetch_board_collection
+from trello import TrelloClient
+from .trello_stub import TrelloStub, self_signed_certificate
+import argparse
+import json
+import tempfile
+import time
+import urllib3
+
+
+def new_client(stub):
+    return TrelloClient(api_key='app-key', api_secret='integration-key', http_service=TrelloSession(stub.url, verify=False))
+
+
+def pooled_client(stub, pool):
+    return pool.get('integration-key')
+
+
+def measure(name, get_client, calls, certificate):
+    stub = TrelloStub(certfile=certificate[0], keyfile=certificate[1]).start()
+    pool = TrelloClientPool()
+    pool.api_url, pool.verify, pool.app_key = stub.url, False, 'app-key'
+    started = time.perf_counter()
+    for _ in range(calls):
+        fetch_board_collection(get_client(stub, pool) if get_client is pooled_client else get_client(stub), 'lists', 'board')
+    elapsed = time.perf_counter() - started
+    stub.shutdown()
+    return {'mode': name, 'calls': calls, 'handshakes': stub.connections,
+            'handshakes_per_call': stub.connections / calls, 'calls_per_second': calls / elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--calls', type=int, default=200)
+    args = parser.parse_args()
+
+    urllib3.disable_warnings()
+    with tempfile.TemporaryDirectory() as directory:
+        certificate = self_signed_certificate(directory)
+        results = [
+            measure('client per request', new_client, args.calls, certificate),
+            measure('pooled client', pooled_client, args.calls, certificate),
+        ]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
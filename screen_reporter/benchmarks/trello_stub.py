@@ -0,0 +1,154 @@
+"""
+Local stand-in for the Trello API with latency, error and rate limit injection.
+Point the API at it with TRELLO_API_URL (and TRELLO_VERIFY_SSL=off when it serves TLS).
+
+    python -m benchmarks.trello_stub 8080 --latency 0.05 --error-rate 0.01 --rate-limit-rate 0.01
+"""
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from collections import Counter
+import argparse
+import itertools
+import json
+import os
+import random
+import re
+import ssl
+import subprocess
+import threading
+import time
+
+
+ROUTES = (
+    ('GET', re.compile(r'^/1/members/me/boards/?$'), 'boards'),
+    ('GET', re.compile(r'^/1/boards/[^/]+/lists$'), 'lists'),
+    ('GET', re.compile(r'^/1/boards/[^/]+/labels$'), 'labels'),
+    ('GET', re.compile(r'^/1/boards/[^/]+/members$'), 'members'),
+    ('POST', re.compile(r'^/1/cards$'), 'create_card'),
+    ('POST', re.compile(r'^/1/cards/[^/]+/attachments$'), 'attach'),
+)
+
+
+def self_signed_certificate(directory):
+    certfile, keyfile = os.path.join(directory, 'stub.crt'), os.path.join(directory, 'stub.key')
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1', '-subj', '/CN=127.0.0.1',
+                    '-keyout', keyfile, '-out', certfile], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return certfile, keyfile
+
+
+class TrelloStubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # one write per response, small unbuffered writes stall on delayed ACKs
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.respond(self)
+
+    def do_POST(self):
+        self.server.respond(self)
+
+
+class TrelloStub(ThreadingMixIn, HTTPServer):
+    """
+    Counts the TCP connections (one TLS handshake each when serving TLS) and the calls per operation
+    """
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.0, error_rate=0.0, rate_limit_rate=0.0, certfile=None, keyfile=None):
+        super().__init__(('127.0.0.1', port), TrelloStubHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.tls = certfile is not None
+        if self.tls:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile, keyfile)
+            self.socket = context.wrap_socket(self.socket, server_side=True)
+        self.connections = 0
+        self.calls = Counter()
+        # operation: number of its next calls answering 500
+        self.failures = Counter()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return '{}://127.0.0.1:{}/1'.format('https' if self.tls else 'http', self.server_address[1])
+
+    def get_request(self):
+        request = super().get_request()
+        with self._lock:
+            self.connections += 1
+        return request
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def payload(self, operation):
+        if operation == 'boards':
+            return [{'id': 'board{}'.format(i), 'name': 'Board {}'.format(i), 'desc': '', 'closed': False,
+                     'url': 'https://trello.com/b/board{}'.format(i)} for i in range(5)]
+        if operation == 'lists':
+            return [{'id': 'list{}'.format(i), 'name': 'List {}'.format(i)} for i in range(8)]
+        if operation == 'labels':
+            return [{'id': 'label{}'.format(i), 'color': color, 'name': ''} for i, color in enumerate(('green', 'yellow', 'orange', 'red', 'purple', 'blue'))]
+        if operation == 'members':
+            return [{'id': 'member{}'.format(i), 'fullName': 'Member {}'.format(i)} for i in range(4)]
+        if operation == 'create_card':
+            card_id = 'card{}'.format(next(self._ids))
+            return {'id': card_id, 'name': 'Card', 'url': 'https://trello.com/c/' + card_id, 'shortUrl': 'https://trello.com/c/' + card_id}
+        return {'id': 'attachment{}'.format(next(self._ids))}
+
+    def respond(self, handler):
+        length = int(handler.headers.get('Content-Length') or 0)
+        while length > 0:
+            length -= len(handler.rfile.read(min(length, 64 * 1024)))
+
+        path = handler.path.split('?', 1)[0]
+        operation = next((name for method, pattern, name in ROUTES if method == handler.command and pattern.match(path)), None)
+        with self._lock:
+            self.calls[operation or 'unknown'] += 1
+            failing = self.failures[operation] > 0
+            if failing:
+                self.failures[operation] -= 1
+
+        self.latency and time.sleep(self.latency)
+        draw = random.random()
+        if operation is None:
+            status, body = 404, {'message': 'not found'}
+        elif failing:
+            status, body = 500, {'message': 'injected failure'}
+        elif draw < self.rate_limit_rate:
+            status, body = 429, {'error': 'API_TOKEN_LIMIT_EXCEEDED'}
+        elif draw < self.rate_limit_rate + self.error_rate:
+            status, body = 500, {'message': 'injected failure'}
+        else:
+            status, body = 200, self.payload(operation)
+
+        content = json.dumps(body).encode()
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(content)))
+        if status == 429:
+            handler.send_header('Retry-After', '1')
+        handler.end_headers()
+        handler.wfile.write(content)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('port', type=int)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0)
+    args = parser.parse_args()
+    TrelloStub(args.port, args.latency, args.error_rate, args.rate_limit_rate).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Peak RSS of the API process while it receives one screenshot in each create-card upload mode.
+Every mode runs in a fresh server so the peaks don't mask each other.
+
+    python -m benchmarks.upload_memory --size-mb 5
+"""
+from .support import AppServer, peak_rss
+import argparse
+import base64
+import json
+import os
+
+
+CARD = {'name': 'Benchmark', 'description': 'Upload memory benchmark', 'board': 'board', 'list': 'list'}
+
+
+def screenshot(size):
+    # random bytes behind a PNG signature: incompressible, like a real screenshot
+    return b'\x89PNG\r\n\x1a\n' + os.urandom(size - 8)
+
+
+def post_json(server, headers, content):
+    attachment = 'data:image/png;base64,' + base64.b64encode(content).decode()
+    return server.session.post(server.url('/api/trello/create-card'), json={**CARD, 'attachment': attachment}, headers=headers)
+
+
+def post_multipart(server, headers, content):
+    return server.session.post(server.url('/api/trello/create-card'), data=CARD, headers=headers,
+                               files={'attachment': ('screenshot.png', content, 'image/png')})
+
+
+def post_raw(server, headers, content):
+    return server.session.post(server.url('/api/trello/create-card'), params=CARD, data=content,
+                               headers={**headers, 'Content-Type': 'image/png'})
+
+
+MODES = {
+    'json': post_json,
+    'multipart': post_multipart,
+    'raw': post_raw,
+}
+
+
+def measure(mode, content):
+    with AppServer(env={'JOB_WORKERS': '0'}) as server:
+        headers = server.register()
+        server.add_integration(headers)
+        # warm up imports and the upload path with a tiny screenshot
+        MODES[mode](server, headers, screenshot(1024)).raise_for_status()
+        before = peak_rss(server.pid)
+        response = MODES[mode](server, headers, content)
+        after = peak_rss(server.pid)
+    return {'mode': mode, 'status': response.status_code, 'size': len(content),
+            'peak_rss_before': before, 'peak_rss_after': after, 'peak_rss_growth': after - before}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size-mb', type=float, default=5)
+    parser.add_argument('--mode', choices=sorted(MODES), action='append')
+    args = parser.parse_args()
+
+    content = screenshot(int(args.size_mb * 1024 * 1024))
+    results = [measure(mode, content) for mode in (args.mode or sorted(MODES))]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+"""
+WSGI entry point of the benchmark app, for uWSGI.
+
+    uwsgi --http 127.0.0.1:5001 --master --processes 2 --threads 4 --enable-threads --module benchmarks.wsgi:application
+"""
+from .serve import create
+
+
+application = create()
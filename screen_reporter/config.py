@@ -1,4 +1,6 @@
 import os
+from datetime import timedelta
+from sqlalchemy.pool import QueuePool
 
 
 class Config:
@@ -12,19 +14,154 @@ class Config:
     MAIL_USERNAME = os.getenv('MAIL_USERNAME')
     MAIL_PASSWORD = os.getenv('MAIL_PASSWORD')
     FLASK_MAIL_SENDER = os.getenv('FLASK_MAIL_SENDER')
+    # emails are queued in the outbox table and sent in the background, one SMTP connection per batch
+    MAIL_OUTBOX_ENABLED = os.getenv('MAIL_OUTBOX_ENABLED', 'true').lower() in ['true', 'on', '1']
+    MAIL_OUTBOX_BATCH_SIZE = int(os.getenv('MAIL_OUTBOX_BATCH_SIZE', '50'))
+    MAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('MAIL_OUTBOX_MAX_ATTEMPTS', '8'))
+    # seconds between the retries of a message, doubled after each attempt
+    MAIL_OUTBOX_BACKOFF_BASE = float(os.getenv('MAIL_OUTBOX_BACKOFF_BASE', '30'))
+    MAIL_OUTBOX_BACKOFF_MAX = float(os.getenv('MAIL_OUTBOX_BACKOFF_MAX', '3600'))
+    MAIL_OUTBOX_POLL_INTERVAL = float(os.getenv('MAIL_OUTBOX_POLL_INTERVAL', '1'))
+    # seconds a batch is left to its sender before another process sends it again
+    MAIL_OUTBOX_LEASE_TIMEOUT = int(os.getenv('MAIL_OUTBOX_LEASE_TIMEOUT', '300'))
+    # seconds the messages that failed for good are kept, their body is cleared right away
+    MAIL_OUTBOX_RETENTION = int(os.getenv('MAIL_OUTBOX_RETENTION', str(7 * 24 * 3600)))
 
     TRELLO_APP_KEY =  os.getenv("TRELLO_APP_KEY", "trello api key")
-    JWT_ACCESS_TOKEN_EXPIRES = False
+    TRELLO_API_URL = os.getenv("TRELLO_API_URL", "https://api.trello.com/1")
+    TRELLO_VERIFY_SSL = os.getenv("TRELLO_VERIFY_SSL", "true").lower() in ['true', 'on', '1']
+    TRELLO_WORKERS = int(os.getenv("TRELLO_WORKERS", "6"))
+    # seconds per Trello request, a job's lease must outlast one
+    TRELLO_TIMEOUT = float(os.getenv("TRELLO_TIMEOUT", "30"))
+    # pooled keep-alive clients, one per integration api key
+    TRELLO_CLIENTS_SIZE = int(os.getenv("TRELLO_CLIENTS_SIZE", "128"))
+    TRELLO_CLIENTS_IDLE_TIMEOUT = int(os.getenv("TRELLO_CLIENTS_IDLE_TIMEOUT", "300"))
+    TRELLO_CONNECTIONS_PER_CLIENT = int(os.getenv("TRELLO_CONNECTIONS_PER_CLIENT", "10"))
+    TRELLO_CACHE_SIZE = int(os.getenv("TRELLO_CACHE_SIZE", "1024"))
+    TRELLO_CACHE_TTL = int(os.getenv("TRELLO_CACHE_TTL", "300"))
+    # how long an expired lookup may still be served while Trello fails
+    TRELLO_CACHE_STALE_TTL = int(os.getenv("TRELLO_CACHE_STALE_TTL", "3600"))
+    # seconds, tokens don't expire when unset
+    JWT_ACCESS_TOKEN_EXPIRES = timedelta(seconds=int(os.getenv("JWT_ACCESS_TOKEN_EXPIRES"))) if os.getenv("JWT_ACCESS_TOKEN_EXPIRES") else False
     JWT_BLACKLIST_ENABLED = True
     JWT_BLACKLIST_TOKEN_CHECKS = ['access']
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "hard to guess string")
     JWT_PUBLIC_KEY = os.getenv("JWT_PUBLIC_KEY", "hard to guess string")
     JWT_PRIVATE_KEY = os.getenv("JWT_PRIVATE_KEY", "hard to guess string")
     JWT_ERROR_MESSAGE_KEY = 'message'
+    # database (shared table behind a per-process Bloom filter) or uwsgi (cache2 named below)
+    JWT_REVOCATION_BACKEND = os.getenv("JWT_REVOCATION_BACKEND", "database")
+    JWT_REVOCATION_SYNC_INTERVAL = float(os.getenv("JWT_REVOCATION_SYNC_INTERVAL", "1"))
+    JWT_REVOCATION_PURGE_INTERVAL = int(os.getenv("JWT_REVOCATION_PURGE_INTERVAL", "3600"))
+    JWT_REVOCATION_FILTER_CAPACITY = int(os.getenv("JWT_REVOCATION_FILTER_CAPACITY", "100000"))
+    JWT_REVOCATION_FILTER_ERROR_RATE = 0.001
+    JWT_REVOCATION_UWSGI_CACHE = "revoked_tokens"
+
+    # werkzeug method string, pbkdf2:<hash>:<iterations>; stored hashes are upgraded on login
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "pbkdf2:sha256:150000")
+    # werkzeug's default, the stored hashes are rehashed when it changes
+    PASSWORD_SALT_LENGTH = int(os.getenv("PASSWORD_SALT_LENGTH", "8"))
+
+    # auto (orjson when installed), orjson or json
+    JSON_RENDERER = os.getenv("JSON_RENDERER", "auto")
+    # api responses from this size up are compressed, with brotli when installed and accepted, otherwise gzip
+    COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+    COMPRESS_ALGORITHMS = os.getenv("COMPRESS_ALGORITHMS", "br,gzip").split(',')
+    COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+    COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "4"))
+
+    MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', str(20 * 1024 * 1024)))
+    UPLOAD_DIR = os.getenv('UPLOAD_DIR', os.path.join(PROJECT_DIR, 'data', 'uploads'))
+    UPLOAD_CHUNK_SIZE = 64 * 1024
+
+    # optional screenshot optimization before the Trello upload, needs Pillow
+    IMAGE_PIPELINE_ENABLED = os.getenv('IMAGE_PIPELINE_ENABLED', 'false').lower() in ['true', 'on', '1']
+    IMAGE_PIPELINE_MIN_SIZE = int(os.getenv('IMAGE_PIPELINE_MIN_SIZE', str(256 * 1024)))
+    IMAGE_PIPELINE_INPUT_TYPES = os.getenv('IMAGE_PIPELINE_INPUT_TYPES', 'image/png,image/jpeg,image/webp,image/bmp').split(',')
+    IMAGE_MAX_DIMENSION = int(os.getenv('IMAGE_MAX_DIMENSION', '1920'))
+    # png (lossless), webp or jpeg
+    IMAGE_FORMAT = os.getenv('IMAGE_FORMAT', 'png')
+    IMAGE_QUALITY = int(os.getenv('IMAGE_QUALITY', '80'))
+    IMAGE_PROCESSES = int(os.getenv('IMAGE_PROCESSES', '2'))
+    # interpreter of the pool processes, found from the Python version when unset (uWSGI isn't one)
+    IMAGE_PYTHON_EXECUTABLE = os.getenv('IMAGE_PYTHON_EXECUTABLE')
+
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+    JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '5'))
+    JOB_BACKOFF_BASE = float(os.getenv('JOB_BACKOFF_BASE', '2'))
+    JOB_BACKOFF_MAX = float(os.getenv('JOB_BACKOFF_MAX', '300'))
+    JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '1'))
+    # seconds a running job is left to its worker, renewed before each Trello call
+    JOB_LEASE_TIMEOUT = int(os.getenv('JOB_LEASE_TIMEOUT', '300'))
+
+    # histograms served at /metrics; with METRICS_DIR each process writes its samples there and
+    # /metrics adds up every process, as needed under several uWSGI workers
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'false').lower() in ['true', 'on', '1']
+    METRICS_DIR = os.getenv('METRICS_DIR')
+    METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '5'))
+    # bearer token required by /metrics when set
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+    # bearer token of the /api/admin views, they answer 404 while it's unset, and X-Profile header value profiling a request
+    ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+
+    # profiles of api requests, in a ring buffer of the last PROFILING_MAX_PROFILES
+    PROFILING_DIR = os.getenv('PROFILING_DIR', os.path.join(PROJECT_DIR, 'data', 'profiles'))
+    PROFILING_MAX_PROFILES = int(os.getenv('PROFILING_MAX_PROFILES', '100'))
+    # auto (pyinstrument's sampling profiler when installed, cProfile otherwise), pyinstrument or cprofile
+    PROFILING_PROFILER = os.getenv('PROFILING_PROFILER', 'auto')
+    # share of the requests profiled, their profile is kept when they take longer than the threshold in seconds
+    PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0'))
+    PROFILING_SLOW_THRESHOLD = float(os.getenv('PROFILING_SLOW_THRESHOLD', '1'))
+
+    # engine profile: auto (sqlite for SQLite URLs, server otherwise), sqlite, server or none (driver defaults)
+    DATABASE_ENGINE_PROFILE = os.getenv('DATABASE_ENGINE_PROFILE', 'auto')
+    # sqlite profile, the pragmas are set on every new connection
+    SQLITE_PRAGMAS = {
+        'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', '5000')),
+        'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))),
+        # negative values are KiB
+        'cache_size': int(os.getenv('SQLITE_CACHE_SIZE', '-64000')),
+    }
+    SQLITE_POOL_SIZE = int(os.getenv('SQLITE_POOL_SIZE', '5'))
+    # server profile (PostgreSQL, MySQL)
+    DATABASE_POOL_SIZE = int(os.getenv('DATABASE_POOL_SIZE', '10'))
+    DATABASE_MAX_OVERFLOW = int(os.getenv('DATABASE_MAX_OVERFLOW', '20'))
+    DATABASE_POOL_TIMEOUT = int(os.getenv('DATABASE_POOL_TIMEOUT', '30'))
+    DATABASE_POOL_RECYCLE = int(os.getenv('DATABASE_POOL_RECYCLE', '1800'))
+    DATABASE_POOL_PRE_PING = os.getenv('DATABASE_POOL_PRE_PING', 'true').lower() in ['true', 'on', '1']
+
+    @classmethod
+    def engine_profile(cls, app):
+        profile = app.config['DATABASE_ENGINE_PROFILE']
+        if profile == 'auto':
+            return 'sqlite' if app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite') else 'server'
+        return profile
 
     @classmethod
     def init_app(cls, app):
-        pass
+        config = app.config
+        profile = config['DATABASE_ENGINE_PROFILE'] = cls.engine_profile(app)
+        options = {}
+        if profile == 'sqlite' and config['SQLALCHEMY_DATABASE_URI'] not in ('sqlite://', 'sqlite:///:memory:'):
+            # keep the connections and their pragmas instead of SQLAlchemy's NullPool for SQLite files
+            options = {
+                'poolclass': QueuePool,
+                'pool_size': config['SQLITE_POOL_SIZE'],
+                'max_overflow': config['DATABASE_MAX_OVERFLOW'],
+                'connect_args': {'timeout': config['SQLITE_PRAGMAS']['busy_timeout'] / 1000, 'check_same_thread': False},
+            }
+        elif profile == 'server':
+            options = {
+                'pool_size': config['DATABASE_POOL_SIZE'],
+                'max_overflow': config['DATABASE_MAX_OVERFLOW'],
+                'pool_timeout': config['DATABASE_POOL_TIMEOUT'],
+                'pool_recycle': config['DATABASE_POOL_RECYCLE'],
+                'pool_pre_ping': config['DATABASE_POOL_PRE_PING'],
+            }
+        config['SQLALCHEMY_ENGINE_OPTIONS'] = {**options, **config.get('SQLALCHEMY_ENGINE_OPTIONS', {})}
 
 
 class DevelopmentConfig(Config):
@@ -41,6 +178,8 @@ class ProductionConfig(Config):
 
     @classmethod
     def init_app(cls, app):
+        super().init_app(app)
+
         # log to stderr
         import logging
         from logging import StreamHandler
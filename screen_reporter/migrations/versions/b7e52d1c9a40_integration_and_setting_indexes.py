@@ -0,0 +1,36 @@
+"""integration and setting indexes
+
+Revision ID: b7e52d1c9a40
+Revises: f2d6c3a8b915
+Create Date: 2026-10-18 15:02:17.508113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e52d1c9a40'
+down_revision = 'f2d6c3a8b915'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # keep the most recent active integration of each user before enforcing a single one
+    integration = sa.table('integration', sa.column('pk', sa.Integer), sa.column('user_pk', sa.Integer), sa.column('active', sa.Boolean))
+    latest = sa.select([sa.func.max(integration.c.pk)]).where(integration.c.active == sa.true()).group_by(integration.c.user_pk)
+    op.execute(integration.update()
+               .where(sa.and_(integration.c.active == sa.true(), integration.c.pk.notin_(latest)))
+               .values(active=False))
+
+    op.create_index('ix_setting_user_pk', 'setting', ['user_pk'], unique=False)
+    op.create_index('ix_integration_user_pk_pk', 'integration', ['user_pk', 'pk'], unique=False)
+    op.create_index('uq_integration_user_pk_active', 'integration', ['user_pk'], unique=True,
+                    sqlite_where=sa.text('active = 1'), postgresql_where=sa.text('active'))
+
+
+def downgrade():
+    op.drop_index('uq_integration_user_pk_active', table_name='integration')
+    op.drop_index('ix_integration_user_pk_pk', table_name='integration')
+    op.drop_index('ix_setting_user_pk', table_name='setting')
@@ -0,0 +1,28 @@
+"""outbox message templates
+
+Revision ID: d3a7f9c2e618
+Revises: b7e52d1c9a40
+Create Date: 2026-10-18 18:20:41.327905
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3a7f9c2e618'
+down_revision = 'b7e52d1c9a40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('outboxmessage') as batch_op:
+        batch_op.add_column(sa.Column('template', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('context', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('outboxmessage') as batch_op:
+        batch_op.drop_column('context')
+        batch_op.drop_column('template')
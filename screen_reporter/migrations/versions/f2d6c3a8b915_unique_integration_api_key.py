@@ -0,0 +1,54 @@
+"""unique integration api key
+
+Revision ID: f2d6c3a8b915
+Revises: e4b9a1c07d35
+Create Date: 2026-10-18 13:20:41.287406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2d6c3a8b915'
+down_revision = 'e4b9a1c07d35'
+branch_labels = None
+depends_on = None
+
+
+def remove_duplicate_api_keys():
+    """
+    Keep one integration per user and api key, the active one or else the latest. A key shared by
+    several users can't be settled here, the upgrade stops and names the integrations.
+    """
+    connection = op.get_bind()
+    integration = sa.table('integration', sa.column('pk', sa.Integer), sa.column('user_pk', sa.Integer),
+                           sa.column('api_key', sa.Text), sa.column('active', sa.Boolean))
+    rows = connection.execute(sa.select([integration.c.pk, integration.c.user_pk, integration.c.api_key, integration.c.active])
+                              .where(integration.c.api_key.isnot(None))).fetchall()
+    kept = {}
+    for row in sorted(rows, key=lambda row: (bool(row.active), row.pk)):
+        kept[(row.user_pk, row.api_key)] = row.pk
+    removed = [row.pk for row in rows if kept[(row.user_pk, row.api_key)] != row.pk]
+    if removed:
+        op.execute(integration.delete().where(integration.c.pk.in_(removed)))
+
+    owners = {}
+    for (user_pk, api_key), pk in kept.items():
+        owners.setdefault(api_key, []).append(pk)
+    shared = sorted(pk for pks in owners.values() if len(pks) > 1 for pk in pks)
+    if shared:
+        raise RuntimeError('Integrations {} of different users share an api key, delete or change them before '
+                           'upgrading.'.format(', '.join(str(pk) for pk in shared)))
+
+
+def upgrade():
+    remove_duplicate_api_keys()
+    # batch mode, SQLite can only add a constraint by copying the table
+    with op.batch_alter_table('integration') as batch_op:
+        batch_op.create_unique_constraint('uq_integration_api_key', ['api_key'])
+
+
+def downgrade():
+    with op.batch_alter_table('integration') as batch_op:
+        batch_op.drop_constraint('uq_integration_api_key', type_='unique')
@@ -0,0 +1,59 @@
+import pytest
+from config import TestingConfig
+from app import create_app, db, models
+from app.trello_client import cache, clients
+
+
+# the configuration classes are filled from the environment at import, tests override their attributes
+TEST_CONFIG = {
+    'JOB_WORKERS': 0,
+    'JOB_BACKOFF_BASE': 0,
+    'MAIL_OUTBOX_ENABLED': False,
+    'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+    'METRICS_ENABLED': False,
+}
+
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    """
+    Settings of the test app, a test may change them before using ``app``
+    """
+    return {
+        **TEST_CONFIG,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'test.sqlite'),
+        'UPLOAD_DIR': str(tmp_path / 'uploads'),
+    }
+
+
+@pytest.fixture
+def app(config, monkeypatch):
+    for name, value in config.items():
+        monkeypatch.setattr(TestingConfig, name, value, raising=False)
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.get_engine(app).dispose()
+    # the Trello clients and lookups are kept per process, not per app
+    for api_key in list(clients._clients):
+        clients.evict(api_key)
+    cache.invalidate(lambda key: True)
+
+
+@pytest.fixture
+def user(app):
+    user = models.User(fullname='Test User', email='test@example.com')
+    user.password = 'secret'
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def integration(app, user):
+    integration = models.Integration(provider='trello', api_key='test-key', active=True, user_pk=user.pk)
+    db.session.add(integration)
+    db.session.commit()
+    return integration
@@ -0,0 +1,129 @@
+import pytest
+from flask_jwt_extended import create_access_token
+from app import db, models
+from app.api.integrations import IntegrationBulkAPI
+
+
+@pytest.fixture
+def headers(user):
+    return {'Authorization': 'Bearer ' + create_access_token(identity=user.pk)}
+
+
+@pytest.fixture
+def integrations(user):
+    integrations = [models.Integration(provider='trello', api_key='key-{}'.format(index), active=index == 0, user_pk=user.pk)
+                    for index in range(3)]
+    db.session.add_all(integrations)
+    db.session.commit()
+    return integrations
+
+
+def api_keys(user):
+    db.session.expire_all()
+    return {integration.pk: integration.api_key for integration in models.Integration.query.filter_by(user_pk=user.pk)}
+
+
+def test_bulk_create_users_answers_each_item(app):
+    response = app.test_client().post('/api/users/bulk', json=[
+        {'fullname': 'First', 'email': 'first@example.com', 'password': 'secret'},
+        {'fullname': 'Second', 'email': 'second@example.com', 'password': 'secret'},
+    ])
+
+    assert response.status_code == 201
+    items = response.get_json()['items']
+    assert [item['email'] for item in items] == ['first@example.com', 'second@example.com']
+    assert all(item['id'] for item in items)
+    assert models.Setting.query.filter(models.Setting.user_pk.in_([item['id'] for item in items])).count() == 2
+
+
+def test_bulk_create_reports_invalid_and_duplicated_items_by_index(app, user):
+    response = app.test_client().post('/api/users/bulk', json=[
+        {'fullname': 'First', 'email': 'first@example.com'},
+        {'fullname': '', 'email': 'invalid@example.com'},
+        {'fullname': 'Again', 'email': 'first@example.com'},
+        {'fullname': 'Taken', 'email': user.email},
+    ])
+    assert response.status_code == 400
+    assert set(response.get_json()['message']) == {'1'}
+
+    response = app.test_client().post('/api/users/bulk', json=[
+        {'fullname': 'First', 'email': 'first@example.com'},
+        {'fullname': 'Again', 'email': 'first@example.com'},
+        {'fullname': 'Taken', 'email': user.email},
+    ])
+    assert response.status_code == 400
+    assert response.get_json()['message'] == {'1': {'email': 'email already exist.'}, '2': {'email': 'email already exist.'}}
+    assert models.User.query.count() == 1
+
+
+def test_bulk_update_integrations(app, user, headers, integrations):
+    first, second, _ = integrations
+
+    response = app.test_client().patch('/api/integrations/bulk', headers=headers, json=[
+        {'id': first.pk, 'api_key': 'new-0'}, {'id': second.pk, 'provider': 'jira'},
+    ])
+
+    assert response.status_code == 200
+    assert [(item['id'], item['api_key'], item['provider']) for item in response.get_json()['items']] == \
+        [(first.pk, 'new-0', 'trello'), (second.pk, 'key-1', 'jira')]
+
+
+def test_bulk_update_swaps_unique_values(app, user, headers, integrations):
+    first, second, third = integrations
+
+    response = app.test_client().patch('/api/integrations/bulk', headers=headers, json=[
+        {'id': first.pk, 'api_key': 'key-1'}, {'id': second.pk, 'api_key': 'key-2'}, {'id': third.pk, 'api_key': 'key-0'},
+    ])
+
+    assert response.status_code == 200
+    assert api_keys(user) == {first.pk: 'key-1', second.pk: 'key-2', third.pk: 'key-0'}
+
+
+def test_leftover_constraint_violations_are_rejected(app, user, headers, integrations, monkeypatch):
+    first, second, _ = integrations
+    monkeypatch.setattr(IntegrationBulkAPI, 'release_unique_values', lambda self, instances, changes: None)
+
+    response = app.test_client().patch('/api/integrations/bulk', headers=headers, json=[
+        {'id': first.pk, 'api_key': 'key-1'}, {'id': second.pk, 'api_key': 'key-0'},
+    ])
+
+    assert response.status_code == 400
+    assert api_keys(user) == {first.pk: 'key-0', second.pk: 'key-1', integrations[2].pk: 'key-2'}
+
+
+def test_bulk_update_rejects_clashes(app, user, headers, integrations):
+    first, second, third = integrations
+    other = models.Integration(provider='trello', api_key='other-key', active=False, user_pk=None)
+    db.session.add(other)
+    db.session.commit()
+    client = app.test_client()
+
+    response = client.patch('/api/integrations/bulk', headers=headers, json=[
+        {'id': first.pk, 'api_key': 'same'}, {'id': second.pk, 'api_key': 'same'},
+    ])
+    assert response.status_code == 400
+    assert response.get_json()['message'] == {'1': {'api_key': 'api_key already exist.'}}
+
+    # the value of a row outside the batch, and of a batch row keeping it
+    response = client.patch('/api/integrations/bulk', headers=headers, json=[
+        {'id': first.pk, 'api_key': 'other-key'}, {'id': second.pk, 'api_key': 'key-2'}, {'id': third.pk, 'provider': 'jira'},
+    ])
+    assert response.status_code == 400
+    assert response.get_json()['message'] == {'0': {'api_key': 'api_key already exist.'}, '2': {'api_key': 'api_key already exist.'}}
+
+    response = client.patch('/api/integrations/bulk', headers=headers, json=[{'id': other.pk, 'api_key': 'mine'}])
+    assert response.status_code == 400
+    assert response.get_json()['message'] == {'0': {'id': 'Not found.'}}
+    assert api_keys(user) == {first.pk: 'key-0', second.pk: 'key-1', third.pk: 'key-2'}
+
+
+def test_bulk_destroy_integrations(app, user, headers, integrations):
+    first, second, third = integrations
+    client = app.test_client()
+
+    response = client.delete('/api/integrations/bulk?ids={},{}'.format(first.pk, 999), headers=headers)
+    assert response.status_code == 404
+    assert response.get_json()['message'] == {'ids': [999]}
+
+    assert client.delete('/api/integrations/bulk?ids={},{}'.format(first.pk, second.pk), headers=headers).status_code == 204
+    assert api_keys(user) == {third.pk: 'key-2'}
@@ -0,0 +1,49 @@
+import pytest
+import requests
+from trello.exceptions import ResourceUnavailable, Unauthorized
+from app.cache import TTLCache
+from app.trello_client import transient_error
+
+
+def response(status_code):
+    response = requests.Response()
+    response.status_code = status_code
+    return response
+
+
+def failing(err):
+    def loader():
+        raise err
+    return loader
+
+
+@pytest.fixture
+def cache():
+    cache = TTLCache(ttl=0, stale_ttl=3600, transient=transient_error)
+    cache.get_or_load('boards', lambda: ['board0'])
+    return cache
+
+
+@pytest.mark.parametrize('err', [
+    ResourceUnavailable('injected failure', response(500)),
+    ResourceUnavailable('rate limited', response(429)),
+    requests.ConnectionError('refused'),
+    requests.Timeout('timed out'),
+])
+def test_transient_errors_serve_the_stale_value(cache, err):
+    assert cache.get_or_load('boards', failing(err)) == ['board0']
+    assert cache.stats()['stale_hits'] == 1
+
+
+@pytest.mark.parametrize('err', [
+    Unauthorized('invalid key', response(401)),
+    ResourceUnavailable('not found', response(404)),
+    ValueError('bad payload'),
+])
+def test_other_errors_propagate_and_drop_the_entry(cache, err):
+    with pytest.raises(type(err)):
+        cache.get_or_load('boards', failing(err))
+    # not even a transient error brings the dropped value back
+    with pytest.raises(requests.Timeout):
+        cache.get_or_load('boards', failing(requests.Timeout('timed out')))
+    assert cache.stats()['stale_hits'] == 0
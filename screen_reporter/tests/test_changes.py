@@ -0,0 +1,86 @@
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from app import db
+from app.mixins import Changes
+
+
+@pytest.fixture
+def statements(app):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = db.get_engine(app)
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    yield statements
+    event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def updates(statements):
+    return [statement for statement in statements if statement.startswith('UPDATE')]
+
+
+def test_changes_hold_the_old_values(user):
+    user.fullname, user.email = 'Renamed User', user.email
+    user.password = 'changed'
+
+    changes = Changes(user)
+
+    assert changes
+    assert 'fullname' in changes and 'email' not in changes
+    assert changes.original('fullname') == 'Test User'
+    assert changes.original('email') == 'test@example.com'
+    assert user.check_original_password('secret', changes)
+    assert not user.check_original_password('changed', changes)
+
+
+def test_unchanged_instances_have_no_changes(user):
+    user.fullname = user.fullname
+
+    assert not Changes(user)
+
+
+def test_an_update_writes_only_the_changed_columns(app, user, statements):
+    response = app.test_client().put('/api/user/{}'.format(user.pk),
+                                     json={'fullname': 'Renamed User', 'email': user.email, 'current_password': 'secret'})
+
+    assert response.status_code == 200
+    assert response.get_json()['fullname'] == 'Renamed User'
+    [statement] = updates(statements)
+    assert 'fullname=' in statement and 'email=' not in statement
+
+
+def test_an_update_without_changes_is_not_written(app, user, statements):
+    updated = user.updated
+
+    response = app.test_client().put('/api/user/{}'.format(user.pk),
+                                     json={'fullname': user.fullname, 'email': user.email, 'current_password': 'secret'})
+
+    assert response.status_code == 200
+    assert updates(statements) == []
+    db.session.expire_all()
+    assert user.updated == updated
+
+
+def test_the_current_password_is_checked_against_the_old_one(app, user):
+    response = app.test_client().put('/api/user/{}'.format(user.pk),
+                                     json={'fullname': user.fullname, 'email': user.email, 'password': 'changed',
+                                           'current_password': 'changed'})
+
+    assert response.status_code == 400
+    db.session.expire_all()
+    assert user.check_password('secret')
+
+
+def test_an_unchanged_api_key_keeps_the_trello_client(app, integration, monkeypatch):
+    forgotten = []
+    monkeypatch.setattr('app.api.integrations.forget_integration', lambda instance, api_key=None: forgotten.append(api_key))
+    client, url = app.test_client(), '/api/integration/{}'.format(integration.pk)
+    headers = {'Authorization': 'Bearer ' + create_access_token(identity=integration.user_pk)}
+
+    assert client.patch(url, headers=headers, json={'api_key': 'test-key'}).status_code == 200
+    assert forgotten == []
+    assert client.patch(url, headers=headers, json={'api_key': 'new-key'}).status_code == 200
+    assert forgotten == ['test-key']
@@ -0,0 +1,27 @@
+from datetime import datetime, timedelta, timezone
+import time
+import pytest
+from werkzeug.http import http_date, parse_date
+
+
+@pytest.fixture
+def local_timezone(monkeypatch):
+    # a server running 5 hours behind UTC
+    monkeypatch.setenv('TZ', 'EST+05')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_last_modified_is_utc(local_timezone, app, user):
+    client = app.test_client()
+
+    response = client.get('/api/user/{}'.format(user.pk))
+    last_modified = parse_date(response.headers['Last-Modified'])
+    assert abs(last_modified - datetime.now(timezone.utc).replace(tzinfo=None)) < timedelta(minutes=1)
+
+    response = client.get('/api/user/{}'.format(user.pk), headers={'If-Modified-Since': response.headers['Last-Modified']})
+    assert response.status_code == 304
+    earlier = http_date(last_modified - timedelta(hours=1))
+    assert client.get('/api/user/{}'.format(user.pk), headers={'If-Modified-Since': earlier}).status_code == 200
@@ -0,0 +1,58 @@
+from flask import Flask
+from sqlalchemy.pool import QueuePool
+from config import TestingConfig
+from app import db
+
+PRAGMAS = ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size', 'cache_size')
+
+
+def engine_options(**config):
+    app = Flask(__name__)
+    app.config.from_object(TestingConfig)
+    app.config.update(config)
+    TestingConfig.init_app(app)
+    return app.config['DATABASE_ENGINE_PROFILE'], app.config['SQLALCHEMY_ENGINE_OPTIONS']
+
+
+def pragmas(connection):
+    return {name: connection.execute('PRAGMA {}'.format(name)).scalar() for name in PRAGMAS}
+
+
+def test_sqlite_files_get_a_pool_and_the_pragmas(app):
+    engine = db.get_engine(app)
+
+    assert app.config['DATABASE_ENGINE_PROFILE'] == 'sqlite'
+    assert isinstance(engine.pool, QueuePool) and engine.pool.size() == 5
+    # every pooled connection, not only the first one
+    with engine.connect() as first, engine.connect() as second:
+        assert pragmas(first) == pragmas(second) == {
+            'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 5000, 'mmap_size': 256 * 1024 * 1024, 'cache_size': -64000,
+        }
+
+
+def test_sqlite_files_wait_for_locks_across_threads(tmp_path):
+    profile, options = engine_options(SQLALCHEMY_DATABASE_URI='sqlite:///' + str(tmp_path / 'data.sqlite'), SQLITE_POOL_SIZE=3)
+
+    assert profile == 'sqlite'
+    assert options == {'poolclass': QueuePool, 'pool_size': 3, 'max_overflow': 20,
+                       'connect_args': {'timeout': 5, 'check_same_thread': False}}
+
+
+def test_in_memory_sqlite_keeps_the_default_pool():
+    assert engine_options(SQLALCHEMY_DATABASE_URI='sqlite://') == ('sqlite', {})
+    assert engine_options(SQLALCHEMY_DATABASE_URI='sqlite:///:memory:') == ('sqlite', {})
+
+
+def test_servers_get_the_server_pool():
+    profile, options = engine_options(SQLALCHEMY_DATABASE_URI='postgresql://localhost/reporter', DATABASE_POOL_PRE_PING=False)
+
+    assert profile == 'server'
+    assert options == {'pool_size': 10, 'max_overflow': 20, 'pool_timeout': 30, 'pool_recycle': 1800, 'pool_pre_ping': False}
+
+
+def test_explicit_options_win_and_none_keeps_the_driver_defaults(tmp_path):
+    url = 'sqlite:///' + str(tmp_path / 'data.sqlite')
+
+    assert engine_options(SQLALCHEMY_DATABASE_URI=url, DATABASE_ENGINE_PROFILE='none') == ('none', {})
+    profile, options = engine_options(SQLALCHEMY_DATABASE_URI=url, SQLALCHEMY_ENGINE_OPTIONS={'pool_size': 1, 'echo': True})
+    assert (options['poolclass'], options['pool_size'], options['echo']) == (QueuePool, 1, True)
@@ -0,0 +1,20 @@
+from app.serializers import _dumpers
+
+
+def test_equivalent_field_selections_share_one_dumper(app, user):
+    client = app.test_client()
+    _dumpers.clear()
+
+    responses = [client.get('/api/users?fields=' + fields) for fields in ('email,id', 'id,email', 'id,email,id', ' email , id ')]
+
+    assert [response.get_json()['items'] for response in responses] == [[{'id': user.pk, 'email': user.email}]] * 4
+    assert len({response.headers['ETag'] for response in responses}) == 1
+    assert len(_dumpers) == 1
+
+
+def test_field_selections_are_checked(app, user):
+    client = app.test_client()
+
+    assert client.get('/api/users?fields=id,password').status_code == 400
+    assert client.get('/api/users?fields=' + ','.join(['id'] * 21)).status_code == 400
+    assert client.get('/api/user/{}?fields={}'.format(user.pk, ','.join(['id'] * 20))).get_json() == {'id': user.pk}
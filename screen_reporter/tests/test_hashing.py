@@ -0,0 +1,14 @@
+from werkzeug.security import generate_password_hash
+from app.hashing import hasher
+
+
+def test_hashes_with_werkzeug_defaults_are_kept(app):
+    assert not hasher.needs_rehash(generate_password_hash('secret', 'pbkdf2:sha256:1000'))
+
+
+def test_hashes_with_another_cost_are_upgraded(app):
+    hashed = generate_password_hash('secret', 'pbkdf2:sha256:500')
+
+    assert hasher.verify(hashed, 'secret')
+    assert hasher.needs_rehash(hashed)
+    assert not hasher.needs_rehash(hasher.hash('secret'))
@@ -0,0 +1,48 @@
+from multiprocessing import spawn
+import os
+import sys
+import pytest
+from app import images
+
+Image = pytest.importorskip('PIL.Image')
+
+
+@pytest.fixture
+def config(config):
+    return {**config, 'IMAGE_PIPELINE_ENABLED': True, 'IMAGE_PIPELINE_MIN_SIZE': 0, 'IMAGE_PROCESSES': 1}
+
+
+@pytest.fixture
+def pool():
+    executable = spawn.get_executable()
+    yield
+    if images._pool is not None:
+        images._pool.shutdown()
+        images._pool = None
+    spawn.set_executable(executable)
+
+
+@pytest.fixture
+def upload(tmp_path):
+    path = tmp_path / 'screenshot.png'
+    Image.new('RGB', (2400, 1200), 'white').save(str(path), 'PNG', compress_level=0)
+    return {'path': str(path), 'filename': 'screenshot.png', 'mime_type': 'image/png'}
+
+
+def test_pool_starts_under_uwsgi(app, pool, upload, tmp_path, monkeypatch):
+    # uWSGI leaves its own binary in sys.executable
+    monkeypatch.setattr(sys, 'executable', str(tmp_path / 'bin' / 'uwsgi'))
+
+    optimized = images.optimized_upload(upload, images.submit_optimize(upload))
+
+    assert optimized is not upload
+    assert os.path.getsize(optimized['path']) < os.path.getsize(upload['path'])
+    with Image.open(optimized['path']) as image:
+        assert image.size == (1920, 960)
+
+
+def test_unknown_interpreter_sends_the_original(app, pool, upload):
+    app.config['IMAGE_PYTHON_EXECUTABLE'] = '/nonexistent/python'
+
+    assert images.submit_optimize(upload) is None
+    assert images._pool is None
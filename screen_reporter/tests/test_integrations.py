@@ -0,0 +1,60 @@
+from flask_jwt_extended import create_access_token
+from app import db, models
+from app.identity import Identity
+
+
+def test_update_activates_the_integration_and_deactivates_the_others(app, user, integration):
+    other = models.Integration(provider='trello', api_key='other-key', active=False, user_pk=user.pk)
+    db.session.add(other)
+    db.session.commit()
+    headers = {'Authorization': 'Bearer ' + create_access_token(identity=user.pk)}
+
+    response = app.test_client().put('/api/integration/{}'.format(other.pk), headers=headers,
+                                     json={'provider': 'trello', 'api_key': 'other-key'})
+
+    assert response.status_code == 200
+    db.session.expire_all()
+    active = models.Integration.query.filter_by(user_pk=user.pk, active=True).all()
+    assert [item.pk for item in active] == [other.pk]
+
+
+def test_first_integration_is_activated(app, user):
+    headers = {'Authorization': 'Bearer ' + create_access_token(identity=user.pk)}
+
+    response = app.test_client().post('/api/integrations', headers=headers, json={'provider': 'trello', 'api_key': 'first-key'})
+
+    assert response.status_code == 201
+    assert response.get_json()['active'] is True
+
+
+def test_concurrent_first_integration_stays_inactive(app, user, monkeypatch):
+    # another request activated its integration after this one loaded the identity
+    monkeypatch.setattr('app.api.integrations.current_identity', lambda: Identity(user))
+    db.session.add(models.Integration(provider='trello', api_key='concurrent-key', active=True, user_pk=user.pk))
+    db.session.commit()
+    headers = {'Authorization': 'Bearer ' + create_access_token(identity=user.pk)}
+
+    response = app.test_client().post('/api/integrations', headers=headers, json={'provider': 'trello', 'api_key': 'first-key'})
+
+    assert response.status_code == 201
+    assert response.get_json()['active'] is False
+    assert models.Integration.query.filter_by(user_pk=user.pk, active=True).count() == 1
+
+
+def test_unique_constraint_violations_answer_400(app, user, integration):
+    other = models.User(fullname='Other', email='other@example.com')
+    other.password = 'secret'
+    db.session.add(other)
+    db.session.commit()
+    client = app.test_client()
+    headers = {'Authorization': 'Bearer ' + create_access_token(identity=other.pk)}
+
+    # without ?check_unique=1 the clash is only found by the database
+    response = client.post('/api/integrations', headers=headers, json={'provider': 'trello', 'api_key': integration.api_key})
+    assert response.status_code == 400
+    assert response.get_json()['message'] == {'api_key': 'api_key already exist.'}
+
+    response = client.put('/api/user/{}'.format(other.pk), headers=headers,
+                          json={'fullname': 'Other', 'email': user.email, 'current_password': 'secret'})
+    assert response.status_code == 400
+    assert response.get_json()['message'] == {'email': 'email already exist.'}
@@ -0,0 +1,114 @@
+import base64
+from datetime import datetime, timedelta
+import os
+import pytest
+from flask_jwt_extended import create_access_token
+from benchmarks.trello_stub import TrelloStub
+from app import db, models
+from app.jobs import queue
+
+PNG = base64.b64encode(b'\x89PNG\r\n\x1a\n' + b'\x00' * 64).decode()
+
+
+@pytest.fixture
+def stub():
+    stub = TrelloStub().start()
+    yield stub
+    stub.shutdown()
+    stub.server_close()
+
+
+@pytest.fixture
+def config(config, stub):
+    return {**config, 'TRELLO_API_URL': stub.url, 'JOB_LEASE_TIMEOUT': 60}
+
+
+@pytest.fixture
+def headers(integration):
+    return {'Authorization': 'Bearer ' + create_access_token(identity=integration.user_pk)}
+
+
+def post_card(app, headers):
+    return app.test_client().post('/api/trello/create-card', headers=headers, json={
+        'name': 'Broken button', 'description': 'It does nothing', 'board': 'board0', 'list': 'list0',
+        'attachment': 'data:image/png;base64,' + PNG,
+    })
+
+
+def reclaim(job):
+    # what another worker does once the lease expired
+    models.Job.query.filter_by(pk=job.pk).update({'attempts': job.attempts + 1, 'locked_at': datetime.now()})
+    db.session.commit()
+
+
+def test_create_card_answers_202_with_the_job_location(app, headers, stub):
+    response = post_card(app, headers)
+
+    assert response.status_code == 202
+    job = response.get_json()
+    assert job['status'] == models.Job.PENDING
+    assert response.headers['Location'].endswith('/api/trello/jobs/{}'.format(job['id']))
+
+    queue._run(queue._claim())
+    response = app.test_client().get(response.headers['Location'], headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()['status'] == models.Job.SUCCEEDED
+    assert response.get_json()['result']['id'] == 'card1'
+
+
+def test_jobs_are_only_shown_to_their_owner(app, headers, user):
+    location = post_card(app, headers).headers['Location']
+    other = models.User(fullname='Other', email='other@example.com')
+    db.session.add(other)
+    db.session.commit()
+
+    response = app.test_client().get(location, headers={'Authorization': 'Bearer ' + create_access_token(identity=other.pk)})
+
+    assert response.status_code == 404
+
+
+def test_a_worker_that_lost_its_lease_creates_no_card(app, headers, stub):
+    post_card(app, headers)
+    job = queue._claim()
+    reclaim(job)
+
+    queue._run(job)
+
+    assert stub.calls == {}
+    db.session.refresh(job)
+    assert job.status == models.Job.RUNNING and job.result is None
+
+
+def test_the_outcome_of_a_reclaimed_job_is_dropped(app, monkeypatch):
+    monkeypatch.setitem(queue.tasks, 'test.reclaimed', lambda job: reclaim(job) or {'done': True})
+    job = queue.enqueue('test.reclaimed', {})
+
+    queue._run(queue._claim())
+
+    db.session.refresh(job)
+    assert job.status == models.Job.RUNNING and job.result is None
+
+
+def test_abandoned_jobs_fail_after_their_last_attempt(app, headers):
+    post_card(app, headers)
+    job = models.Job.query.one()
+    attachment = job.payload['attachment']['path']
+    job.status, job.attempts, job.locked_at = models.Job.RUNNING, job.max_attempts, datetime.now() - timedelta(minutes=5)
+    db.session.commit()
+
+    assert queue._claim() is None
+
+    db.session.refresh(job)
+    assert job.status == models.Job.FAILED
+    assert not os.path.exists(attachment)
+
+
+def test_abandoned_jobs_are_retried_before_their_last_attempt(app, monkeypatch):
+    monkeypatch.setitem(queue.tasks, 'test.retried', lambda job: {'done': True})
+    job = queue.enqueue('test.retried', {})
+    job.status, job.attempts, job.locked_at = models.Job.RUNNING, 1, datetime.now() - timedelta(minutes=5)
+    db.session.commit()
+
+    queue._run(queue._claim())
+
+    assert job.status == models.Job.SUCCEEDED and job.attempts == 2
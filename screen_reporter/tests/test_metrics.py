@@ -0,0 +1,94 @@
+import json
+import os
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import time
+import pytest
+import requests
+from benchmarks.support import AppServer
+from app.metrics import metrics
+
+UWSGI = shutil.which('uwsgi', path=os.path.dirname(sys.executable)) or shutil.which('uwsgi')
+
+REQUEST_COUNT = re.compile(r'^api_request_duration_seconds_count\{endpoint="/api/auth/login",.*\} (\d+)$', re.M)
+
+
+class UWSGIServer(AppServer):
+    """
+    The api under uWSGI with two workers
+    """
+
+    def command(self):
+        return [UWSGI, '--http', '127.0.0.1:{}'.format(self.port), '--master', '--processes', '2',
+                '--virtualenv', sys.prefix, '--die-on-term', '--disable-logging', '--module', self.module]
+
+
+def login(server, times):
+    for _ in range(times):
+        requests.post(server.url('/api/auth/login'), json={'email': 'nobody@example.com', 'password': 'secret'})
+
+
+def ready(server):
+    # the router is restarted by the reload and answers 502 until the new workers are up
+    try:
+        return requests.get(server.url('/metrics')).ok
+    except requests.ConnectionError:
+        return False
+
+
+@pytest.fixture
+def config(config, tmp_path):
+    return {**config, 'METRICS_ENABLED': True, 'METRICS_DIR': str(tmp_path / 'metrics')}
+
+
+@pytest.fixture
+def samples(app):
+    yield
+    metrics.enabled, metrics.directory, metrics._samples = False, None, {}
+
+
+def count(samples):
+    return sum(sum(sample[:-1]) for series in samples.values() for sample in series.values())
+
+
+def test_files_of_killed_processes_are_folded(app, samples, config):
+    killed = subprocess.Popen([sys.executable, '-c', 'pass'])
+    killed.wait()
+    sample = [1] + [0] * 11 + [0.1]
+    with open(os.path.join(config['METRICS_DIR'], 'metrics-{}.json'.format(killed.pid)), 'w') as output:
+        json.dump({'api_request_duration_seconds': {'["/api/settings", "GET", "200"]': sample}}, output)
+    metrics.observe('api_request_duration_seconds', ('/api/settings', 'GET', 200), 0.001)
+
+    assert count(metrics.collect()) == 2
+    assert sorted(os.listdir(config['METRICS_DIR'])) == ['.lock', 'exited.json', 'metrics-{}.json'.format(os.getpid())]
+
+    metrics.exit()
+
+    assert count(metrics.collect()) == 2
+    assert sorted(os.listdir(config['METRICS_DIR'])) == ['.lock', 'exited.json', 'metrics-{}.json'.format(os.getpid())]
+
+
+@pytest.mark.skipif(UWSGI is None, reason='uwsgi is not installed')
+def test_counts_survive_uwsgi_reloads(tmp_path):
+    directory = tmp_path / 'metrics'
+    env = {'JOB_WORKERS': '0', 'MAIL_OUTBOX_ENABLED': 'off', 'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+           'METRICS_ENABLED': 'on', 'METRICS_DIR': str(directory), 'METRICS_FLUSH_INTERVAL': '0'}
+    with UWSGIServer(env, module='benchmarks.wsgi:application') as server:
+        login(server, 10)
+        stopped = set(os.listdir(str(directory)))
+
+        # graceful reload, every worker is replaced
+        os.kill(server.pid, signal.SIGHUP)
+        deadline = time.time() + 30
+        while time.time() < deadline:
+            if not stopped & set(os.listdir(str(directory))) and ready(server):
+                break
+            time.sleep(0.1)
+        login(server, 10)
+        response = requests.get(server.url('/metrics'))
+
+        assert sum(int(value) for value in REQUEST_COUNT.findall(response.text)) == 20
+        assert not stopped & set(os.listdir(str(directory)))
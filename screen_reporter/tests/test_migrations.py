@@ -0,0 +1,51 @@
+import os
+import pytest
+import flask_migrate
+from sqlalchemy import text
+from config import TestingConfig
+from app import create_app, db
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+
+@pytest.fixture
+def database(config, monkeypatch):
+    for name, value in config.items():
+        monkeypatch.setattr(TestingConfig, name, value, raising=False)
+    app = create_app('testing')
+    with app.app_context():
+        flask_migrate.upgrade(MIGRATIONS, revision='e4b9a1c07d35')
+        yield db.engine
+        db.session.remove()
+        db.engine.dispose()
+
+
+def add_integrations(engine, *rows):
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO user (pk, email) VALUES (1, 'first@example.com'), (2, 'second@example.com')"))
+        for pk, user_pk, api_key, active in rows:
+            connection.execute(text('INSERT INTO integration (pk, user_pk, provider, api_key, active) VALUES (:pk, :user_pk, '
+                                    "'trello', :api_key, :active)"), dict(pk=pk, user_pk=user_pk, api_key=api_key, active=active))
+
+
+def test_upgrade_keeps_one_integration_per_user_and_key(database):
+    add_integrations(database, (1, 1, 'key', True), (2, 1, 'key', False), (3, 1, 'other', False), (4, 1, 'other', False))
+
+    flask_migrate.upgrade(MIGRATIONS, revision='f2d6c3a8b915')
+
+    with database.connect() as connection:
+        assert connection.execute(text('SELECT pk FROM integration ORDER BY pk')).fetchall() == [(1, ), (4, )]
+
+
+def test_upgrade_stops_on_keys_shared_by_users(database, monkeypatch):
+    add_integrations(database, (1, 1, 'key', True), (2, 2, 'key', True))
+    # Flask-Migrate logs the error and exits, the migration environment replaces the log handlers
+    errors = []
+    monkeypatch.setattr(flask_migrate.log, 'error', errors.append)
+
+    with pytest.raises(SystemExit):
+        flask_migrate.upgrade(MIGRATIONS, revision='f2d6c3a8b915')
+
+    assert errors == ['Error: Integrations 1, 2 of different users share an api key, delete or change them before upgrading.']
+    with database.connect() as connection:
+        assert connection.execute(text('SELECT count(*) FROM integration')).scalar() == 2
@@ -0,0 +1,137 @@
+from datetime import datetime, timedelta
+import re
+import pytest
+from flask_mail import email_dispatched
+from benchmarks.smtp_stub import SMTPStub
+from app import db, models
+from app.outbox import outbox
+
+
+@pytest.fixture
+def smtp():
+    smtp = SMTPStub().start()
+    yield smtp
+    smtp.shutdown()
+    smtp.server_close()
+
+
+@pytest.fixture
+def config(config, smtp):
+    return {**config, 'MAIL_OUTBOX_ENABLED': True, 'MAIL_OUTBOX_MAX_ATTEMPTS': 2, 'MAIL_SERVER': '127.0.0.1',
+            'MAIL_PORT': smtp.port, 'MAIL_USE_TLS': False, 'FLASK_MAIL_SENDER': 'test@example.com',
+            'MAIL_OUTBOX_BACKOFF_BASE': 30}
+
+
+@pytest.fixture
+def dispatched(app):
+    messages = []
+    with email_dispatched.connected_to(lambda message, app: messages.append(message)):
+        yield messages
+
+
+def deliver():
+    """
+    One pass of the outbox thread
+    """
+    outbox._purge_due()
+    batch = outbox._claim()
+    if batch:
+        outbox._send(batch)
+    return batch
+
+
+def test_messages_are_sent_and_deleted(app, smtp):
+    outbox.enqueue('Reset Password', ['user@example.com'], 'Your new password is secret')
+    outbox.enqueue('Reset Password', ['other@example.com'], 'Your new password is secret')
+
+    assert len(deliver()) == 2
+    assert smtp.messages == 2
+    assert smtp.connections == 1
+    assert models.OutboxMessage.query.count() == 0
+
+
+def test_refused_messages_are_retried_then_failed(app, smtp):
+    smtp.reject_recipients = True
+    message = outbox.enqueue('Reset Password', ['user@example.com'], 'Your new password is secret')
+
+    deliver()
+    assert message.status == models.OutboxMessage.PENDING
+    assert message.attempts == 1
+    assert message.body == 'Your new password is secret'
+    # the outbox backoff, not the job queue's
+    assert message.send_at > datetime.now() + timedelta(seconds=25)
+
+    message.send_at = datetime.now()
+    db.session.commit()
+    deliver()
+    assert message.status == models.OutboxMessage.FAILED
+    assert message.attempts == 2
+    assert message.body is None
+    assert smtp.messages == 0
+
+
+def test_unreachable_relay_is_retried(app, smtp):
+    message = outbox.enqueue('Reset Password', ['user@example.com'], 'Your new password is secret')
+    smtp.shutdown()
+    smtp.server_close()
+
+    deliver()
+    assert message.status == models.OutboxMessage.PENDING
+    assert message.error
+
+
+def test_failed_messages_are_purged(app):
+    failed = models.OutboxMessage(subject='Reset Password', recipients=['user@example.com'], status=models.OutboxMessage.FAILED,
+                                  attempts=2, send_at=datetime.now(), updated=datetime.now() - timedelta(days=8))
+    db.session.add(failed)
+    db.session.commit()
+    outbox._purged_at = None
+
+    deliver()
+    assert models.OutboxMessage.query.count() == 0
+
+
+def test_disabled_outbox_sends_inline(app, smtp):
+    app.config['MAIL_OUTBOX_ENABLED'] = False
+    outbox.init_app(app)
+
+    assert outbox.enqueue('Reset Password', ['user@example.com'], 'Your new password is secret') is None
+    assert smtp.messages == 1
+    assert models.OutboxMessage.query.count() == 0
+
+
+def test_reset_passwords_are_only_rendered_when_sent(app, user, smtp, dispatched, monkeypatch):
+    # the first request would start the outbox thread
+    monkeypatch.setattr(outbox, 'start', lambda app: None)
+    response = app.test_client().post('/api/auth/reset/' + user.email)
+
+    assert response.status_code == 200
+    message = models.OutboxMessage.query.one()
+    assert (message.body, message.template, message.context) == (None, 'reset_password', {'user_pk': user.pk})
+    assert user.check_password('secret')
+
+    deliver()
+    [sent] = dispatched
+    plain_password = re.search(r'Your new password is (\S+)', sent.body).group(1)
+    db.session.expire_all()
+    assert user.check_password(plain_password)
+    assert models.OutboxMessage.query.count() == 0
+
+
+def test_failed_templates_keep_no_context(app, user, smtp):
+    smtp.reject_recipients = True
+    message = outbox.enqueue('Reset Password', [user.email], template='reset_password', context={'user_pk': user.pk})
+
+    for _ in range(2):
+        message.send_at = datetime.now()
+        db.session.commit()
+        deliver()
+    assert (message.status, message.body, message.context) == (models.OutboxMessage.FAILED, None, None)
+
+
+def test_messages_rendering_nothing_are_dropped(app, smtp):
+    outbox.enqueue('Reset Password', ['gone@example.com'], template='reset_password', context={'user_pk': 999})
+
+    deliver()
+    assert smtp.messages == 0
+    assert models.OutboxMessage.query.count() == 0
@@ -0,0 +1,77 @@
+import pytest
+from flask_jwt_extended import create_access_token
+from app import db, models
+from app.mixins import encode_cursor
+
+
+@pytest.fixture
+def headers(user):
+    return {'Authorization': 'Bearer ' + create_access_token(identity=user.pk)}
+
+
+@pytest.fixture
+def integrations(user):
+    integrations = [models.Integration(provider='trello', api_key='key-{}'.format(index), active=False, user_pk=user.pk)
+                    for index in range(5)]
+    db.session.add_all(integrations)
+    db.session.commit()
+    return [integration.pk for integration in integrations]
+
+
+def get_page(client, headers, url):
+    response = client.get(url, headers=headers)
+    assert response.status_code == 200
+    page = response.get_json()
+    return [item['id'] for item in page['items']], page
+
+
+def test_pages_follow_the_next_links(app, headers, integrations):
+    client, url, pages = app.test_client(), '/api/integrations?item_per_page=2', []
+
+    while url:
+        ids, page = get_page(client, headers, url)
+        pages.append((ids, page['has_more'], page['previous'] is not None))
+        url = page['next']
+
+    assert pages == [(integrations[:2], True, False), (integrations[2:4], True, True), (integrations[4:], False, True)]
+
+
+def test_pages_follow_the_previous_links(app, headers, integrations):
+    client = app.test_client()
+    url = '/api/integrations?item_per_page=2&before=' + encode_cursor(integrations[-1] + 1)
+    pages = []
+
+    while url:
+        ids, page = get_page(client, headers, url)
+        pages.append((ids, page['next'] is not None))
+        url = page['previous']
+
+    assert pages == [(integrations[3:], True), (integrations[1:3], True), (integrations[:1], True)]
+
+
+def test_a_full_last_page_has_no_more(app, headers, integrations):
+    client = app.test_client()
+
+    ids, page = get_page(client, headers, '/api/integrations?item_per_page=2&after=' + encode_cursor(integrations[2]))
+    assert ids == integrations[3:]
+    assert (page['has_more'], page['next']) == (False, None)
+
+    ids, page = get_page(client, headers, '/api/integrations?item_per_page=5')
+    assert ids == integrations
+    assert (page['has_more'], page['next'], page['previous']) == (False, None, None)
+
+
+def test_cursors_past_the_edges_give_empty_pages(app, headers, integrations):
+    client = app.test_client()
+
+    for cursor in ('after=' + encode_cursor(integrations[-1]), 'before=' + encode_cursor(integrations[0])):
+        ids, page = get_page(client, headers, '/api/integrations?' + cursor)
+        assert (ids, page['has_more'], page['next'], page['previous']) == ([], False, None, None)
+
+
+@pytest.mark.parametrize('cursor', ['not-base64!', encode_cursor(None), encode_cursor([1])])
+def test_invalid_cursors_are_rejected(app, headers, integrations, cursor):
+    response = app.test_client().get('/api/integrations?after=' + cursor, headers=headers)
+
+    assert response.status_code == 400
+    assert response.get_json()['message'] == {'cursor': 'Invalid cursor.'}
@@ -0,0 +1,83 @@
+import os
+import pytest
+from flask_jwt_extended import create_access_token
+from app.profiling import RequestProfiler, profiler
+
+ADMIN = {'Authorization': 'Bearer admin-token'}
+
+
+@pytest.fixture
+def config(config, tmp_path):
+    return {**config, 'ADMIN_TOKEN': 'admin-token', 'PROFILING_DIR': str(tmp_path / 'profiles'),
+            'PROFILING_PROFILER': 'cprofile', 'PROFILING_SAMPLE_RATE': 0, 'PROFILING_MAX_PROFILES': 100}
+
+
+@pytest.fixture
+def headers(user):
+    return {'Authorization': 'Bearer ' + create_access_token(identity=user.pk)}
+
+
+class Profile:
+    extension = 'txt'
+    mimetype = 'text/plain'
+
+    def save(self, path):
+        with open(path, 'w') as output:
+            output.write('profile')
+
+
+def test_requested_profiles_are_saved_and_served(app, headers):
+    client = app.test_client()
+
+    response = client.get('/api/integrations', headers={**headers, 'X-Profile': 'admin-token'})
+
+    assert response.status_code == 200
+    profile_id = response.headers['X-Profile-Id']
+    items = client.get('/api/admin/profiles', headers=ADMIN).get_json()['items']
+    assert [(item['id'], item['path'], item['status'], item['reason']) for item in items] == \
+        [(profile_id, '/api/integrations', 200, 'requested')]
+    response = client.get('/api/admin/profiles/' + profile_id, headers=ADMIN)
+    assert response.status_code == 200
+    assert response.mimetype == 'application/octet-stream'
+
+
+def test_requests_without_the_token_are_not_profiled(app, headers):
+    client = app.test_client()
+
+    for extra in ({}, {'X-Profile': 'wrong'}):
+        response = client.get('/api/integrations', headers={**headers, **extra})
+        assert response.status_code == 200
+        assert 'X-Profile-Id' not in response.headers
+    assert client.get('/api/admin/profiles', headers=ADMIN).get_json()['items'] == []
+
+
+def test_profiles_require_the_admin_token(app, headers):
+    client = app.test_client()
+
+    assert client.get('/api/admin/profiles', headers=headers).status_code == 401
+    assert client.get('/api/admin/profiles', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    app.config['ADMIN_TOKEN'] = None
+    assert client.get('/api/admin/profiles', headers=ADMIN).status_code == 404
+
+
+def test_trim_keeps_the_last_profiles(tmp_path):
+    requests = RequestProfiler()
+    requests.directory, requests.max_profiles = str(tmp_path), 2
+    profile_ids = ['20240101T0000000000{:02}-1-0000000{}'.format(index, index) for index in range(4)]
+
+    for profile_id in profile_ids:
+        requests.save(profile_id, Profile(), {'path': '/api/integrations'})
+
+    assert [item['id'] for item in requests.list()] == profile_ids[:1:-1]
+    assert sorted(os.listdir(str(tmp_path))) == sorted(name for profile_id in profile_ids[2:]
+                                                       for name in (profile_id + '.json', profile_id + '.txt'))
+    assert requests.get(profile_ids[0]) is None
+    assert requests.get(profile_ids[-1])['filename'] == profile_ids[-1] + '.txt'
+
+
+@pytest.mark.parametrize('profile_id', ['../config', '..', 'profile', '20240101T000000000000-1-0000000g'])
+def test_invalid_profile_ids_are_rejected(app, tmp_path, profile_id):
+    (tmp_path / 'config.json').write_text('{"filename": "config.json", "mimetype": "text/plain"}')
+
+    assert profiler.get(profile_id) is None
+    assert app.test_client().get('/api/admin/profiles/' + profile_id, headers=ADMIN).status_code == 404
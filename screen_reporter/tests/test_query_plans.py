@@ -0,0 +1,98 @@
+"""
+EXPLAIN QUERY PLAN of every statement the api endpoints run, recorded while calling them: a table
+read in full without an index fails the test.
+"""
+import re
+from sqlalchemy import event
+from app import db
+
+
+# a table read row by row (older SQLite versions write "SCAN TABLE user"), or read in full to build
+# a transient automatic index
+FULL_SCAN = re.compile(r'^(?:SCAN (?:TABLE )?(\w+)$|SEARCH (?:TABLE )?(\w+) USING AUTOMATIC)')
+
+# listings of a whole table, paged with a LIMIT, are expected to scan it
+ALLOWED_SCANS = {
+    ('GET /api/users', 'user'),
+}
+
+# (method, path, json body, authenticated) of the endpoints to record, in order
+CALLS = [
+    ('POST', '/api/auth/register?check_unique=1', {'fullname': 'Plan', 'email': 'plan@example.com', 'password': 'secret'}, False),
+    ('POST', '/api/auth/login', {'email': 'plan@example.com', 'password': 'secret'}, False),
+    ('GET', '/api/settings', None, True),
+    ('PUT', '/api/settings', {'color': 'blue', 'fontsize': '12px', 'linewidth': 3}, True),
+    ('POST', '/api/integrations?check_unique=1', {'provider': 'trello', 'api_key': 'plan-1'}, True),
+    ('POST', '/api/integrations', {'provider': 'trello', 'api_key': 'plan-2'}, True),
+    ('GET', '/api/integrations', None, True),
+    ('GET', '/api/integrations?after=MQ', None, True),
+    ('GET', '/api/integration/1', None, True),
+    ('PUT', '/api/integration/2', {'provider': 'trello', 'api_key': 'plan-3'}, True),
+    ('POST', '/api/integrations/bulk', [{'provider': 'trello', 'api_key': 'plan-4'}], True),
+    ('PATCH', '/api/integrations/bulk', [{'id': 3, 'provider': 'jira'}], True),
+    ('DELETE', '/api/integrations/bulk?ids=3', None, True),
+    ('DELETE', '/api/integration/1', None, True),
+    ('GET', '/api/trello/jobs/1', None, True),
+    ('POST', '/api/users/bulk', [{'fullname': 'Other', 'email': 'other@example.com', 'password': 'secret'}], False),
+    ('GET', '/api/users', None, False),
+    ('GET', '/api/users?after=MQ', None, False),
+    ('GET', '/api/user/1', None, False),
+    ('PATCH', '/api/user/1', {'fullname': 'Renamed', 'current_password': 'secret'}, False),
+    ('DELETE', '/api/auth/logout', None, True),
+]
+
+
+def record(app):
+    """
+    Call the endpoints and return the statements each of them ran, as (endpoint, sql, parameters)
+    """
+    statements, current = [], {}
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE')):
+            statements.append((current['endpoint'], statement, parameters))
+
+    engine = db.get_engine(app)
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    client, headers = app.test_client(), {}
+    try:
+        for method, path, body, authenticated in CALLS:
+            current['endpoint'] = '{} {}'.format(method, path.split('?')[0])
+            response = client.open(path, method=method, json=body, headers=headers if authenticated else None)
+            assert response.status_code < 500, current['endpoint']
+            if path.startswith('/api/auth/register'):
+                headers['Authorization'] = 'Bearer ' + response.get_json()['access_token']
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    return statements
+
+
+def explain(engine, statements):
+    """
+    Query plan of each distinct statement, as (endpoint, sql, plan lines, scanned tables)
+    """
+    plans, seen = [], set()
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        for endpoint, statement, parameters in statements:
+            if (endpoint, statement) in seen:
+                continue
+            seen.add((endpoint, statement))
+            cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters)
+            lines = [row[-1] for row in cursor.fetchall()]
+            scans = [match.group(1) or match.group(2) for match in map(FULL_SCAN.match, lines) if match]
+            plans.append((endpoint, statement, lines, scans))
+    finally:
+        connection.close()
+    return plans
+
+
+def test_queries_use_indexes(app):
+    plans = explain(db.get_engine(app), record(app))
+
+    failures = ['{}\n  {}\n  {}'.format(endpoint, ' '.join(statement.split()), '\n  '.join(lines))
+                for endpoint, statement, lines, scans in plans
+                if any((endpoint, table) not in ALLOWED_SCANS for table in scans)]
+    assert len(plans) > 30
+    assert not failures, '\n\n'.join(failures)
@@ -0,0 +1,34 @@
+from datetime import date, datetime
+import json
+import uuid
+import pytest
+from app.renderers import orjson, renderer
+
+
+DATA = {
+    'created': datetime(2020, 1, 2, 3, 4, 5),
+    'day': date(2020, 1, 2),
+    'key': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+    'errors': {1: ['Missing data for required field.']},
+    'items': [{'value': 'card1', 'label': 'Broken button'}],
+}
+
+
+@pytest.mark.skipif(orjson is None, reason='orjson is not installed')
+def test_encoders_write_the_same_bytes(app):
+    renderer.encoder = 'orjson'
+    encoded = renderer.dumps(DATA)
+    renderer.encoder = 'json'
+
+    assert encoded == renderer.dumps(DATA)
+    assert json.loads(encoded)['created'] == 'Thu, 02 Jan 2020 03:04:05 GMT'
+
+
+@pytest.mark.skipif(orjson is None, reason='orjson is not installed')
+def test_encoders_write_the_same_documents(app):
+    data = {'fullname': 'Zoë Ángel'}
+    renderer.encoder = 'orjson'
+    encoded = renderer.dumps(data)
+    renderer.encoder = 'json'
+
+    assert json.loads(encoded) == json.loads(renderer.dumps(data)) == data
@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta
+import os
+import shutil
+import sys
+import pytest
+import requests
+from benchmarks.support import AppServer
+from app import db, models
+from app.revocation import revocation
+
+
+# the api in several processes sharing one database, revocations are checked at every request
+SERVER_ENV = {
+    'JOB_WORKERS': '0',
+    'MAIL_OUTBOX_ENABLED': 'off',
+    'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+    'JWT_REVOCATION_SYNC_INTERVAL': '0',
+}
+
+UWSGI = shutil.which('uwsgi', path=os.path.dirname(sys.executable)) or shutil.which('uwsgi')
+
+
+class UWSGIServer(AppServer):
+    """
+    The api under uWSGI with two workers sharing the revoked tokens cache
+    """
+
+    def __init__(self, env, cache_items):
+        super().__init__(env, module='benchmarks.wsgi:application')
+        self.cache_items = cache_items
+
+    def command(self):
+        return [UWSGI, '--http', '127.0.0.1:{}'.format(self.port), '--master', '--processes', '2',
+                '--virtualenv', sys.prefix, '--die-on-term', '--disable-logging', '--module', self.module,
+                '--cache2', 'name=revoked_tokens,items={},blocksize=64'.format(self.cache_items)]
+
+
+def register(server, email):
+    response = requests.post(server.url('/api/auth/register'), json={'fullname': 'Test', 'email': email, 'password': 'secret'})
+    response.raise_for_status()
+    return {'Authorization': 'Bearer ' + response.json()['access_token']}
+
+
+def test_revoked_tokens_are_shared_between_processes(tmp_path):
+    env = {**SERVER_ENV, 'TEST_DATABASE_URL': 'sqlite:///' + str(tmp_path / 'shared.sqlite')}
+    with AppServer(env) as first, AppServer(env) as second:
+        headers = register(first, 'test@example.com')
+        assert requests.get(second.url('/api/settings'), headers=headers).status_code == 200
+
+        assert requests.delete(first.url('/api/auth/logout'), headers=headers).status_code == 200
+
+        assert requests.get(second.url('/api/settings'), headers=headers).status_code == 401
+        assert requests.get(first.url('/api/settings'), headers=headers).status_code == 401
+
+
+@pytest.mark.skipif(UWSGI is None, reason='uwsgi is not installed')
+def test_uwsgi_cache_is_shared_between_workers_and_reports_when_full():
+    # a cache of 2 items holds a single entry
+    with UWSGIServer({**SERVER_ENV, 'JWT_REVOCATION_BACKEND': 'uwsgi', 'JWT_ACCESS_TOKEN_EXPIRES': '3600'}, 2) as server:
+        headers, other_headers = register(server, 'test@example.com'), register(server, 'other@example.com')
+
+        assert requests.delete(server.url('/api/auth/logout'), headers=headers).status_code == 200
+        # the requests are spread over both workers
+        assert {requests.get(server.url('/api/settings'), headers=headers).status_code for _ in range(20)} == {401}
+
+        assert requests.delete(server.url('/api/auth/logout'), headers=other_headers).status_code == 503
+
+
+def test_revoking_a_token_twice(app):
+    expires = datetime.now() + timedelta(hours=1)
+    revocation.backend.revoke('jti-1', expires)
+    revocation.backend.revoke('jti-1', expires)
+
+    assert models.RevokedToken.query.filter_by(jti='jti-1').count() == 1
+    assert revocation.backend.is_revoked('jti-1')
+
+
+def test_rebuild_keeps_serving_the_previous_filter(app, monkeypatch):
+    store = revocation.backend
+    store.revoke('jti-1', None)
+    previous, load = store._filter, store._load
+    seen = []
+
+    def checked_load(bloom, last_pk):
+        # what a concurrent is_revoked reads while the new filter is loaded
+        seen.append(store._filter is previous and 'jti-1' in store._filter)
+        return load(bloom, last_pk)
+
+    monkeypatch.setattr(store, '_load', checked_load)
+    store._rebuild()
+
+    assert seen == [True]
+    assert store._filter is not previous and 'jti-1' in store._filter
@@ -0,0 +1,49 @@
+from datetime import datetime
+import pytest
+from app import db, models, schemas, serializers
+from app.serializers import get_dumper
+
+
+@pytest.fixture
+def objects(user):
+    integration = models.Integration(provider='trello', api_key='test-key', active=None, user_pk=user.pk)
+    setting = models.Setting(color='red', fontsize=None, linewidth=15, user_pk=user.pk)
+    job = models.Job(name='trello.create_card', status=models.Job.FAILED, result={'id': 'card1', 'labels': [1, None]},
+                     error=None, attempts=2, created=datetime(2020, 2, 29, 23, 59, 59, 123456), user_pk=user.pk)
+    user.fullname = None
+    db.session.add_all([integration, setting, job])
+    db.session.commit()
+    return {schemas.UserSchema: user, schemas.IntegrationSchema: integration, schemas.SettingSchema: setting, schemas.JobSchema: job}
+
+
+@pytest.mark.parametrize('schema_class, only', [
+    (schemas.UserSchema, None),
+    (schemas.UserSchema, ('email', 'pk')),
+    (schemas.IntegrationSchema, None),
+    (schemas.IntegrationSchema, ('active', 'pk')),
+    (schemas.SettingSchema, None),
+    (schemas.SettingSchema, ('fontsize', )),
+    (schemas.JobSchema, None),
+    (schemas.JobSchema, ('created', 'error', 'pk', 'result')),
+])
+def test_compiled_dumpers_match_marshmallow(app, objects, schema_class, only):
+    dumper = get_dumper(schema_class, only)
+    obj = objects[schema_class]
+
+    # compiled, not marshmallow's own dump
+    assert not hasattr(dumper, '__self__')
+    assert dumper(obj) == schema_class(only=only).dump(obj)
+    if only is None or 'pk' in only:
+        assert dumper(obj)['id'] == obj.pk
+
+
+def test_dumpers_are_bounded(app, monkeypatch):
+    monkeypatch.setattr(serializers, '_dumpers', serializers._LRU(2))
+    monkeypatch.setattr(serializers, '_schemas', serializers._LRU(2))
+    first = get_dumper(schemas.UserSchema, ('email', ))
+
+    for only in [('pk', ), ('fullname', ), ('email', 'pk')]:
+        get_dumper(schemas.UserSchema, only)
+
+    assert len(serializers._dumpers) == 2 and len(serializers._schemas) == 2
+    assert get_dumper(schemas.UserSchema, ('email', )) is not first
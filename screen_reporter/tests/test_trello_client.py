@@ -0,0 +1,50 @@
+import pytest
+from benchmarks.trello_stub import TrelloStub
+from app import models
+from app.jobs import queue
+from app.trello_client import create_card, get_trello_client
+
+
+@pytest.fixture
+def stub():
+    stub = TrelloStub().start()
+    yield stub
+    stub.shutdown()
+    stub.server_close()
+
+
+@pytest.fixture
+def config(config, stub):
+    return {**config, 'TRELLO_API_URL': stub.url}
+
+
+@pytest.fixture
+def card_data(tmp_path):
+    screenshot = tmp_path / 'screenshot.png'
+    screenshot.write_bytes(b'\x89PNG\r\n\x1a\n' + b'\x00' * 64)
+    return {
+        'name': 'Broken button', 'desc': 'It does nothing', 'board_list_id': 'list0',
+        'members': ['member0'], 'labels': ['label0', 'label1'],
+        'attachment': {'path': str(screenshot), 'filename': 'screenshot.png', 'mime_type': 'image/png'},
+    }
+
+
+def test_create_card_makes_two_calls(stub, integration, card_data):
+    card = create_card(get_trello_client(integration), card_data)
+
+    assert card['id'] == 'card1'
+    assert stub.calls == {'create_card': 1, 'attach': 1}
+
+
+def test_retry_after_checkpoint_only_uploads_the_attachment(stub, integration, card_data):
+    job = queue.enqueue('trello.create_card', {**card_data, 'integration_pk': integration.pk}, user_pk=integration.user_pk)
+    stub.failures['attach'] = 1
+
+    queue._run(queue._claim())
+    assert job.status == models.Job.PENDING
+    assert job.result['id'] == 'card1'
+
+    queue._run(queue._claim())
+    assert job.status == models.Job.SUCCEEDED
+    assert job.result['id'] == 'card1'
+    assert stub.calls == {'create_card': 1, 'attach': 2}
@@ -0,0 +1,86 @@
+import pytest
+from flask_jwt_extended import create_access_token
+from benchmarks.trello_stub import TrelloStub
+from app.trello_client import cache
+
+
+@pytest.fixture
+def stub():
+    stub = TrelloStub().start()
+    yield stub
+    stub.shutdown()
+    stub.server_close()
+
+
+@pytest.fixture
+def config(config, stub):
+    return {**config, 'TRELLO_API_URL': stub.url, 'ADMIN_TOKEN': 'admin-token'}
+
+
+@pytest.fixture
+def headers(integration):
+    return {'Authorization': 'Bearer ' + create_access_token(identity=integration.user_pk)}
+
+
+@pytest.mark.parametrize('path, first', [
+    ('/api/trello/boards', {'label': 'Board 0', 'value': 'board0'}),
+    ('/api/trello/board/board0/lists', {'label': 'List 0', 'value': 'list0'}),
+    ('/api/trello/board/board0/labels', {'label': 'green', 'value': 'label0'}),
+    ('/api/trello/board/board0/members', {'label': 'Member 0', 'value': 'member0'}),
+])
+def test_collections_are_dumped_as_options(app, headers, path, first):
+    response = app.test_client().get(path, headers=headers)
+
+    assert response.status_code == 200
+    assert response.get_json()['items'][0] == first
+
+
+def test_board_meta_fetches_the_three_collections(app, headers, stub):
+    response = app.test_client().get('/api/trello/board/board0/meta', headers=headers)
+
+    assert response.status_code == 200
+    meta = response.get_json()
+    assert {collection: (len(items), items[0]) for collection, items in meta.items()} == {
+        'lists': (8, {'label': 'List 0', 'value': 'list0'}),
+        'labels': (6, {'label': 'green', 'value': 'label0'}),
+        'members': (4, {'label': 'Member 0', 'value': 'member0'}),
+    }
+    assert {operation: stub.calls[operation] for operation in meta} == {'lists': 1, 'labels': 1, 'members': 1}
+
+
+def test_board_meta_fails_with_any_collection(app, headers, stub):
+    stub.failures['labels'] = 1
+
+    response = app.test_client().get('/api/trello/board/board0/meta', headers=headers)
+
+    assert response.status_code == 502
+    assert response.get_json()['message'] == {'Oops': 'Trello is not available right now.'}
+
+
+def test_expired_lookups_are_served_while_trello_fails(app, headers, stub, monkeypatch):
+    client = app.test_client()
+    assert client.get('/api/trello/boards', headers=headers).status_code == 200
+    monkeypatch.setattr(cache, 'ttl', 0)
+    stub.failures['boards'] = 1
+
+    response = client.get('/api/trello/boards', headers=headers)
+
+    assert response.status_code == 200
+    assert response.get_json()['items'][0] == {'label': 'Board 0', 'value': 'board0'}
+    assert stub.calls['boards'] == 2
+
+
+def test_cache_stats_require_the_admin_token(app, headers):
+    client = app.test_client()
+
+    assert client.get('/api/trello/cache', headers=headers).status_code == 405
+    assert client.get('/api/admin/trello/cache', headers=headers).status_code == 401
+    response = client.get('/api/admin/trello/cache', headers={'Authorization': 'Bearer admin-token'})
+    assert response.status_code == 200
+    assert 'hits' in response.get_json()
+
+
+def test_cache_stats_are_hidden_without_an_admin_token(app):
+    app.config['ADMIN_TOKEN'] = None
+
+    assert app.test_client().get('/api/admin/trello/cache').status_code == 404